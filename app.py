@@ -1,17 +1,56 @@
 # app.py
+import io
 import os
 import re
+import sys
+import json
+import atexit
+import asyncio
+import copy
+import pickle
+import marshal
+import cProfile
+import tracemalloc
+import hashlib
+import hmac
+import gzip
+import zlib
+import sqlite3
 import logging
-from datetime import datetime, date, timedelta
-from time import time as _now
+import threading
+import contextvars
+from datetime import datetime, timedelta
+from time import time as _now, sleep as _sleep
+from contextlib import contextmanager
 import xml.etree.ElementTree as ET
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque, Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeout
 
+import click
 import pytz
 import requests
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, send_file
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+
+try:
+    import fcntl  # lock entre processos (POSIX)
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+try:
+    import aiohttp  # opcional: motor de enriquecimento assíncrono
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+try:
+    import brotli  # opcional: variante br do cache de saída
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    from PIL import Image, ImageOps, features as pil_features  # opcional: miniaturas de /foto
+except ImportError:  # pragma: no cover
+    Image = ImageOps = pil_features = None
 
 # -----------------------------------------------------------------------------
 # LOG
@@ -19,18 +58,254 @@ from urllib3.util.retry import Retry
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# -----------------------------------------------------------------------------
+# MÉTRICAS E RASTREAMENTO
+# -----------------------------------------------------------------------------
+# Contadores e histogramas em memória (por worker), exportados em /metrics no
+# formato texto do Prometheus. Cada montagem de pauta grava também uma árvore
+# de spans (item -> autores/DTQ -> deputados -> chamadas HTTP), consultável em
+# /api/pauta/<data>?debug=trace.
+_LATENCIA_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+_TRACES_MAX = 32
+_METRICAS_DESC = {
+    "pauta_upstream_chamadas_total": ("counter", "Chamadas à API por família, status e origem (rede, hit, obsoleto, recusada)."),
+    "pauta_upstream_latencia_segundos": ("histogram", "Latência das chamadas que foram à rede."),
+    "pauta_upstream_retentativas_total": ("counter", "Retentativas de chamadas à API após 429/5xx."),
+    "pauta_upstream_bytes_total": ("counter", "Bytes de corpo recebidos da API."),
+    "pauta_upstream_em_voo": ("gauge", "Chamadas à API em andamento."),
+    "pauta_cache_consultas_total": ("counter", "Consultas ao cache por prefixo de chave e resultado."),
+    "pauta_montagem_segundos": ("histogram", "Duração das montagens de pauta."),
+    "pauta_http_cache_total": ("counter", "Resultado da camada de cache HTTP condicional."),
+    "pauta_disjuntor_estado": ("gauge", "Estado do disjuntor: 0 fechado, 1 meio aberto, 2 aberto."),
+    "pauta_limitador_taxa": ("gauge", "Taxa atual do limitador (req/s)."),
+    "pauta_pool_tamanho": ("gauge", "Tamanho configurado dos pools."),
+    "pauta_saida_cache_total": ("counter", "Respostas do cache de saída por tipo e resultado (hit, miss, 304)."),
+    "pauta_cache_entradas": ("gauge", "Entradas no cache."),
+    "pauta_cache_bytes": ("gauge", "Bytes ocupados no cache (ver CACHE_MAX_MB)."),
+    "pauta_cache_max_bytes": ("gauge", "Orçamento do cache em bytes."),
+    "pauta_cache_despejos_total": ("counter", "Entradas despejadas por LRU neste processo."),
+    "pauta_cache_expirados_total": ("counter", "Entradas removidas por vencimento neste processo."),
+    "pauta_foto_total": ("counter", "Fotos servidas por /foto (disco, busca na origem, erro, id desconhecido)."),
+    "pauta_perfil_amostras_total": ("counter", "Amostras da amostragem contínua por região do código (PERFIL_HZ)."),
+}
+
+def _rotulos(labels, **extra):
+    pares = list(labels) + [(k, str(v)) for k, v in extra.items()]
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in pares) + "}"
+
+class _Metricas:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}  # (nome, rótulos) -> valor | [buckets..., soma, contagem]
+
+    @staticmethod
+    def _chave(nome, labels):
+        return nome, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, nome, valor=1, **labels):
+        k = self._chave(nome, labels)
+        with self.lock:
+            self.series[k] = self.series.get(k, 0) + valor
+
+    def observar(self, nome, valor, **labels):
+        k = self._chave(nome, labels)
+        with self.lock:
+            h = self.series.get(k)
+            if h is None:
+                h = self.series[k] = [0] * (len(_LATENCIA_BUCKETS) + 2)
+            for i, le in enumerate(_LATENCIA_BUCKETS):
+                if valor <= le:
+                    h[i] += 1
+            h[-2] += valor
+            h[-1] += 1
+
+    def exportar(self, extras=()):
+        """Formato de exposição do Prometheus; `extras` são (nome, rótulos, valor)
+        calculados na hora da coleta."""
+        with self.lock:
+            itens = [(k, list(v) if isinstance(v, list) else v) for k, v in self.series.items()]
+        itens += [(self._chave(n, l), v) for n, l, v in extras]
+        linhas, vistos = [], set()
+        for (nome, labels), v in sorted(itens, key=lambda x: x[0]):
+            if nome not in vistos:
+                vistos.add(nome)
+                tipo, ajuda = _METRICAS_DESC.get(nome, ("gauge", nome))
+                linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+            if isinstance(v, list):
+                for le, n in zip(_LATENCIA_BUCKETS, v):
+                    linhas.append(f"{nome}_bucket{_rotulos(labels, le=le)} {n}")
+                linhas.append(f"{nome}_bucket{_rotulos(labels, le='+Inf')} {v[-1]}")
+                linhas.append(f"{nome}_sum{_rotulos(labels)} {round(v[-2], 6)}")
+                linhas.append(f"{nome}_count{_rotulos(labels)} {v[-1]}")
+            else:
+                linhas.append(f"{nome}{_rotulos(labels)} {v}")
+        return "\n".join(linhas) + "\n"
+
+_METRICAS = _Metricas()
+
+_TRACE = contextvars.ContextVar("pauta_trace", default=None)
+_TRACES = {}
+_TRACES_LOCK = threading.Lock()
+
+class _Span:
+    def __init__(self, nome, **attrs):
+        self.nome = nome
+        self.attrs = attrs
+        self.filhos = []
+        self.inicio = _now()
+        self.duracao = None
+
+    def to_dict(self):
+        d = {"nome": self.nome, "ms": None if self.duracao is None else round(self.duracao * 1000, 1)}
+        d.update(self.attrs)
+        if self.filhos:
+            d["filhos"] = [f.to_dict() for f in list(self.filhos)]
+        return d
+
+@contextmanager
+def _span(nome, raiz=False, **attrs):
+    """Span filho do atual (ou nova árvore com raiz=True). Fora de uma montagem
+    rastreada não faz nada."""
+    pai = _TRACE.get()
+    if pai is None and not raiz:
+        yield None
+        return
+    s = _Span(nome, **attrs)
+    if pai is not None and not raiz:
+        pai.filhos.append(s)
+    tok = _TRACE.set(s)
+    try:
+        yield s
+    finally:
+        s.duracao = _now() - s.inicio
+        _TRACE.reset(tok)
+
+def _propagar(fn):
+    """Leva o span atual para a thread de um pool (contextvars não atravessam
+    o ThreadPoolExecutor sozinhos)."""
+    span = _TRACE.get()
+    if span is None:
+        return fn
+    def _rodar(*args, **kwargs):
+        tok = _TRACE.set(span)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _TRACE.reset(tok)
+    return _rodar
+
+def _guardar_trace(data_str, span):
+    with _TRACES_LOCK:
+        _TRACES.pop(data_str, None)
+        _TRACES[data_str] = span.to_dict()
+        while len(_TRACES) > _TRACES_MAX:
+            _TRACES.pop(next(iter(_TRACES)))
+
+def trace_pauta(data_str):
+    with _TRACES_LOCK:
+        return _TRACES.get(data_str)
+
+def _registrar_chamada(familia, origem, url, segundos=0.0, status=None, tentativas=0, tamanho=0):
+    """Métricas + span folha de uma chamada à API (ou da resposta que a evitou)."""
+    _METRICAS.inc("pauta_upstream_chamadas_total", familia=familia, origem=origem, status=status or "-")
+    if origem == "rede":
+        _METRICAS.observar("pauta_upstream_latencia_segundos", segundos, familia=familia)
+        if tentativas:
+            # Uma chamada por tentativa: cada uma com tentativas > 0 é uma retentativa
+            _METRICAS.inc("pauta_upstream_retentativas_total", familia=familia)
+        if tamanho:
+            _METRICAS.inc("pauta_upstream_bytes_total", tamanho, familia=familia)
+    pai = _TRACE.get()
+    if pai is not None:
+        folha = _Span(f"GET {familia}", url=url.replace(API_URL, ""), origem=origem, status=status)
+        if tentativas:
+            folha.attrs["tentativas"] = tentativas
+        folha.duracao = segundos
+        pai.filhos.append(folha)
+
+def _prefixo_cache(key):
+    # Entidades ("prop:<campo>:<id>") contam por campo
+    partes = key.split(":", 2)
+    return ":".join(partes[:2]) if partes[0] == "prop" and len(partes) == 3 else partes[0]
+
+def _contar_cache(key, resultado):
+    _METRICAS.inc("pauta_cache_consultas_total", prefixo=_prefixo_cache(key), resultado=resultado)
+
+def metricas_prometheus():
+    extras = [("pauta_http_cache_total", {"tipo": t}, n) for t, n in http_cache_stats().items()
+              if isinstance(n, int) and t != "total"]
+    saude = upstream_status()
+    estados = {"fechado": 0, "meio_aberto": 1, "aberto": 2}
+    extras += [("pauta_disjuntor_estado", {"familia": f}, estados[d["estado"]]) for f, d in saude["disjuntores"].items()]
+    extras.append(("pauta_limitador_taxa", {}, saude["limitador"]["taxa"]))
+    extras += [("pauta_pool_tamanho", {"pool": "http"}, _HTTP_POOL), ("pauta_pool_tamanho", {"pool": "dtq"}, _DTQ_WORKERS)]
+    cache = cache_stats()
+    extras += [(f"pauta_cache_{k}", {}, cache[k]) for k in ("entradas", "bytes", "max_bytes") if cache[k] is not None]
+    extras += [(f"pauta_cache_{k}_total", {}, cache[k]) for k in ("despejos", "expirados")]
+    return _METRICAS.exportar(extras)
+
 # -----------------------------------------------------------------------------
 # MODELOS
 # -----------------------------------------------------------------------------
-class ResultadoPauta:
-    def __init__(self, encontrou=False, tem_sessao=False, pauta=None, erro=None, situacao=None):
+_INTERNAR_MAX = 64
+
+def _internar(v):
+    # Nomes de autores, siglas, despachos etc. se repetem em todos os itens e
+    # datas em cache: uma cópia de cada string curta basta
+    if type(v) is str:
+        return sys.intern(v) if len(v) <= _INTERNAR_MAX else v
+    if type(v) is list:
+        return [sys.intern(x) if type(x) is str and len(x) <= _INTERNAR_MAX else x for x in v]
+    return v
+
+class _Modelo:
+    """Base dos modelos: __slots__ (sem __dict__ por instância) e um único
+    caminho de/para dict, usado pelo cache e pelo arquivo. Campos ausentes no
+    dict (entradas gravadas por versões antigas) recebem _PADROES."""
+    __slots__ = ()
+    _PADROES = {}
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, d):
+        obj = cls.__new__(cls)
+        padroes = cls._PADROES
+        for k in cls.__slots__:
+            if k in d:
+                setattr(obj, k, _internar(d[k]))
+            else:
+                v = padroes.get(k)
+                setattr(obj, k, list(v) if type(v) is list else v)
+        return obj
+
+class ResultadoPauta(_Modelo):
+    __slots__ = ("encontrou", "tem_sessao", "pauta", "erro", "situacao", "gerado_em", "diff", "parcial",
+                 "falha_upstream", "degradados")
+    _PADROES = {"encontrou": False, "tem_sessao": False, "pauta": [], "parcial": False, "falha_upstream": False,
+                "degradados": 0}
+
+    def __init__(self, encontrou=False, tem_sessao=False, pauta=None, erro=None, situacao=None, diff=None, parcial=False,
+                 falha_upstream=False):
         self.encontrou = encontrou
         self.tem_sessao = tem_sessao
         self.pauta = pauta or []
         self.erro = erro
         self.situacao = situacao
+        self.gerado_em = _now()
+        self.diff = diff           # mudanças em relação à montagem anterior (ver _diff_pauta)
+        self.parcial = parcial     # devolvido no prazo, com itens ainda sem autores/DTQ
+        self.falha_upstream = falha_upstream  # erro da API (não "sem sessão"): não substitui a anterior
+        self.degradados = sum(1 for it in self.pauta if it.degradado)  # itens com autores/DTQ faltando
+
+class Destaque(_Modelo):
+    __slots__ = ("id_proposicao", "numero", "sigla_tipo", "data_hora", "ementa", "url_inteiro_teor",
+                 "descricao_tipo", "despacho", "autores")
+    _PADROES = {"autores": []}
 
-class Destaque:
     def __init__(self, id_proposicao, numero, sigla_tipo, data_hora, ementa, url_inteiro_teor, descricao_tipo, despacho, autores=None):
         self.id_proposicao = id_proposicao
         self.numero = numero
@@ -42,7 +317,26 @@ class Destaque:
         self.despacho = despacho
         self.autores = autores or []
 
-class ItemPauta:
+    def para_api(self):
+        return {
+            "numero": self.numero,
+            "sigla_tipo": self.sigla_tipo,
+            "data_hora": self.data_hora,
+            "ementa": self.ementa,
+            "url_inteiro_teor": self.url_inteiro_teor,
+            "descricao_tipo": self.descricao_tipo,
+            "despacho": self.despacho,
+            "autores": self.autores,
+        }
+
+class ItemPauta(_Modelo):
+    __slots__ = ("id_proposicao", "pauta_id", "titulo", "sigla_tipo", "numero", "ano", "ementa", "nome_relator",
+                 "regime", "topico", "autores", "destaques", "relator_foto", "assinatura", "enriquecido_em",
+                 "completo", "identificacao_completa", "ids_destaques", "relator_id", "degradado")
+    # Itens gravados antes de existir `completo` já vinham enriquecidos
+    _PADROES = {"regime": "", "topico": "", "autores": [], "destaques": [], "relator_foto": "", "assinatura": "",
+                "completo": True, "ids_destaques": [], "relator_id": "", "degradado": False}
+
     def __init__(
         self,
         id_proposicao,             # ID da proposição PRINCIPAL (não-PPP)
@@ -55,7 +349,9 @@ class ItemPauta:
         autores=None,
         destaques=None,
         relator_foto="",
-        pauta_id=None              # ID que veio na pauta (PPP quando houver)
+        pauta_id=None,             # ID que veio na pauta (PPP quando houver)
+        assinatura="",             # hash do item bruto da pauta (detecta mudanças)
+        relator_id=""              # id do deputado relator (foto servida por /foto)
     ):
         self.id_proposicao = id_proposicao
         self.pauta_id = pauta_id
@@ -70,61 +366,894 @@ class ItemPauta:
         self.autores = autores or []
         self.destaques = destaques or []
         self.relator_foto = relator_foto or ""
+        self.relator_id = relator_id or ""
+        self.assinatura = assinatura
+        self.enriquecido_em = None  # quando autores/destaques foram buscados
+        self.completo = False       # autores/destaques já preenchidos
+        self.ids_destaques = []     # só os ids dos DTQ (modo preguiçoso)
+        self.degradado = False      # a API falhou em parte do enriquecimento
         base_fallback = f"{sigla_tipo} {numero}/{ano}".strip()
         self.identificacao_completa = self.titulo if self.titulo else base_fallback
 
+    def foto_relator(self):
+        """Miniatura local (/foto/<id>); a URL da Câmara só sem id do relator."""
+        dep_id = self.relator_id or _foto_id_da_url(self.relator_foto)
+        return f"/foto/{dep_id}" if dep_id else self.relator_foto
+
+    def ids_dtq(self):
+        """Ids dos DTQ do item, enriquecido ou não."""
+        return [d.id_proposicao for d in self.destaques] if self.completo else self.ids_destaques
+
+    def para_api(self):
+        """Forma do item em /api/pauta (a única: o encoder em partes usa a mesma)."""
+        return {
+            "id_proposicao": self.id_proposicao,   # principal
+            "pauta_id": self.pauta_id,             # id da pauta (PPP quando houver)
+            "titulo": self.titulo,
+            "identificacao": self.identificacao_completa,
+            "ementa": self.ementa,
+            "relator": self.nome_relator,
+            "relator_id": self.relator_id,
+            "relator_foto": self.foto_relator(),
+            "regime": self.regime,
+            "topico": self.topico,
+            "autores": self.autores,
+            "completo": self.completo,
+            "total_destaques": len(self.ids_dtq()),
+            "destaques": [d.para_api() for d in self.destaques],
+        }
+
+_MODELOS = {c.__name__: c for c in (ResultadoPauta, Destaque, ItemPauta)}
+
 # -----------------------------------------------------------------------------
 # HTTP SESSION
 # -----------------------------------------------------------------------------
-API_URL = "https://dadosabertos.camara.leg.br/api/v2"
+# CAMARA_API_URL aponta para outra base (ex.: o stub de replay em bench/stub.py)
+API_URL = os.environ.get("CAMARA_API_URL", "https://dadosabertos.camara.leg.br/api/v2").rstrip("/")
 PLENARIO_ID = 180
 
+# Pool de conexões por host; também é o teto de requisições simultâneas do
+# motor assíncrono. O HTTPAdapter padrão guarda só 10 conexões.
+_HTTP_POOL = int(os.environ.get("HTTP_POOL", 16))
+_RETRY_TOTAL = 3
+_RETRY_BACKOFF = 0.6
+_RETRY_STATUS = [429, 500, 502, 503, 504]
+_HTTP_HEADERS = {
+    "Accept": "application/json",
+    "User-Agent": "PautaCamara/2.1 (+https://dadosabertos.camara.leg.br/)"
+}
+
+# -----------------------------------------------------------------------------
+# SAÚDE DO UPSTREAM (limitador adaptativo + disjuntores por família)
+# -----------------------------------------------------------------------------
+# Todas as chamadas à API (SESSION e motor assíncrono) passam por um balde de
+# fichas compartilhado e pelo disjuntor da família do endpoint. Um 429 corta a
+# taxa pela metade e respeita o Retry-After; cada sucesso devolve um pouco de
+# taxa. Falhas seguidas (rede/5xx) abrem o disjuntor: as chamadas daquela
+# família falham na hora (ou servem o corpo guardado no cache HTTP) até a
+# janela passar, quando uma única sondagem decide se ele fecha de novo.
+_LIMITE_RPS = float(os.environ.get("LIMITE_RPS", 40))
+_LIMITE_RPS_MIN = float(os.environ.get("LIMITE_RPS_MIN", 1))
+_LIMITE_RAJADA = int(os.environ.get("LIMITE_RAJADA", 80))
+_LIMITE_ESPERA_MAX = float(os.environ.get("LIMITE_ESPERA_MAX", 10))
+_DISJUNTOR_FALHAS = int(os.environ.get("DISJUNTOR_FALHAS", 5))
+_DISJUNTOR_ABERTO_SECONDS = int(os.environ.get("DISJUNTOR_ABERTO_SECONDS", 30))
+_FAMILIAS = ("eventos", "pauta", "proposicoes", "deputados", "outros")
+
+class UpstreamIndisponivel(requests.ConnectionError):
+    """Chamada recusada localmente: disjuntor aberto ou espera acima do limite."""
+
+def _familia(url):
+    """Família do endpoint: /eventos/{id}/pauta é 'pauta'; o resto é o 1º segmento."""
+    if not url.startswith(API_URL):
+        return "outros"
+    partes = url[len(API_URL):].split("?", 1)[0].strip("/").split("/")
+    if partes[0] == "eventos" and len(partes) > 2 and partes[2] == "pauta":
+        return "pauta"
+    return partes[0] if partes[0] in _FAMILIAS else "outros"
+
+def _retry_after(valor):
+    try:
+        return max(0.0, float(valor))
+    except (TypeError, ValueError):
+        return 0.0
+
+class _Limitador:
+    """Balde de fichas com aumento aditivo / corte multiplicativo da taxa."""
+    def __init__(self, taxa, rajada):
+        self.taxa_max = taxa
+        self.taxa = taxa
+        self.rajada = rajada
+        self.fichas = float(rajada)
+        self.ultimo = _now()
+        self.pausa_ate = 0.0
+        self.lock = threading.Lock()
+
+    def reservar(self):
+        """Consome uma ficha (podendo ficar devendo); devolve quantos segundos
+        esperar antes de chamar."""
+        with self.lock:
+            agora = _now()
+            self.fichas = min(self.rajada, self.fichas + (agora - self.ultimo) * self.taxa)
+            self.ultimo = agora
+            self.fichas -= 1
+            espera = max(0.0, self.pausa_ate - agora)
+            if self.fichas < 0:
+                espera = max(espera, -self.fichas / self.taxa)
+            return espera
+
+    def devolver(self):
+        with self.lock:
+            self.fichas = min(self.rajada, self.fichas + 1)
+
+    def penalizar(self, retry_after=0.0):
+        with self.lock:
+            self.taxa = max(_LIMITE_RPS_MIN, self.taxa / 2)
+            if retry_after:
+                self.pausa_ate = max(self.pausa_ate, _now() + retry_after)
+        logger.warning(f"429 da API: taxa reduzida para {self.taxa:.1f} req/s (Retry-After {retry_after:.0f}s)")
+
+    def recompensar(self):
+        with self.lock:
+            if self.taxa < self.taxa_max:
+                self.taxa = min(self.taxa_max, self.taxa + 0.5)
+
+    def status(self):
+        with self.lock:
+            return {
+                "taxa": round(self.taxa, 2),
+                "taxa_max": self.taxa_max,
+                "fichas": round(self.fichas, 1),
+                "pausa_segundos": round(max(0.0, self.pausa_ate - _now()), 1),
+            }
+
+class _Disjuntor:
+    """fechado -> (N falhas seguidas) aberto -> (janela) meio_aberto -> 1 sondagem."""
+    def __init__(self, familia):
+        self.familia = familia
+        self.estado = "fechado"
+        self.falhas = 0
+        self.aberto_ate = 0.0
+        self.sondando = False
+        self.recusadas = 0
+        self.lock = threading.Lock()
+
+    def permitir(self):
+        with self.lock:
+            if self.estado == "aberto" and _now() >= self.aberto_ate:
+                self.estado, self.sondando = "meio_aberto", False
+            if self.estado == "fechado":
+                return True
+            if self.estado == "meio_aberto" and not self.sondando:
+                self.sondando = True
+                return True
+            self.recusadas += 1
+            return False
+
+    def sucesso(self):
+        with self.lock:
+            if self.estado != "fechado":
+                logger.info(f"disjuntor {self.familia}: fechado")
+            self.estado, self.falhas, self.sondando = "fechado", 0, False
+
+    def falha(self):
+        with self.lock:
+            self.falhas += 1
+            if self.estado == "meio_aberto" or (self.estado == "fechado" and self.falhas >= _DISJUNTOR_FALHAS):
+                self.estado, self.sondando = "aberto", False
+                self.aberto_ate = _now() + _DISJUNTOR_ABERTO_SECONDS
+                logger.warning(f"disjuntor {self.familia}: aberto por {_DISJUNTOR_ABERTO_SECONDS}s ({self.falhas} falhas)")
+
+    def status(self):
+        with self.lock:
+            return {
+                "estado": self.estado,
+                "falhas": self.falhas,
+                "recusadas": self.recusadas,
+                "reabre_em": round(max(0.0, self.aberto_ate - _now()), 1) if self.estado == "aberto" else 0,
+            }
+
+_LIMITADOR = _Limitador(_LIMITE_RPS, _LIMITE_RAJADA)
+_DISJUNTORES = {f: _Disjuntor(f) for f in _FAMILIAS}
+
+def _upstream_liberar(url):
+    """Antes de cada chamada: disjuntor + ficha. Devolve (disjuntor, espera em s)
+    ou levanta UpstreamIndisponivel."""
+    disj = _DISJUNTORES[_familia(url)]
+    if not disj.permitir():
+        raise UpstreamIndisponivel(f"disjuntor {disj.familia} aberto")
+    espera = _LIMITADOR.reservar()
+    if espera > _LIMITE_ESPERA_MAX:
+        _LIMITADOR.devolver()
+        if disj.estado == "meio_aberto":
+            disj.falha()
+        raise UpstreamIndisponivel(f"limite de taxa: espera de {espera:.0f}s")
+    return disj, espera
+
+def _upstream_registrar(disj, status, headers=None):
+    """Depois de cada chamada: status None = erro de rede/timeout."""
+    if status == 429:
+        _LIMITADOR.penalizar(_retry_after((headers or {}).get("Retry-After")))
+        disj.sucesso()  # a API respondeu; é só excesso de taxa
+    elif status is None or status >= 500:
+        disj.falha()
+    else:
+        disj.sucesso()
+        _LIMITADOR.recompensar()
+
+def upstream_status():
+    return {
+        "limitador": _LIMITADOR.status(),
+        "disjuntores": {f: d.status() for f, d in _DISJUNTORES.items()},
+    }
+
+# -----------------------------------------------------------------------------
+# CACHE HTTP CONDICIONAL (ETag / Last-Modified)
+# -----------------------------------------------------------------------------
+# Respostas 200 da API (JSON/XML) são guardadas no cache com seus validadores;
+# a próxima requisição à mesma URL sai com If-None-Match/If-Modified-Since e um
+# 304 é respondido com o corpo guardado. Cache-Control: max-age, quando vier,
+# permite responder sem ir à rede ("hit"). HTTP_CACHE=false desliga a camada.
+_HTTP_CACHE_ATIVO = os.environ.get("HTTP_CACHE", "true").lower() == "true"
+_HTTP_CACHE_KEY = "http:"
+_HTTP_CACHE_TTL = int(os.environ.get("HTTP_CACHE_TTL", 24 * 3600))
+_HTTP_TIPOS_CACHEAVEIS = ("json", "xml")
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+_HTTP_STATS = {"hit": 0, "revalidado_304": 0, "completo_200": 0, "outros": 0, "obsoleto": 0}
+_HTTP_STATS_LOCK = threading.Lock()
+
+def _http_contar(tipo):
+    with _HTTP_STATS_LOCK:
+        _HTTP_STATS[tipo] += 1
+
+def http_cache_stats():
+    with _HTTP_STATS_LOCK:
+        stats = dict(_HTTP_STATS)
+    total = sum(stats.values())
+    stats["total"] = total
+    stats["taxas"] = {k: round(v / total, 3) if total else 0.0 for k, v in _HTTP_STATS.items()}
+    return stats
+
+def _http_max_age(headers):
+    cc = (headers.get("Cache-Control") or "").lower()
+    if "no-store" in cc or "no-cache" in cc:
+        return 0
+    m = _MAX_AGE_RE.search(cc)
+    return int(m.group(1)) if m else 0
+
+def _http_cache_salvo(url):
+    return _cache_get(f"{_HTTP_CACHE_KEY}{url}") if _HTTP_CACHE_ATIVO else None
+
+def _http_headers_condicionais(salvo):
+    h = {}
+    if salvo:
+        if salvo.get("etag"):
+            h["If-None-Match"] = salvo["etag"]
+        if salvo.get("last_modified"):
+            h["If-Modified-Since"] = salvo["last_modified"]
+    return h
+
+def _http_cache_guardar(url, headers, texto, salvo=None):
+    """Grava (ou renova, num 304) a entrada da URL; ignora respostas sem
+    validadores nem max-age e tipos que não sejam JSON/XML."""
+    if not _HTTP_CACHE_ATIVO:
+        return
+    if salvo is None:
+        tipo = (headers.get("Content-Type") or "").lower()
+        if not any(t in tipo for t in _HTTP_TIPOS_CACHEAVEIS):
+            return
+        salvo = {"tipo": headers.get("Content-Type"), "texto": texto}
+    salvo["etag"] = headers.get("ETag") or salvo.get("etag")
+    salvo["last_modified"] = headers.get("Last-Modified") or salvo.get("last_modified")
+    salvo["fresco_ate"] = _now() + _http_max_age(headers)
+    if salvo["etag"] or salvo["last_modified"] or salvo["fresco_ate"] > _now():
+        _cache_set(f"{_HTTP_CACHE_KEY}{url}", salvo, _HTTP_CACHE_TTL)
+
+def _http_resposta_salva(request, salvo):
+    r = requests.Response()
+    r.status_code = 200
+    r.reason = "OK"
+    r._content = salvo["texto"].encode("utf-8")
+    r.headers["Content-Type"] = salvo.get("tipo") or "application/json"
+    r.encoding = "utf-8"
+    r.url = request.url
+    r.request = request
+    return r
+
+class _AdapterCondicional(HTTPAdapter):
+    """HTTPAdapter que revalida GETs com os validadores guardados no cache e
+    passa pelo limitador/disjuntores; com a API fora, serve o corpo guardado.
+
+    As retentativas (429/5xx) ficam aqui, não no Retry do urllib3: cada
+    tentativa passa de novo pelo limitador e pelo disjuntor, como no motor
+    assíncrono."""
+    def send(self, request, **kwargs):
+        url = request.url
+        cacheavel = request.method == "GET" and _HTTP_CACHE_ATIVO and not kwargs.get("stream")
+        salvo = _http_cache_salvo(url) if cacheavel else None
+        if salvo and salvo.get("fresco_ate", 0) > _now():
+            _http_contar("hit")
+            _registrar_chamada(_familia(url), "hit", url)
+            return _http_resposta_salva(request, salvo)
+        if cacheavel:
+            request.headers.update(_http_headers_condicionais(salvo))
+        try:
+            resp = self._com_retentativas(request, **kwargs)
+        except UpstreamIndisponivel:
+            if salvo:
+                _http_contar("obsoleto")
+                _registrar_chamada(_familia(url), "obsoleto", url)
+                return _http_resposta_salva(request, salvo)
+            _registrar_chamada(_familia(url), "recusada", url)
+            raise
+        except requests.RequestException:
+            if salvo:
+                _http_contar("obsoleto")
+                return _http_resposta_salva(request, salvo)
+            raise
+        if not cacheavel:
+            return resp
+        if resp.status_code >= 500 and salvo:
+            _http_contar("obsoleto")
+            resp.close()
+            return _http_resposta_salva(request, salvo)
+        if resp.status_code == 304 and salvo:
+            _http_contar("revalidado_304")
+            _http_cache_guardar(url, resp.headers, None, salvo)
+            resp.close()
+            return _http_resposta_salva(request, salvo)
+        if resp.status_code == 200:
+            _http_contar("completo_200")
+            try:
+                _http_cache_guardar(url, resp.headers, resp.content.decode("utf-8"))
+            except UnicodeDecodeError:
+                pass
+        else:
+            _http_contar("outros")
+        return resp
+
+    def _com_retentativas(self, request, **kwargs):
+        for tentativa in range(_RETRY_TOTAL + 1):
+            disj, espera = _upstream_liberar(request.url)
+            if espera:
+                _sleep(espera)
+            resp = self._enviar(disj, request, tentativa, **kwargs)
+            if resp.status_code not in _RETRY_STATUS or tentativa == _RETRY_TOTAL:
+                return resp
+            resp.close()
+            # No 429 o Retry-After já virou pausa do limitador: a espera sai do
+            # próximo _upstream_liberar (ou vira UpstreamIndisponivel se passar
+            # de LIMITE_ESPERA_MAX), sem prender a thread aqui.
+            _sleep(_RETRY_BACKOFF * (2 ** tentativa))
+
+    def _enviar(self, disj, request, tentativa=0, **kwargs):
+        t0 = _now()
+        _METRICAS.inc("pauta_upstream_em_voo", familia=disj.familia)
+        try:
+            resp = super().send(request, **kwargs)
+        except requests.RequestException:
+            _upstream_registrar(disj, None)
+            _registrar_chamada(disj.familia, "rede", request.url, _now() - t0, "erro", tentativa)
+            raise
+        finally:
+            _METRICAS.inc("pauta_upstream_em_voo", -1, familia=disj.familia)
+        _upstream_registrar(disj, resp.status_code, resp.headers)
+        tamanho = int(resp.headers.get("Content-Length") or 0) if kwargs.get("stream") else len(resp.content)
+        _registrar_chamada(disj.familia, "rede", request.url, _now() - t0, resp.status_code, tentativa, tamanho)
+        return resp
+
+# -----------------------------------------------------------------------------
+# SESSÃO
+# -----------------------------------------------------------------------------
 def build_session():
     s = requests.Session()
-    retries = Retry(
-        total=3,
-        backoff_factor=0.6,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["GET"],
-        raise_on_status=False,
-    )
-    adapter = HTTPAdapter(max_retries=retries)
+    # max_retries=0: as retentativas são do _AdapterCondicional
+    adapter = _AdapterCondicional(max_retries=0, pool_connections=_HTTP_POOL, pool_maxsize=_HTTP_POOL)
     s.mount("http://", adapter)
     s.mount("https://", adapter)
-    s.headers.update({
-        "Accept": "application/json",
-        "User-Agent": "PautaCamara/2.1 (+https://dadosabertos.camara.leg.br/)"
-    })
+    s.headers.update(_HTTP_HEADERS)
     return s
 
 SESSION = build_session()
 
 # -----------------------------------------------------------------------------
-# CACHE TTL SIMPLES
+# CACHE (backends plugáveis: dict por processo ou SQLite compartilhado)
 # -----------------------------------------------------------------------------
-_CACHE = {}
+# CACHE_BACKEND=memory  -> dict no processo (padrão, some a cada restart)
+# CACHE_BACKEND=sqlite  -> arquivo SQLite (WAL) em CACHE_PATH, compartilhado
+#                          entre os workers do gunicorn e persistente
 _TTL_SECONDS = 300
+_CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory").lower()
+_CACHE_PATH = os.environ.get("CACHE_PATH", "/tmp/pauta_cache.sqlite3")
+# Orçamento do cache. No SQLite conta o blob comprimido; em memória, o JSON
+# compacto de cada valor (os objetos vivos ocupam uns 3x isso), daí o padrão menor.
+_CACHE_MAX_BYTES = int(float(os.environ.get("CACHE_MAX_MB", 64 if _CACHE_BACKEND == "sqlite" else 24)) * 1024 * 1024)
+_CACHE_EVICT_EVERY = 50
+_CACHE_VARREDURA_SECONDS = int(os.environ.get("CACHE_VARREDURA", 60))
+# Entradas expiradas ainda podem ser servidas (stale-while-revalidate) até
+# STALE_MAX_SECONDS depois de expirar; depois disso são descartadas.
+_STALE_MAX_SECONDS = int(os.environ.get("STALE_MAX_SECONDS", 3600))
+
+def _json_default(o):
+    m = _MODELOS.get(type(o).__name__)
+    if m is not None and isinstance(o, m):
+        return {"__m": m.__name__, **o.to_dict()}
+    raise TypeError(f"não serializável: {type(o).__name__}")
+
+def _json_hook(d):
+    m = d.pop("__m", None)
+    return _MODELOS[m].from_dict(d) if m in _MODELOS else d
+
+def _serializar(val):
+    """JSON compacto + zlib; modelos viram {"__m": <classe>, ...atributos}."""
+    raw = json.dumps(val, default=_json_default, ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(raw.encode("utf-8"), 6)
+
+def _desserializar(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"), object_hook=_json_hook)
+
+def _tamanho(val):
+    """Bytes do JSON compacto de val: a medida de tamanho do MemoryCache."""
+    try:
+        return len(json.dumps(val, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    except (TypeError, ValueError):
+        return sys.getsizeof(val)
+
+class MemoryCache:
+    """Cache em dict local ao processo, LRU e limitado a max_bytes."""
+    def __init__(self, max_bytes):
+        self.dados = OrderedDict()  # chave -> (valor, criado, expira, tamanho)
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.despejos = 0
+        self.expirados = 0
+        self.lock = threading.Lock()
+
+    def _remover(self, key):
+        v = self.dados.pop(key, None)
+        if v is not None:
+            self.bytes -= v[3]
+
+    def get_entry(self, key):
+        """(valor, criado, expira) enquanto dentro do teto de staleness."""
+        with self.lock:
+            v = self.dados.get(key)
+            if v is None:
+                return None
+            if _now() > v[2] + _STALE_MAX_SECONDS:
+                self._remover(key)
+                self.expirados += 1
+                return None
+            self.dados.move_to_end(key)
+            return v[:3]
+
+    def get(self, key):
+        v = self.get_entry(key)
+        return v[0] if (v and _now() <= v[2]) else None
+
+    def set(self, key, val, ttl):
+        tamanho = _tamanho(val)
+        agora = _now()
+        with self.lock:
+            self._remover(key)
+            if tamanho > self.max_bytes:
+                logger.warning(f"cache: {key} ({tamanho} bytes) maior que o orçamento; não guardado")
+                return
+            self.dados[key] = (val, agora, agora + ttl, tamanho)
+            self.bytes += tamanho
+            while self.bytes > self.max_bytes:
+                self._remover(next(iter(self.dados)))
+                self.despejos += 1
+
+    def delete(self, key):
+        with self.lock:
+            self._remover(key)
+
+    def clear(self):
+        with self.lock:
+            self.dados.clear()
+            self.bytes = 0
+
+    def varrer(self):
+        """Remove as entradas que já passaram do teto de staleness."""
+        limite = _now() - _STALE_MAX_SECONDS
+        with self.lock:
+            velhas = [k for k, v in self.dados.items() if v[2] < limite]
+            for k in velhas:
+                self._remover(k)
+            self.expirados += len(velhas)
+        return len(velhas)
+
+    def stats(self):
+        with self.lock:
+            return {"entradas": len(self.dados), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "despejos": self.despejos, "expirados": self.expirados}
+
+    def tamanhos(self):
+        """[(chave, bytes)] de todas as entradas."""
+        with self.lock:
+            return [(k, e[3]) for k, e in self.dados.items()]
+
+class SQLiteCache:
+    """Cache em SQLite (WAL) compartilhado entre processos, com TTL por chave
+    e despejo LRU quando o total serializado passa de max_bytes."""
+    _SCHEMA_VERSAO = 2
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._sets = 0
+        # Leituras só anotam o acesso aqui; o UPDATE sai em lote (ver _gravar_acessos)
+        self._acessos = {}
+        self._acessos_lock = threading.Lock()
+        self.despejos = 0
+        self.expirados = 0
+        con = self._con()
+        if con.execute("PRAGMA user_version").fetchone()[0] != self._SCHEMA_VERSAO:
+            con.execute("DROP TABLE IF EXISTS cache")
+            con.execute(f"PRAGMA user_version = {self._SCHEMA_VERSAO}")
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " chave TEXT PRIMARY KEY, valor BLOB NOT NULL, tamanho INTEGER NOT NULL,"
+            " criado REAL NOT NULL, expira REAL NOT NULL, acesso REAL NOT NULL)"
+        )
+        con.execute("CREATE INDEX IF NOT EXISTS cache_acesso ON cache(acesso)")
+
+    def _con(self):
+        # Uma conexão por thread (sqlite3 não compartilha conexões entre threads)
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def get_entry(self, key):
+        """(valor, criado, expira) enquanto dentro do teto de staleness."""
+        try:
+            con = self._con()
+            row = con.execute("SELECT valor, criado, expira FROM cache WHERE chave = ?", (key,)).fetchone()
+            if not row:
+                return None
+            agora = _now()
+            if agora > row[2] + _STALE_MAX_SECONDS:
+                con.execute("DELETE FROM cache WHERE chave = ?", (key,))
+                return None
+            with self._acessos_lock:
+                self._acessos[key] = agora
+            return _desserializar(row[0]), row[1], row[2]
+        except Exception as e:
+            logger.warning(f"cache sqlite get {key}: {e}")
+            return None
+
+    def get(self, key):
+        v = self.get_entry(key)
+        return v[0] if (v and _now() <= v[2]) else None
+
+    def set(self, key, val, ttl):
+        try:
+            blob = _serializar(val)
+            agora = _now()
+            self._con().execute(
+                "INSERT OR REPLACE INTO cache (chave, valor, tamanho, criado, expira, acesso) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, blob, len(blob), agora, agora + ttl, agora),
+            )
+            self._sets += 1
+            if self._sets % _CACHE_EVICT_EVERY == 0:
+                self._evict()
+        except Exception as e:
+            logger.warning(f"cache sqlite set {key}: {e}")
+
+    def _gravar_acessos(self):
+        """Grava de uma vez os horários de acesso anotados desde a última
+        gravação: um hit não vira transação de escrita no WAL compartilhado.
+        Roda na varredura e antes do despejo LRU, que é quem usa `acesso`."""
+        with self._acessos_lock:
+            acessos, self._acessos = self._acessos, {}
+        if not acessos:
+            return
+        con = self._con()
+        con.execute("BEGIN")
+        try:
+            con.executemany("UPDATE cache SET acesso = MAX(acesso, ?) WHERE chave = ?", [(t, k) for k, t in acessos.items()])
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+
+    def _evict(self):
+        self.varrer()
+        # LRU: mantém os mais recentes até somar max_bytes
+        cur = self._con().execute(
+            "DELETE FROM cache WHERE chave IN ("
+            " SELECT chave FROM (SELECT chave, SUM(tamanho) OVER (ORDER BY acesso DESC) AS acum FROM cache)"
+            " WHERE acum > ?)",
+            (self.max_bytes,),
+        )
+        self.despejos += max(cur.rowcount, 0)
+
+    def varrer(self):
+        """Remove as entradas que já passaram do teto de staleness."""
+        self._gravar_acessos()
+        cur = self._con().execute("DELETE FROM cache WHERE expira < ?", (_now() - _STALE_MAX_SECONDS,))
+        n = max(cur.rowcount, 0)
+        self.expirados += n
+        return n
+
+    def stats(self):
+        try:
+            entradas, tamanho = self._con().execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM cache").fetchone()
+        except Exception as e:
+            logger.warning(f"cache sqlite stats: {e}")
+            entradas, tamanho = None, None
+        # despejos/expirados contam só o que este processo removeu
+        return {"entradas": entradas, "bytes": tamanho, "max_bytes": self.max_bytes,
+                "despejos": self.despejos, "expirados": self.expirados}
+
+    def tamanhos(self):
+        """[(chave, bytes)] de todas as entradas."""
+        try:
+            return self._con().execute("SELECT chave, tamanho FROM cache").fetchall()
+        except Exception as e:
+            logger.warning(f"cache sqlite tamanhos: {e}")
+            return []
+
+    def delete(self, key):
+        try:
+            self._con().execute("DELETE FROM cache WHERE chave = ?", (key,))
+        except Exception as e:
+            logger.warning(f"cache sqlite delete {key}: {e}")
+
+    def clear(self):
+        try:
+            self._con().execute("DELETE FROM cache")
+        except Exception as e:
+            logger.warning(f"cache sqlite clear: {e}")
+
+def _criar_cache():
+    if _CACHE_BACKEND == "sqlite":
+        try:
+            return SQLiteCache(_CACHE_PATH, _CACHE_MAX_BYTES)
+        except Exception as e:
+            logger.error(f"cache sqlite indisponível ({e}); usando memória.")
+    return MemoryCache(_CACHE_MAX_BYTES)
+
+_CACHE = _criar_cache()
+_CACHE_CONSULTAS = {"hit": 0, "miss": 0, "obsoleto": 0}
+_CACHE_CONSULTAS_LOCK = threading.Lock()
+
+def _cache_contar(key, resultado):
+    with _CACHE_CONSULTAS_LOCK:
+        _CACHE_CONSULTAS[resultado] += 1
+    _contar_cache(key, resultado)
 
 def _cache_get(key):
-    v = _CACHE.get(key)
-    if not v:
-        return None
-    val, ts = v
-    if _now() - ts > _TTL_SECONDS:
-        _CACHE.pop(key, None)
-        return None
+    val = _CACHE.get(key)
+    _cache_contar(key, "miss" if val is None else "hit")
     return val
 
-def _cache_set(key, val):
-    _CACHE[key] = (val, _now())
+def _cache_get_entry(key):
+    entrada = _CACHE.get_entry(key)
+    _cache_contar(key, "miss" if entrada is None else ("hit" if entrada[2] > _now() else "obsoleto"))
+    return entrada
+
+def _cache_set(key, val, ttl=None):
+    _CACHE.set(key, val, _TTL_SECONDS if ttl is None else ttl)
+
+def _cache_delete(key):
+    _CACHE.delete(key)
 
 def _cache_clear():
     _CACHE.clear()
-    logger.info("CACHE limpo (nocache=1).")
+    logger.info("CACHE limpo.")
+
+def cache_stats():
+    with _CACHE_CONSULTAS_LOCK:
+        consultas = dict(_CACHE_CONSULTAS)
+    total = sum(consultas.values())
+    return {
+        "backend": _CACHE_BACKEND if isinstance(_CACHE, SQLiteCache) else "memory",
+        **_CACHE.stats(),
+        **consultas,
+        "taxa_acerto": round(consultas["hit"] / total, 3) if total else 0.0,
+    }
+
+_VARREDURA = {"thread": None}
+_VARREDURA_LOCK = threading.Lock()
+
+def _varredura_loop():
+    while True:
+        _sleep(_CACHE_VARREDURA_SECONDS)
+        try:
+            n = _CACHE.varrer()
+            if n:
+                logger.info(f"cache: {n} entradas vencidas removidas.")
+        except Exception as e:
+            logger.error(f"varredura do cache: {e}")
+
+def _iniciar_varredura():
+    if _VARREDURA["thread"] is not None:
+        return
+    with _VARREDURA_LOCK:
+        if _VARREDURA["thread"] is None:
+            t = threading.Thread(target=_varredura_loop, name="varredura-cache", daemon=True)
+            t.start()
+            _VARREDURA["thread"] = t
+
+# -----------------------------------------------------------------------------
+# SINGLE-FLIGHT (uma construção por chave; os demais esperam o resultado)
+# -----------------------------------------------------------------------------
+_LOCK_DIR = os.environ.get("CACHE_LOCK_DIR", os.path.join(os.path.dirname(_CACHE_PATH) or ".", "pauta_locks"))
+_LOCK_TIMEOUT_SECONDS = 90
+# Só a montagem de uma pauta leva flock entre workers (um arquivo por data).
+# Entidades e consultas avulsas são baratas e idempotentes: no pior caso dois
+# workers buscam a mesma uma vez, sem deixar um .lock por chave no disco.
+_LOCK_CHAVE_RE = re.compile(r"^pauta:\d{4}-\d{2}-\d{2}$")
+
+class _Voo:
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+_VOOS = {}
+_VOOS_LOCK = threading.Lock()
+
+def _single_flight(key, fn):
+    """Executa fn() uma única vez por chave dentro do processo; chamadas
+    concorrentes com a mesma chave esperam e recebem o mesmo resultado."""
+    with _VOOS_LOCK:
+        voo = _VOOS.get(key)
+        lider = voo is None
+        if lider:
+            voo = _VOOS[key] = _Voo()
+    if not lider:
+        voo.evento.wait()
+        if voo.erro is not None:
+            raise voo.erro
+        return voo.resultado
+    try:
+        voo.resultado = fn()
+        return voo.resultado
+    except Exception as e:
+        voo.erro = e
+        raise
+    finally:
+        with _VOOS_LOCK:
+            _VOOS.pop(key, None)
+        voo.evento.set()
+
+def _lock_caminho(key):
+    """Arquivo de flock da chave; None quando ela não leva lock entre processos."""
+    if fcntl is None or not isinstance(_CACHE, SQLiteCache) or not _LOCK_CHAVE_RE.match(key):
+        return None
+    return os.path.join(_LOCK_DIR, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".lock")
+
+def _lock_ocupado(key):
+    """True se alguém (outro worker ou outra thread) segura o flock da chave."""
+    caminho = _lock_caminho(key)
+    if caminho is None or not os.path.exists(caminho):
+        return False
+    with open(caminho, "a") as fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.flock(fh, fcntl.LOCK_UN)
+    return False
+
+@contextmanager
+def _lock_entre_processos(key):
+    """flock por chave de pauta; só faz sentido quando o cache é compartilhado
+    (SQLite). Desiste após _LOCK_TIMEOUT_SECONDS para não travar o worker."""
+    caminho = _lock_caminho(key)
+    if caminho is None:
+        yield
+        return
+    os.makedirs(_LOCK_DIR, exist_ok=True)
+    with open(caminho, "a") as fh:
+        limite = _now() + _LOCK_TIMEOUT_SECONDS
+        travado = False
+        while True:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                travado = True
+                break
+            except OSError:
+                if _now() > limite:
+                    logger.warning(f"lock {key}: timeout, seguindo sem lock.")
+                    break
+                _sleep(0.1)
+        try:
+            yield
+        finally:
+            if travado:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+def _fresco(entrada, idade_max=None):
+    _val, criado, expira = entrada
+    agora = _now()
+    return agora <= expira and (idade_max is None or agora - criado < idade_max)
+
+def _atualizar_cache(key, builder, ttl=None, idade_max=None):
+    """Reconstrói a entrada com single-flight (e, com o backend SQLite, lock
+    entre workers nas chaves de pauta). Se ao obter o lock outro chamador já tiver gravado uma
+    entrada fresca (e mais nova que idade_max), ela é reaproveitada."""
+    def _voo():
+        with _lock_entre_processos(key):
+            e = _cache_get_entry(key)
+            if e is not None and _fresco(e, idade_max):
+                return e[0]
+            val = builder()
+            _cache_set(key, val, ttl)
+            return val
+
+    return _single_flight(key, _voo)
+
+def _cache_get_or_build(key, builder, ttl=None):
+    """Cache + single-flight: em um miss, só um chamador executa builder().
+    Se builder() falhar por causa da API (disjuntor aberto, rede, HTTP), a
+    entrada vencida ainda dentro de STALE_MAX_SECONDS é servida no lugar."""
+    e = _cache_get_entry(key)
+    if e is not None and _fresco(e):
+        return e[0]
+    try:
+        return _atualizar_cache(key, builder, ttl)
+    except requests.RequestException as err:
+        if e is None:
+            raise
+        logger.warning(f"{key}: {err}; servindo cópia de {int(_now() - e[1])}s atrás.")
+        return e[0]
+
+# -----------------------------------------------------------------------------
+# STALE-WHILE-REVALIDATE
+# -----------------------------------------------------------------------------
+_REFRESH_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="revalida")
+_REVALIDANDO = set()
+_REVALIDANDO_LOCK = threading.Lock()
+
+def _revalidar_em_segundo_plano(key, builder, ttl=None):
+    """Agenda a reconstrução de uma entrada expirada (no máximo uma por chave)."""
+    with _REVALIDANDO_LOCK:
+        if key in _REVALIDANDO:
+            return
+        _REVALIDANDO.add(key)
+
+    def _tarefa():
+        try:
+            _atualizar_cache(key, builder, ttl)
+        except Exception as e:
+            logger.error(f"revalidação {key}: {e}")
+        finally:
+            with _REVALIDANDO_LOCK:
+                _REVALIDANDO.discard(key)
+
+    _REFRESH_POOL.submit(_tarefa)
+
+def _cache_get_swr(key, builder, ttl=None):
+    """Entrada fresca -> devolve; expirada (dentro do teto) -> devolve já e
+    revalida em segundo plano; ausente -> constrói (com single-flight)."""
+    e = _cache_get_entry(key)
+    if e is not None:
+        if not _fresco(e):
+            _revalidar_em_segundo_plano(key, builder, ttl)
+        return e[0]
+    return _atualizar_cache(key, builder, ttl)
+
 
 # -----------------------------------------------------------------------------
 # UTILS
 # -----------------------------------------------------------------------------
+_TZ_BR = pytz.timezone("America/Sao_Paulo")
+
+def _hoje():
+    """Hoje em Brasília. O servidor roda em UTC: a partir das 21h,
+    date.today() já é amanhã enquanto a sessão da noite ainda corre."""
+    return datetime.now(_TZ_BR).date()
+
 def norm(v):
     if v is None:
         return ""
@@ -142,6 +1271,16 @@ def _json_or_xml(resp):
         except Exception:
             return None, None
 
+def _json_or_xml_bytes(content):
+    """Mesmo que _json_or_xml, a partir do corpo bruto (motor assíncrono)."""
+    try:
+        return json.loads(content), None
+    except Exception:
+        try:
+            return None, ET.fromstring(content)
+        except Exception:
+            return None, None
+
 def _parse_datetime_flex(dt_str):
     if not dt_str:
         return ""
@@ -172,198 +1311,689 @@ def _get(d, *path, default=""):
     return cur if cur is not None else default
 
 # -----------------------------------------------------------------------------
-# DADOS COMPLEMENTARES (autores, destaques, deputados)
+# DIRETÓRIO DE DEPUTADOS (carga em lote de /deputados + fallback individual)
 # -----------------------------------------------------------------------------
-_PROP_META_CACHE_KEY = "prop_meta:"
-_REL_CACHE_KEY = "rel:"
+_DEP_TTL_SECONDS = int(os.environ.get("DEPUTADOS_TTL", 6 * 3600))
+_DEP_RETRY_SECONDS = 60
+_DEP_MAX_PAGINAS = 20
+_DEP_ID_RE = re.compile(r"/deputados/(\d+)")
 
-def obter_meta_proposicao(id_proposicao):
-    """Usado para detalhes extras quando necessário (ex.: validações)."""
-    ck = f"{_PROP_META_CACHE_KEY}{id_proposicao}"
-    c = _cache_get(ck)
-    if c is not None:
-        return c
-    try:
-        r = SESSION.get(f"{API_URL}/proposicoes/{id_proposicao}", timeout=12)
-        r.raise_for_status()
-        j, x = _json_or_xml(r)
-        meta = {"siglaTipo": "", "numero": "", "ano": "", "ementa": ""}
-        if j is not None:
-            d = j.get("dados", {}) or {}
-            meta["siglaTipo"] = norm(d.get("siglaTipo"))
-            meta["numero"] = norm(d.get("numero"))
-            meta["ano"] = norm(d.get("ano"))
-            meta["ementa"] = norm(d.get("ementa"))
-        elif x is not None:
-            def tx(p):
-                e = x.find(p)
-                return norm(e.text if (e is not None and e.text) else "")
-            meta["siglaTipo"] = tx(".//siglaTipo")
-            meta["numero"] = tx(".//numero")
-            meta["ano"] = tx(".//ano")
-            meta["ementa"] = tx(".//ementa")
-        _cache_set(ck, meta)
-        return meta
-    except Exception as e:
-        logger.warning(f"meta {id_proposicao}: {e}")
-        return {"siglaTipo": "", "numero": "", "ano": "", "ementa": ""}
+_DEP_DIR = {"por_id": {}, "ts": 0.0}
+_DEP_LOCK = threading.Lock()        # protege por_id (trocas e entradas avulsas)
+_DEP_CARGA_LOCK = threading.Lock()  # uma carga da listagem por vez
+# URIs fora da listagem que falharam no fallback (ex-deputado, autor que não é
+# deputado): não voltam a /deputados/{id} por DEPUTADO_FALHA_TTL segundos
+_DEP_FALHA_TTL = int(os.environ.get("DEPUTADO_FALHA_TTL", 600))
+_DEP_FALHAS_MAX = 2048
+_DEP_FALHAS = OrderedDict()  # id -> quando falhou (LRU limitado, sob _DEP_LOCK)
 
-def obter_sigla_partido_por_deputado_uri(uri_deputado):
-    uri_deputado = norm(uri_deputado)
-    if not uri_deputado:
-        return ""
-    try:
-        r = SESSION.get(uri_deputado, timeout=10)
-        r.raise_for_status()
-        j, x = _json_or_xml(r)
-        if j is not None:
-            d = j.get("dados", {}) or {}
-            u = d.get("ultimoStatus", {}) or {}
-            return norm(u.get("siglaPartido") or d.get("siglaPartido"))
-        elif x is not None:
-            return norm(x.findtext(".//siglaPartido"))
-    except Exception as e:
-        logger.warning(f"partido {uri_deputado}: {e}")
-    return ""
+def _deputado_id(uri_ou_id):
+    s = norm(uri_ou_id)
+    if s.isdigit():
+        return s
+    m = _DEP_ID_RE.search(s)
+    return m.group(1) if m else ""
 
-def obter_foto_por_deputado_uri(uri_deputado):
-    uri_deputado = norm(uri_deputado)
-    if not uri_deputado:
-        return ""
-    try:
-        r = SESSION.get(uri_deputado, timeout=10)
+def _deputado_from_dados(d):
+    """Normaliza um deputado vindo da listagem ou do detalhe (ultimoStatus)."""
+    u = d.get("ultimoStatus", {}) or {}
+    return {
+        "id": norm(d.get("id") or u.get("id")),
+        "uri": norm(d.get("uri") or u.get("uri")),
+        "nome": norm(u.get("nome") or d.get("nome")),
+        "sigla_partido": norm(u.get("siglaPartido") or d.get("siglaPartido")),
+        "url_foto": norm(u.get("urlFoto") or d.get("urlFoto")),
+    }
+
+def _carregar_diretorio_deputados():
+    """Todos os deputados em exercício, seguindo os links "next" da paginação."""
+    por_id = {}
+    url = f"{API_URL}/deputados"
+    params = {"itens": 100, "pagina": 1, "ordem": "ASC", "ordenarPor": "nome"}
+    for _ in range(_DEP_MAX_PAGINAS):
+        r = SESSION.get(url, params=params, timeout=15)
         r.raise_for_status()
-        j, x = _json_or_xml(r)
-        if j is not None:
-            d = j.get("dados", {}) or {}
-            u = d.get("ultimoStatus", {}) or {}
-            return norm(u.get("urlFoto") or d.get("urlFoto"))
-        elif x is not None:
-            return norm(x.findtext(".//urlFoto"))
-    except Exception as e:
-        logger.warning(f"foto {uri_deputado}: {e}")
-    return ""
+        j = r.json()
+        for d in j.get("dados", []) or []:
+            dep = _deputado_from_dados(d)
+            if dep["id"]:
+                por_id[dep["id"]] = dep
+        url = next((lk.get("href") for lk in j.get("links", []) or [] if lk.get("rel") == "next"), None)
+        if not url:
+            break
+        params = None  # o link "next" já traz a query completa
+    return por_id
 
-def obter_autores_proposicao(id_proposicao):
-    """Lista simples de autores com partido quando for deputado."""
+def _recarregar_diretorio():
+    """Carrega a listagem fora de _DEP_LOCK e troca o índice de uma vez
+    (chamar com _DEP_CARGA_LOCK)."""
     try:
-        r = SESSION.get(f"{API_URL}/proposicoes/{id_proposicao}/autores", timeout=12)
-        r.raise_for_status()
-        j, x = _json_or_xml(r)
-        bases = []
-        if j is not None:
-            for a in j.get("dados", []) or []:
-                nome = norm(a.get("nome") or (a.get("autor") or {}).get("nome"))
-                uri  = norm(a.get("uri")  or a.get("uriAutor") or (a.get("autor") or {}).get("uri"))
-                bases.append({"nome": nome, "uri": uri})
-        elif x is not None:
-            for el in x.findall(".//autor_"):
-                bases.append({"nome": norm(el.findtext("nome")), "uri": norm(el.findtext("uri"))})
-
-        def nome_partido(b):
-            sig = obter_sigla_partido_por_deputado_uri(b["uri"]) if (b["uri"] and "/deputados/" in b["uri"]) else ""
-            return _format_nome_partido(b["nome"], sig)
-
-        nomes = []
-        with ThreadPoolExecutor(max_workers=6) as pool:
-            futures = [pool.submit(nome_partido, b) for b in bases]
-            for f in as_completed(futures):
-                try:
-                    nomes.append(f.result())
-                except Exception as e:
-                    logger.warning(f"autor fmt: {e}")
-        if len(nomes) != len(bases):
-            nomes = [nome_partido(b) for b in bases]
-        return [n for n in nomes if n]
+        por_id = _carregar_diretorio_deputados()
     except Exception as e:
-        logger.error(f"autores {id_proposicao}: {e}")
-        return []
+        logger.warning(f"diretório deputados: {e}")
+        # Tenta de novo em _DEP_RETRY_SECONDS, sem martelar a API
+        _DEP_DIR["ts"] = _now() - _DEP_TTL_SECONDS + _DEP_RETRY_SECONDS
+        return
+    with _DEP_LOCK:
+        # Mantém entradas avulsas (ex.: ex-deputados vindos do fallback)
+        _DEP_DIR["por_id"] = {**_DEP_DIR["por_id"], **por_id}
+        _DEP_DIR["ts"] = _now()
+    logger.info(f"Diretório de deputados carregado: {len(por_id)} entradas.")
 
-def obter_detalhes_destaque(id_destaque):
+def _recarregar_diretorio_em_segundo_plano():
     try:
-        r = SESSION.get(f"{API_URL}/proposicoes/{id_destaque}", timeout=10)
-        r.raise_for_status()
-        j, x = _json_or_xml(r)
-        d = {}
-        if j is not None:
-            d = j.get("dados", {}) or {}
-        elif x is not None:
-            d = {
-                "numero": x.findtext(".//numero") or "",
-                "siglaTipo": x.findtext(".//siglaTipo") or "",
-                "dataApresentacao": x.findtext(".//dataApresentacao") or "",
-                "ementa": x.findtext(".//ementa") or "",
-                "urlInteiroTeor": x.findtext(".//urlInteiroTeor") or "",
-            }
-        return {
-            "numero": norm(d.get("numero")),
-            "sigla_tipo": norm(d.get("siglaTipo") or "DTQ"),
-            "data_hora": _parse_datetime_flex(norm(d.get("dataApresentacao"))),
-            "ementa": norm(d.get("ementa")),
-            "url_inteiro_teor": norm(d.get("urlInteiroTeor")),
+        _recarregar_diretorio()
+    finally:
+        _DEP_CARGA_LOCK.release()
+
+def _diretorio_deputados():
+    """Índice id -> deputado, recarregado a cada DEPUTADOS_TTL segundos. Só a
+    primeira carga bloqueia; depois a recarga roda numa thread e as consultas
+    seguem com o índice atual até o novo ficar pronto."""
+    if _now() - _DEP_DIR["ts"] <= _DEP_TTL_SECONDS:
+        return _DEP_DIR["por_id"]
+    if _DEP_DIR["ts"]:
+        if _DEP_CARGA_LOCK.acquire(blocking=False):
+            threading.Thread(target=_recarregar_diretorio_em_segundo_plano, name="diretorio-deputados",
+                             daemon=True).start()
+        return _DEP_DIR["por_id"]
+    with _DEP_CARGA_LOCK:
+        if not _DEP_DIR["ts"]:
+            _recarregar_diretorio()
+    return _DEP_DIR["por_id"]
+
+def _parse_deputado(j, x, uri_deputado):
+    if j is not None:
+        dep = _deputado_from_dados(j.get("dados", {}) or {})
+    elif x is not None:
+        dep = {
+            "id": norm(x.findtext(".//id")),
+            "uri": norm(x.findtext(".//uri")),
+            "nome": norm(x.findtext(".//ultimoStatus/nome") or x.findtext(".//nome")),
+            "sigla_partido": norm(x.findtext(".//siglaPartido")),
+            "url_foto": norm(x.findtext(".//urlFoto")),
         }
-    except Exception as e:
-        logger.error(f"destaque {id_destaque}: {e}")
-        return {}
+    else:
+        return None
+    dep["uri"] = dep["uri"] or uri_deputado
+    return dep
 
-def obter_destaques_dtq(id_proposicao):
+def _indexar_deputado(dep_id, dep):
+    dep["id"] = dep["id"] or dep_id
+    with _DEP_LOCK:
+        _DEP_DIR["por_id"][dep_id] = dep
+
+def _deputado_falhou_recentemente(dep_id):
+    with _DEP_LOCK:
+        return _now() - _DEP_FALHAS.get(dep_id, 0) < _DEP_FALHA_TTL
+
+def _registrar_falha_deputado(dep_id):
+    with _DEP_LOCK:
+        _DEP_FALHAS[dep_id] = _now()
+        _DEP_FALHAS.move_to_end(dep_id)
+        while len(_DEP_FALHAS) > _DEP_FALHAS_MAX:
+            _DEP_FALHAS.popitem(last=False)
+
+def _buscar_deputado(uri_deputado):
+    """Fallback: consulta individual /deputados/{id} (só para misses do diretório)."""
     try:
-        r = SESSION.get(f"{API_URL}/proposicoes/{id_proposicao}/relacionadas", timeout=15)
+        r = SESSION.get(uri_deputado, timeout=10)
         r.raise_for_status()
         j, x = _json_or_xml(r)
-        rels = []
-        if j is not None:
-            for rr in j.get("dados", []) or []:
-                if rr.get("siglaTipo") == "DTQ":
-                    rels.append({
-                        "id": rr.get("id"),
-                        "descricaoTipo": norm(rr.get("descricaoTipo")),
-                        "despacho": norm(rr.get("despacho")),
-                    })
-        elif x is not None:
-            for el in x.findall(".//relacionada_"):
-                if norm(el.findtext("siglaTipo")) == "DTQ":
-                    rels.append({
-                        "id": norm(el.findtext("id")),
-                        "descricaoTipo": norm(el.findtext("descricaoTipo")),
-                        "despacho": norm(el.findtext("despacho")),
-                    })
-
-        out = []
-        for rel in rels:
-            did = rel.get("id")
-            if not did:
-                continue
-            det = obter_detalhes_destaque(did)
-            autores = obter_autores_proposicao(did)
-            out.append(Destaque(
-                id_proposicao=did,
-                numero=det.get("numero", ""),
-                sigla_tipo=det.get("sigla_tipo", "DTQ"),
-                data_hora=det.get("data_hora", ""),
-                ementa=det.get("ementa", ""),
-                url_inteiro_teor=det.get("url_inteiro_teor", ""),
-                descricao_tipo=rel.get("descricaoTipo", ""),
-                despacho=rel.get("despacho", ""),
-                autores=autores,
-            ))
-        return out
+        return _parse_deputado(j, x, uri_deputado)
     except Exception as e:
-        logger.error(f"destaques {id_proposicao}: {e}")
-        return []
+        logger.warning(f"deputado {uri_deputado}: {e}")
+        return None
+
+def obter_deputado(uri_deputado):
+    """Deputado (id, uri, nome, sigla_partido, url_foto) a partir da URI ou do id."""
+    uri_deputado = norm(uri_deputado)
+    dep_id = _deputado_id(uri_deputado)
+    if not dep_id:
+        return None
+    dep = _diretorio_deputados().get(dep_id)
+    if dep is not None:
+        return dep
+    if _deputado_falhou_recentemente(dep_id):
+        return None
+    url = uri_deputado if uri_deputado.startswith("http") else f"{API_URL}/deputados/{dep_id}"
+    with _span(f"deputado {dep_id}"):
+        return _single_flight(f"deputado:{dep_id}", lambda: _buscar_e_indexar_deputado(dep_id, url))
+
+def _buscar_e_indexar_deputado(dep_id, url):
+    dep = _DEP_DIR["por_id"].get(dep_id)  # outro chamador pode ter acabado de indexar
+    if dep is not None:
+        return dep
+    dep = _buscar_deputado(url)
+    if dep:
+        _indexar_deputado(dep_id, dep)
+    else:
+        _registrar_falha_deputado(dep_id)
+    return dep
 
 # -----------------------------------------------------------------------------
-# MONTAGEM DOS ITENS A PARTIR DA *PAUTA* (usando proposicaoRelacionada_ p/ PPP)
+# DADOS COMPLEMENTARES (autores, destaques, deputados)
 # -----------------------------------------------------------------------------
-def _mk_item_from_pauta(item_raw):
-    """
-    Constrói um ItemPauta diretamente do JSON da pauta.
-    Regras:
-      - Se proposicao_.siglaTipo == "PPP" (ou codTipo==192) e houver proposicaoRelacionada_,
-        usamos a relacionada como a *proposição principal* (id, sigla, número, ano, ementa).
-      - Caso contrário, usamos a própria proposicao_.
-    """
-    titulo = _get(item_raw, "titulo", default="").strip()
+# Entidades de proposição ficam no cache (compartilhado entre workers com o
+# backend SQLite) sob "prop:<campo>:<id>", cada campo com seu TTL: as mesmas
+# matérias voltam à pauta por várias sessões, e autoria e conteúdo de um DTQ
+# protocolado quase nunca mudam. Só "relacionadas" (por onde chegam DTQs novos)
+# dura menos que o intervalo do agendador.
+_ENTIDADE_KEY = "prop:"
+_ENTIDADE_TTLS = {
+    "meta": int(os.environ.get("PROP_META_TTL", 7 * 24 * 3600)),
+    "autores": int(os.environ.get("PROP_AUTORES_TTL", 24 * 3600)),
+    "relacionadas": int(os.environ.get("PROP_RELACIONADAS_TTL", 90)),
+    "dtq": int(os.environ.get("DTQ_TTL", 7 * 24 * 3600)),
+}
+
+def _entidade_chave(campo, id_proposicao):
+    return f"{_ENTIDADE_KEY}{campo}:{id_proposicao}"
+
+def entidade_proposicao(campo, id_proposicao, buscar):
+    """Campo de uma proposição: do cache ou de buscar(id), com single-flight.
+    Falhas levantam e não vão para o cache."""
+    return _cache_get_or_build(
+        _entidade_chave(campo, id_proposicao), lambda: buscar(id_proposicao), ttl=_ENTIDADE_TTLS[campo]
+    )
+
+def _semear_meta(itens):
+    """A pauta já traz sigla/número/ano/ementa: grava a meta de quem não tem."""
+    for it in itens:
+        ck = _entidade_chave("meta", it.id_proposicao)
+        if _cache_get(ck) is None:
+            meta = {"siglaTipo": norm(it.sigla_tipo), "numero": norm(it.numero), "ano": norm(it.ano),
+                    "ementa": norm(it.ementa)}
+            _cache_set(ck, meta, _ENTIDADE_TTLS["meta"])
+
+def _buscar_meta_proposicao(id_proposicao):
+    r = SESSION.get(f"{API_URL}/proposicoes/{id_proposicao}", timeout=12)
+    r.raise_for_status()
+    j, x = _json_or_xml(r)
+    meta = {"siglaTipo": "", "numero": "", "ano": "", "ementa": ""}
+    if j is not None:
+        d = j.get("dados", {}) or {}
+        meta["siglaTipo"] = norm(d.get("siglaTipo"))
+        meta["numero"] = norm(d.get("numero"))
+        meta["ano"] = norm(d.get("ano"))
+        meta["ementa"] = norm(d.get("ementa"))
+    elif x is not None:
+        def tx(p):
+            e = x.find(p)
+            return norm(e.text if (e is not None and e.text) else "")
+        meta["siglaTipo"] = tx(".//siglaTipo")
+        meta["numero"] = tx(".//numero")
+        meta["ano"] = tx(".//ano")
+        meta["ementa"] = tx(".//ementa")
+    return meta
+
+def obter_meta_proposicao(id_proposicao):
+    """Usado para detalhes extras quando necessário (ex.: validações)."""
+    try:
+        return entidade_proposicao("meta", id_proposicao, _buscar_meta_proposicao)
+    except Exception as e:
+        logger.warning(f"meta {id_proposicao}: {e}")
+        return {"siglaTipo": "", "numero": "", "ano": "", "ementa": ""}
+
+def obter_sigla_partido_por_deputado_uri(uri_deputado):
+    dep = obter_deputado(uri_deputado)
+    return dep["sigla_partido"] if dep else ""
+
+def obter_foto_por_deputado_uri(uri_deputado):
+    dep = obter_deputado(uri_deputado)
+    return dep["url_foto"] if dep else ""
+
+def obter_autores_proposicao(id_proposicao):
+    """(autores, ok): lista simples de autores com partido quando for deputado;
+    ok=False quando a API falhou (lista vazia, que não deve ser congelada)."""
+    with _span(f"autores {id_proposicao}"):
+        try:
+            return entidade_proposicao("autores", id_proposicao, _buscar_autores), True
+        except Exception as e:
+            logger.error(f"autores {id_proposicao}: {e}")
+            return [], False
+
+def _parse_autores(j, x):
+    bases = []
+    if j is not None:
+        for a in j.get("dados", []) or []:
+            nome = norm(a.get("nome") or (a.get("autor") or {}).get("nome"))
+            uri  = norm(a.get("uri")  or a.get("uriAutor") or (a.get("autor") or {}).get("uri"))
+            bases.append({"nome": nome, "uri": uri})
+    elif x is not None:
+        for el in x.findall(".//autor_"):
+            bases.append({"nome": norm(el.findtext("nome")), "uri": norm(el.findtext("uri"))})
+    return bases
+
+def _e_deputado(uri):
+    return bool(uri) and "/deputados/" in uri
+
+def _buscar_autores(id_proposicao):
+    r = SESSION.get(f"{API_URL}/proposicoes/{id_proposicao}/autores", timeout=12)
+    r.raise_for_status()
+    bases = _parse_autores(*_json_or_xml(r))
+
+    def nome_partido(b):
+        sig = obter_sigla_partido_por_deputado_uri(b["uri"]) if _e_deputado(b["uri"]) else ""
+        return _format_nome_partido(b["nome"], sig)
+
+    # Partidos vêm do diretório em memória; só misses vão à API.
+    nomes = [nome_partido(b) for b in bases]
+    return [n for n in nomes if n]
+
+def _parse_detalhes_destaque(j, x):
+    d = {}
+    if j is not None:
+        d = j.get("dados", {}) or {}
+    elif x is not None:
+        d = {
+            "numero": x.findtext(".//numero") or "",
+            "siglaTipo": x.findtext(".//siglaTipo") or "",
+            "dataApresentacao": x.findtext(".//dataApresentacao") or "",
+            "ementa": x.findtext(".//ementa") or "",
+            "urlInteiroTeor": x.findtext(".//urlInteiroTeor") or "",
+        }
+    return {
+        "numero": norm(d.get("numero")),
+        "sigla_tipo": norm(d.get("siglaTipo") or "DTQ"),
+        "data_hora": _parse_datetime_flex(norm(d.get("dataApresentacao"))),
+        "ementa": norm(d.get("ementa")),
+        "url_inteiro_teor": norm(d.get("urlInteiroTeor")),
+    }
+
+def _buscar_detalhes_destaque(id_destaque):
+    r = SESSION.get(f"{API_URL}/proposicoes/{id_destaque}", timeout=10)
+    r.raise_for_status()
+    return _parse_detalhes_destaque(*_json_or_xml(r))
+
+def _parse_relacionadas_dtq(j, x):
+    rels = []
+    if j is not None:
+        for rr in j.get("dados", []) or []:
+            if rr.get("siglaTipo") == "DTQ":
+                rels.append({
+                    "id": rr.get("id"),
+                    "descricaoTipo": norm(rr.get("descricaoTipo")),
+                    "despacho": norm(rr.get("despacho")),
+                })
+    elif x is not None:
+        for el in x.findall(".//relacionada_"):
+            if norm(el.findtext("siglaTipo")) == "DTQ":
+                rels.append({
+                    "id": norm(el.findtext("id")),
+                    "descricaoTipo": norm(el.findtext("descricaoTipo")),
+                    "despacho": norm(el.findtext("despacho")),
+                })
+    return [rel for rel in rels if rel.get("id")]
+
+def _buscar_relacionadas(id_proposicao):
+    r = SESSION.get(f"{API_URL}/proposicoes/{id_proposicao}/relacionadas", timeout=15)
+    r.raise_for_status()
+    return _parse_relacionadas_dtq(*_json_or_xml(r))
+
+def obter_relacionadas_dtq(id_proposicao):
+    """DTQs relacionados à proposição ([{id, descricaoTipo, despacho}]); levanta em falha."""
+    return entidade_proposicao("relacionadas", id_proposicao, _buscar_relacionadas)
+
+def _mk_destaque(rel, det, autores):
+    return Destaque(
+        id_proposicao=rel.get("id"),
+        numero=det.get("numero", ""),
+        sigla_tipo=det.get("sigla_tipo", "DTQ"),
+        data_hora=det.get("data_hora", ""),
+        ementa=det.get("ementa", ""),
+        url_inteiro_teor=det.get("url_inteiro_teor", ""),
+        descricao_tipo=rel.get("descricaoTipo", ""),
+        despacho=rel.get("despacho", ""),
+        autores=autores,
+    )
+
+# Detalhes e autores de um DTQ (entidade "dtq", DTQ_TTL) são buscados num pool
+# global limitado (DTQ_WORKERS), em vez de um a um dentro de cada item. Só DTQs
+# novos vão à API a cada atualização.
+_DTQ_WORKERS = int(os.environ.get("DTQ_WORKERS", 8))
+_DTQ_POOL = ThreadPoolExecutor(max_workers=_DTQ_WORKERS, thread_name_prefix="dtq")
+
+def _buscar_destaque_base(id_destaque):
+    # Levanta em caso de falha para que nada incompleto vá para o cache
+    return {"det": _buscar_detalhes_destaque(id_destaque), "autores": _buscar_autores(id_destaque)}
+
+def obter_destaque_base(id_destaque):
+    """{"det": detalhes, "autores": [...]} de um DTQ, com cache de longa duração."""
+    with _span(f"dtq {id_destaque}"):
+        return entidade_proposicao("dtq", id_destaque, _buscar_destaque_base)
+
+def obter_destaques_dtq(id_proposicao):
+    """(destaques, ok): ok=False se as relacionadas ou algum DTQ falharam."""
+    with _span(f"destaques {id_proposicao}"):
+        return _single_flight(f"destaques:{id_proposicao}", lambda: _obter_destaques_dtq(id_proposicao))
+
+def _obter_destaques_dtq(id_proposicao):
+    try:
+        rels = obter_relacionadas_dtq(id_proposicao)
+
+        # Já vistos saem do cache aqui mesmo; só os novos vão para o pool
+        bases = {rel["id"]: _cache_get(_entidade_chave("dtq", rel["id"])) for rel in rels}
+        futs = {did: _DTQ_POOL.submit(_propagar(obter_destaque_base), did) for did, b in bases.items() if b is None}
+
+        out, ok = [], True
+        for rel in rels:
+            did = rel["id"]
+            base = bases.get(did)
+            if base is None:
+                try:
+                    base = futs[did].result()
+                except Exception as e:
+                    logger.error(f"destaque {did}: {e}")
+                    base, ok = {"det": {}, "autores": []}, False
+            out.append(_mk_destaque(rel, base["det"], base["autores"]))
+        return out, ok
+    except Exception as e:
+        logger.error(f"destaques {id_proposicao}: {e}")
+        return [], False
+
+# -----------------------------------------------------------------------------
+# MODO PREGUIÇOSO (autores e DTQ por proposição, sob demanda)
+# -----------------------------------------------------------------------------
+# PAUTA_PREGUICOSA=true monta a pauta só com a base de cada item e os ids dos
+# DTQ (entidade "relacionadas"); autores e destaques completos vêm de
+# /api/proposicao/<id>/{autores,destaques} quando a página os abre, pelas
+# mesmas entidades em cache da montagem completa.
+_PAUTA_PREGUICOSA = os.environ.get("PAUTA_PREGUICOSA", "false").lower() == "true"
+
+def _buscar_ids_destaques(id_proposicao):
+    """(ids, ok), como obter_destaques_dtq."""
+    try:
+        return [rel["id"] for rel in obter_relacionadas_dtq(id_proposicao)], True
+    except Exception as e:
+        logger.error(f"relacionadas {id_proposicao}: {e}")
+        return [], False
+
+def _preencher_ids_destaques(itens):
+    """ids_destaques de cada item, em paralelo no pool dos DTQ."""
+    buscar = _propagar(_buscar_ids_destaques)
+    futs = [(it, _DTQ_POOL.submit(buscar, it.id_proposicao)) for it in itens]
+    for it, f in futs:
+        it.ids_destaques, ok = f.result()
+        it.degradado = not ok
+
+# -----------------------------------------------------------------------------
+# MOTOR ASSÍNCRONO (asyncio + aiohttp, orçamento global de concorrência)
+# -----------------------------------------------------------------------------
+# ENRIQUECIMENTO=async troca os ThreadPoolExecutors aninhados por um único loop
+# asyncio por worker, com um ClientSession aiohttp (pool de HTTP_POOL conexões)
+# e um semáforo global do mesmo tamanho. ENRIQUECIMENTO=sync (padrão) mantém o
+# caminho com threads, que também é o fallback se o motor falhar.
+_ENRIQUECIMENTO = os.environ.get("ENRIQUECIMENTO", "sync").lower()
+_HTTP_TIMEOUT_ASYNC = 15
+
+async def _nenhum():
+    return None
+
+async def _valor(v):
+    return v
+
+async def _com_span(span, coro):
+    # A task criada no loop do motor não herda o contexto da thread chamadora
+    _TRACE.set(span)
+    return await coro
+
+class _MotorAsync:
+    def __init__(self, limite):
+        self.limite = limite
+        self.loop = None
+        self.sessao = None
+        self.sem = None
+        self._voos = {}
+        self._lock = threading.Lock()
+
+    def _garantir_loop(self):
+        if self.loop is not None:
+            return
+        with self._lock:
+            if self.loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="motor-async", daemon=True).start()
+
+            async def _init():
+                self.sem = asyncio.Semaphore(self.limite)
+                self.sessao = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=self.limite, ttl_dns_cache=300),
+                    headers=_HTTP_HEADERS,
+                    timeout=aiohttp.ClientTimeout(total=_HTTP_TIMEOUT_ASYNC),
+                )
+
+            asyncio.run_coroutine_threadsafe(_init(), loop).result()
+            self.loop = loop
+
+    def fechar(self):
+        if self.loop is not None and self.sessao is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self.sessao.close(), self.loop).result(5)
+            except Exception:
+                pass
+
+    def pre_conectar(self, url, n):
+        """Abre até n conexões do pool com HEADs simultâneos; devolve quantas."""
+        self._garantir_loop()
+
+        async def _abrir():
+            async with self.sem:
+                async with self.sessao.head(url) as r:
+                    return r.status
+
+        async def _todas():
+            rs = await asyncio.gather(*(_abrir() for _ in range(n)), return_exceptions=True)
+            return sum(1 for r in rs if not isinstance(r, BaseException))
+
+        return asyncio.run_coroutine_threadsafe(_todas(), self.loop).result(_HTTP_TIMEOUT_ASYNC)
+
+    def executar(self, coro_fn, *args):
+        """Roda a corrotina no loop do motor e bloqueia a thread chamadora."""
+        self._garantir_loop()
+        return asyncio.run_coroutine_threadsafe(_com_span(_TRACE.get(), coro_fn(*args)), self.loop).result()
+
+    async def _cache(self, fn, *args):
+        """Chamada ao cache a partir do loop. O SQLite (zlib, commit no WAL)
+        roda numa thread para não parar as outras montagens do loop; o de
+        memória é um dict e vai direto."""
+        if isinstance(_CACHE, SQLiteCache):
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def _voo(self, chave, coro_fn, *args):
+        # Single-flight dentro do loop: vale para todas as montagens em curso
+        t = self._voos.get(chave)
+        if t is None:
+            t = asyncio.ensure_future(coro_fn(*args))
+            self._voos[chave] = t
+            t.add_done_callback(lambda _t: self._voos.pop(chave, None))
+        return await t
+
+    async def get(self, url):
+        """GET com as mesmas retentativas (status e backoff) e a mesma
+        revalidação condicional do _AdapterCondicional."""
+        salvo = await self._cache(_http_cache_salvo, url)
+        if salvo and salvo.get("fresco_ate", 0) > _now():
+            _http_contar("hit")
+            _registrar_chamada(_familia(url), "hit", url)
+            return _json_or_xml_bytes(salvo["texto"])
+        try:
+            return await self._get_rede(url, salvo)
+        except (UpstreamIndisponivel, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if isinstance(e, aiohttp.ClientResponseError) and e.status < 500:
+                raise
+            if not salvo:
+                if isinstance(e, UpstreamIndisponivel):
+                    _registrar_chamada(_familia(url), "recusada", url)
+                raise
+            _http_contar("obsoleto")
+            _registrar_chamada(_familia(url), "obsoleto", url)
+            return _json_or_xml_bytes(salvo["texto"])
+
+    async def _get_rede(self, url, salvo):
+        headers = _http_headers_condicionais(salvo)
+        for tentativa in range(_RETRY_TOTAL + 1):
+            disj, espera = _upstream_liberar(url)
+            if espera:
+                await asyncio.sleep(espera)
+            async with self.sem:
+                t0 = _now()
+                try:
+                    r = await self.sessao.get(url, headers=headers)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    _upstream_registrar(disj, None)
+                    _registrar_chamada(disj.familia, "rede", url, _now() - t0, "erro", tentativa)
+                    raise
+                async with r:
+                    _upstream_registrar(disj, r.status, r.headers)
+                    corpo = b"" if r.status == 304 else await r.read()
+                    _registrar_chamada(disj.familia, "rede", url, _now() - t0, r.status, tentativa, len(corpo))
+                    if r.status == 304 and salvo:
+                        _http_contar("revalidado_304")
+                        await self._cache(_http_cache_guardar, url, r.headers, None, salvo)
+                        return _json_or_xml_bytes(salvo["texto"])
+                    if r.status not in _RETRY_STATUS or tentativa == _RETRY_TOTAL:
+                        r.raise_for_status()
+                        _http_contar("completo_200" if r.status == 200 else "outros")
+                        if r.status == 200:
+                            try:
+                                await self._cache(_http_cache_guardar, url, r.headers, corpo.decode("utf-8"))
+                            except UnicodeDecodeError:
+                                pass
+                        return _json_or_xml_bytes(corpo)
+                    pausa = max(_RETRY_BACKOFF * (2 ** tentativa), _retry_after(r.headers.get("Retry-After")))
+            await asyncio.sleep(pausa)
+
+    async def deputado(self, uri):
+        dep_id = _deputado_id(uri)
+        if not dep_id:
+            return None
+        dep = _DEP_DIR["por_id"].get(dep_id)
+        if dep is not None:
+            return dep
+        if _deputado_falhou_recentemente(dep_id):
+            return None
+        return await self._voo(f"deputado:{dep_id}", self._buscar_deputado, dep_id, uri)
+
+    async def _buscar_deputado(self, dep_id, uri):
+        url = uri if uri.startswith("http") else f"{API_URL}/deputados/{dep_id}"
+        try:
+            with _span(f"deputado {dep_id}"):
+                dep = _parse_deputado(*await self.get(url), url)
+        except Exception as e:
+            logger.warning(f"deputado {url}: {e}")
+            dep = None
+        if dep:
+            _indexar_deputado(dep_id, dep)
+        else:
+            _registrar_falha_deputado(dep_id)
+        return dep
+
+    async def _entidade(self, campo, id_proposicao, coro_fn):
+        """Mesmas entidades em cache do caminho síncrono; falhas não são
+        guardadas e, como lá, servem a cópia vencida quando houver."""
+        ck = _entidade_chave(campo, id_proposicao)
+        e = await self._cache(_cache_get_entry, ck)
+        if e is not None and _fresco(e):
+            return e[0]
+
+        async def _buscar():
+            v = await coro_fn(id_proposicao)
+            await self._cache(_cache_set, ck, v, _ENTIDADE_TTLS[campo])
+            return v
+
+        try:
+            return await self._voo(ck, _buscar)
+        except (requests.RequestException, aiohttp.ClientError, asyncio.TimeoutError) as err:
+            if e is None:
+                raise
+            logger.warning(f"{ck}: {err}; servindo cópia de {int(_now() - e[1])}s atrás.")
+            return e[0]
+
+    async def _buscar_autores(self, id_proposicao):
+        bases = _parse_autores(*await self.get(f"{API_URL}/proposicoes/{id_proposicao}/autores"))
+        deps = await asyncio.gather(*(
+            self.deputado(b["uri"]) if _e_deputado(b["uri"]) else _nenhum() for b in bases
+        ))
+        nomes = [_format_nome_partido(b["nome"], (d or {}).get("sigla_partido", "")) for b, d in zip(bases, deps)]
+        return [n for n in nomes if n]
+
+    async def autores(self, id_proposicao):
+        try:
+            with _span(f"autores {id_proposicao}"):
+                return await self._entidade("autores", id_proposicao, self._buscar_autores), True
+        except Exception as e:
+            logger.error(f"autores {id_proposicao}: {e}")
+            return [], False
+
+    async def _buscar_destaque_base(self, id_destaque):
+        with _span(f"dtq {id_destaque}"):
+            det, autores = await asyncio.gather(
+                self.get(f"{API_URL}/proposicoes/{id_destaque}"),
+                self._buscar_autores(id_destaque),
+            )
+        return {"det": _parse_detalhes_destaque(*det), "autores": autores}
+
+    async def _buscar_relacionadas(self, id_proposicao):
+        return _parse_relacionadas_dtq(*await self.get(f"{API_URL}/proposicoes/{id_proposicao}/relacionadas"))
+
+    async def destaques(self, id_proposicao):
+        with _span(f"destaques {id_proposicao}"):
+            return await self._destaques(id_proposicao)
+
+    async def _destaques(self, id_proposicao):
+        try:
+            rels = await self._entidade("relacionadas", id_proposicao, self._buscar_relacionadas)
+        except Exception as e:
+            logger.error(f"destaques {id_proposicao}: {e}")
+            return [], False
+
+        async def _um(rel):
+            did = rel["id"]
+            try:
+                base = await self._entidade("dtq", did, self._buscar_destaque_base)
+            except Exception as e:
+                logger.error(f"destaque {did}: {e}")
+                return _mk_destaque(rel, {}, []), False
+            return _mk_destaque(rel, base["det"], base["autores"]), True
+
+        feitos = await asyncio.gather(*(_um(rel) for rel in rels))
+        return [d for d, _ok in feitos], all(ok for _d, ok in feitos)
+
+    async def enriquecer(self, itens, com_autores):
+        # Diretório de deputados é síncrono: carrega/renova fora do loop
+        await asyncio.to_thread(_diretorio_deputados)
+
+        async def _item(it):
+            pid = it.id_proposicao
+            with _span(f"item {pid}"):
+                (it.autores, ok_autores), (it.destaques, ok_destaques) = await asyncio.gather(
+                    self._voo(f"autores:{pid}", self.autores, pid) if pid in com_autores else _valor((it.autores, True)),
+                    self._voo(f"destaques:{pid}", self.destaques, pid),
+                )
+            it.completo = True
+            it.degradado = not (ok_autores and ok_destaques)
+
+        await asyncio.gather(*(_item(it) for it in itens))
+        return itens
+
+_MOTOR = _MotorAsync(_HTTP_POOL)
+atexit.register(_MOTOR.fechar)
+
+# -----------------------------------------------------------------------------
+# MONTAGEM DOS ITENS A PARTIR DA *PAUTA* (usando proposicaoRelacionada_ p/ PPP)
+# -----------------------------------------------------------------------------
+def _mk_item_from_pauta(item_raw):
+    """
+    Constrói um ItemPauta diretamente do JSON da pauta.
+    Regras:
+      - Se proposicao_.siglaTipo == "PPP" (ou codTipo==192) e houver proposicaoRelacionada_,
+        usamos a relacionada como a *proposição principal* (id, sigla, número, ano, ementa).
+      - Caso contrário, usamos a própria proposicao_.
+    """
+    titulo = _get(item_raw, "titulo", default="").strip()
     topico = _get(item_raw, "topico", default="")
     regime = _get(item_raw, "regime", default="")
 
@@ -394,12 +2024,11 @@ def _mk_item_from_pauta(item_raw):
     rel_foto = _get(rel, "urlFoto")
     rel_uri  = _get(rel, "uri")
 
-    # Complementa se faltar
+    # Complementa se faltar (uma única consulta ao diretório)
     if (not rel_part or not rel_foto) and rel_uri:
-        if not rel_part:
-            rel_part = obter_sigla_partido_por_deputado_uri(rel_uri)
-        if not rel_foto:
-            rel_foto = obter_foto_por_deputado_uri(rel_uri)
+        dep = obter_deputado(rel_uri) or {}
+        rel_part = rel_part or dep.get("sigla_partido", "")
+        rel_foto = rel_foto or dep.get("url_foto", "")
 
     return ItemPauta(
         id_proposicao = principal_id,
@@ -415,119 +2044,931 @@ def _mk_item_from_pauta(item_raw):
         autores       = [],        # preencheremos depois
         destaques     = [],        # preencheremos depois
         relator_foto  = rel_foto or "",
+        relator_id    = _deputado_id(rel_uri) or norm(_get(rel, "id")),
+        assinatura    = hashlib.sha1(
+            json.dumps(item_raw, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:16],
+    )
+
+# -----------------------------------------------------------------------------
+# ARQUIVO (sessões encerradas congeladas em disco)
+# -----------------------------------------------------------------------------
+# A pauta enriquecida de uma sessão passada já encerrada não muda mais: é
+# gravada uma vez em ARQUIVO_DIR/<data>.json.gz e servida dali para sempre,
+# sem TTL e sem tocar a API. `flask --app app arquivar INICIO FIM` preenche
+# um intervalo de datas de uma vez.
+_ARQUIVO_DIR = os.environ.get("ARQUIVO_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "arquivo"))
+_SITUACOES_FINAIS = ("encerrada", "cancelada", "finalizada")
+_DATA_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+def _arquivo_caminho(data_str):
+    return os.path.join(_ARQUIVO_DIR, f"{data_str}.json.gz")
+
+def _arquivavel(data_str, res):
+    """Sessão passada, encerrada e montada por inteiro: um item com autores ou
+    DTQ faltando (falha da API) ficaria congelado assim para sempre."""
+    return (
+        bool(_DATA_RE.match(data_str))
+        and data_str < _hoje().strftime("%Y-%m-%d")
+        and res.encontrou and not res.erro and not res.parcial and not res.degradados
+        and any(sf in norm(res.situacao).lower() for sf in _SITUACOES_FINAIS)
     )
 
+def arquivo_ler(data_str):
+    if not _DATA_RE.match(data_str or ""):
+        return None
+    caminho = _arquivo_caminho(data_str)
+    if not os.path.exists(caminho):
+        return None
+    try:
+        with gzip.open(caminho, "rt", encoding="utf-8") as fh:
+            return json.load(fh, object_hook=_json_hook)
+    except Exception as e:
+        logger.error(f"arquivo {data_str}: {e}")
+        return None
+
+def arquivo_gravar(data_str, res):
+    """Grava de forma atômica (tmp + rename) para não expor arquivo pela metade."""
+    os.makedirs(_ARQUIVO_DIR, exist_ok=True)
+    destino = _arquivo_caminho(data_str)
+    tmp = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+    dados = {"__m": "ResultadoPauta", **res.to_dict(), "diff": None}  # diff não faz sentido congelado
+    with gzip.open(tmp, "wt", encoding="utf-8") as fh:
+        json.dump(dados, fh, default=_json_default, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, destino)
+    logger.info(f"Pauta de {data_str} arquivada.")
+
+def _construir_e_arquivar(data_str, eventos=None):
+    """Caminho único de montagem (requisições, agendador, intervalos): trace e
+    métricas, proteção contra falha da API, arquivo e índice de busca."""
+    with _span(f"pauta {data_str}", raiz=True) as raiz:
+        res = _construir_pauta(data_str, eventos)
+    _guardar_trace(data_str, raiz)
+    _METRICAS.observar("pauta_montagem_segundos", raiz.duracao, resultado="erro" if res.erro else "ok")
+    if res.falha_upstream or res.degradados:
+        # API fora (ou falhando em parte, sem cópia para os itens novos): mantém
+        # a última montagem boa em vez de cachear o erro ou a pauta desfalcada
+        anterior = _pauta_anterior(data_str)
+        if anterior is not None and (res.falha_upstream or not anterior.degradados):
+            logger.warning(f"pauta {data_str}: API indisponível, mantendo montagem de {int(_now() - _gerado_em(anterior))}s atrás")
+            return anterior
+    if _arquivavel(data_str, res):
+        try:
+            arquivo_gravar(data_str, res)
+        except Exception as e:
+            logger.error(f"arquivar {data_str}: {e}")
+    indexar_pauta(data_str, res)
+    return res
+
+# -----------------------------------------------------------------------------
+# BUSCA (índice FTS5 local das pautas montadas)
+# -----------------------------------------------------------------------------
+# Toda pauta montada é indexada em segundo plano num SQLite FTS5 (BUSCA_PATH):
+# uma linha por item (título, ementa, relator, autores) e uma por DTQ (ementa,
+# despacho, autores). Reindexar uma data troca as linhas dela, e só acontece
+# se o conteúdo mudou. /api/busca consulta só o índice, sem tráfego com a API;
+# `flask indexar` carrega as datas do arquivo. BUSCA=false desliga.
+_BUSCA_ATIVA = os.environ.get("BUSCA", "true").lower() == "true"
+_BUSCA_PATH = os.environ.get("BUSCA_PATH", os.path.join(os.path.dirname(_CACHE_PATH) or ".", "pauta_busca.sqlite3"))
+_BUSCA_LIMITE_MAX = 200
+_BUSCA_TIPOS = ("item", "destaque")
+# Pesos do bm25 na ordem das colunas (as UNINDEXED não pontuam)
+_BUSCA_PESOS = (0, 0, 0, 0, 4.0, 2.0, 1.0, 1.0, 1.0)
+
+def _fts_termos(texto, frase=False):
+    """Texto livre -> expressão FTS5 segura: termos entre aspas (E implícito),
+    "termo*" vira prefixo; com frase=True, uma frase só."""
+    termos = re.findall(r"\w+\*?", texto or "")
+    if not termos:
+        return ""
+    if frase:
+        return '"' + " ".join(t.rstrip("*") for t in termos) + '"'
+    return " ".join(f'"{t[:-1]}"*' if t.endswith("*") else f'"{t}"' for t in termos)
+
+class IndiceBusca:
+    """Índice de busca em SQLite FTS5 (WAL), compartilhado entre processos."""
+    _SCHEMA_VERSAO = 1
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        con = self._con()
+        if con.execute("PRAGMA user_version").fetchone()[0] != self._SCHEMA_VERSAO:
+            con.execute("DROP TABLE IF EXISTS docs")
+            con.execute("DROP TABLE IF EXISTS datas")
+            con.execute(f"PRAGMA user_version = {self._SCHEMA_VERSAO}")
+        con.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5("
+            " data UNINDEXED, tipo UNINDEXED, id_proposicao UNINDEXED, id_item UNINDEXED,"
+            " titulo, ementa, relator, autores, despacho,"
+            " tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS datas ("
+            " data TEXT PRIMARY KEY, assinatura TEXT NOT NULL, itens INTEGER NOT NULL,"
+            " destaques INTEGER NOT NULL, indexado REAL NOT NULL)"
+        )
+
+    def _con(self):
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    @staticmethod
+    def _linhas(data_str, res):
+        linhas = []
+        for it in res.pauta:
+            linhas.append((data_str, "item", it.id_proposicao, it.id_proposicao, it.identificacao_completa,
+                           it.ementa or "", it.nome_relator or "", " | ".join(it.autores), ""))
+            for d in it.destaques:
+                linhas.append((data_str, "destaque", d.id_proposicao, it.id_proposicao,
+                               f"{d.sigla_tipo} {d.numero}".strip(), d.ementa or "", "", " | ".join(d.autores),
+                               d.despacho or ""))
+        return linhas
+
+    def indexar(self, data_str, res):
+        """(Re)indexa uma data; False se o índice já tinha esse conteúdo."""
+        linhas = self._linhas(data_str, res)
+        assinatura = hashlib.sha1(json.dumps(linhas, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+        con = self._con()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            row = con.execute("SELECT assinatura FROM datas WHERE data = ?", (data_str,)).fetchone()
+            if row and row[0] == assinatura:
+                con.execute("ROLLBACK")
+                return False
+            con.execute("DELETE FROM docs WHERE data = ?", (data_str,))
+            con.executemany(
+                "INSERT INTO docs (data, tipo, id_proposicao, id_item, titulo, ementa, relator, autores, despacho)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", linhas
+            )
+            n_dtq = sum(1 for ln in linhas if ln[1] == "destaque")
+            con.execute(
+                "INSERT OR REPLACE INTO datas (data, assinatura, itens, destaques, indexado) VALUES (?, ?, ?, ?, ?)",
+                (data_str, assinatura, len(linhas) - n_dtq, n_dtq, _now()),
+            )
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        return True
+
+    def buscar(self, texto="", autor="", inicio=None, fim=None, tipo=None, limite=50):
+        """Resultados por relevância (bm25), mais recentes primeiro no empate."""
+        expr = _fts_termos(texto)
+        frase = _fts_termos(autor, frase=True)
+        if frase:
+            expr = f"{expr} AND autores : {frase}" if expr else f"autores : {frase}"
+        if not expr:
+            raise ValueError("Informe q e/ou autor.")
+        sql = ("SELECT data, tipo, id_proposicao, id_item, titulo, relator, autores,"
+               " snippet(docs, -1, '[', ']', '…', 16) FROM docs WHERE docs MATCH ?")
+        params = [expr]
+        if inicio:
+            sql += " AND data >= ?"
+            params.append(inicio)
+        if fim:
+            sql += " AND data <= ?"
+            params.append(fim)
+        if tipo:
+            sql += " AND tipo = ?"
+            params.append(tipo)
+        sql += f" ORDER BY bm25(docs, {', '.join(str(p) for p in _BUSCA_PESOS)}), data DESC LIMIT ?"
+        params.append(limite)
+        return [
+            {"data": d, "tipo": t, "id_proposicao": pid, "id_item": iid, "titulo": titulo, "relator": relator,
+             "autores": autores.split(" | ") if autores else [], "trecho": trecho}
+            for d, t, pid, iid, titulo, relator, autores, trecho in self._con().execute(sql, params)
+        ]
+
+    def stats(self):
+        n_datas, ultima = self._con().execute("SELECT COUNT(*), MAX(data) FROM datas").fetchone()
+        docs = self._con().execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+        return {"datas": n_datas, "documentos": docs, "ultima_data": ultima}
+
+_BUSCA = {"indice": None, "erro": None}
+_BUSCA_LOCK = threading.Lock()
+_BUSCA_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="busca")
+
+def indice_busca():
+    """IndiceBusca do processo; None se desligado ou sem FTS5 no sqlite3."""
+    if not _BUSCA_ATIVA or _BUSCA["erro"]:
+        return None
+    if _BUSCA["indice"] is None:
+        with _BUSCA_LOCK:
+            if _BUSCA["indice"] is None and not _BUSCA["erro"]:
+                try:
+                    _BUSCA["indice"] = IndiceBusca(_BUSCA_PATH)
+                except sqlite3.Error as e:
+                    logger.warning(f"busca desativada: {e}")
+                    _BUSCA["erro"] = str(e)
+    return _BUSCA["indice"]
+
+def _indexar(data_str, res):
+    idx = indice_busca()
+    if idx is None:
+        return
+    try:
+        if idx.indexar(data_str, res):
+            logger.info(f"busca: {data_str} indexada ({len(res.pauta)} itens).")
+    except Exception as e:
+        logger.error(f"busca: indexar {data_str}: {e}")
+
+def indexar_pauta(data_str, res):
+    """Agenda a indexação de uma pauta montada, sem atrasar quem a montou."""
+    if _BUSCA_ATIVA and res.encontrou and res.pauta and not res.erro and not res.parcial and not res.degradados:
+        _BUSCA_POOL.submit(_indexar, data_str, res)
+
 # -----------------------------------------------------------------------------
 # PAUTA DA SESSÃO
 # -----------------------------------------------------------------------------
-def obter_pauta_sessao(data_str):
+def obter_pauta_sessao(data_str, prazo=None):
+    """Pauta da data: arquivo > cache (SWR) > montagem. Com `prazo` (s), uma
+    montagem a frio devolve o que estiver pronto nesse tempo (ver _pauta_no_prazo)."""
+    if data_str < _hoje().strftime("%Y-%m-%d"):
+        arq = arquivo_ler(data_str)
+        if arq is not None:
+            return arq
     ck = f"pauta:{data_str}"
-    c = _cache_get(ck)
-    if c is not None:
-        return c
-
-    try:
-        # 1) Buscar eventos do dia
-        r = SESSION.get(
-            f"{API_URL}/eventos",
-            params={
-                "idOrgao": PLENARIO_ID,
-                "dataInicio": data_str,
-                "dataFim": data_str,
-                "ordem": "ASC",
-                "ordenarPor": "dataHoraInicio",
-            },
-            timeout=15,
-        )
-        r.raise_for_status()
-        eventos = r.json().get("dados", []) or []
-        eventos_delib = [e for e in eventos if isinstance(e.get("descricaoTipo"), str) and "Sessão Deliberativa" in e.get("descricaoTipo")]
-        if not eventos_delib:
-            res = ResultadoPauta(tem_sessao=False, erro=f"Nenhuma sessão deliberativa em {data_str}")
-            _cache_set(ck, res)
-            return res
-
-        evento = eventos_delib[-1]
-        evento_id = evento.get("id")
-        situacao = norm(evento.get("situacao") or "Não Informada")
-
-        # 2) Pauta do evento
-        rp = SESSION.get(f"{API_URL}/eventos/{evento_id}/pauta", timeout=15)
-        if rp.status_code != 200:
-            res = ResultadoPauta(tem_sessao=True, situacao=situacao, erro=f"Erro ao buscar pauta (HTTP {rp.status_code})")
-            _cache_set(ck, res)
-            return res
-
-        dados_pauta = rp.json().get("dados", []) or []
-
-        # 3) Montagem + Dedup (por id_proposicao principal)
-        itens_base = []
-        seen = set()
-        for raw in dados_pauta:
+    builder = lambda: _construir_e_arquivar(data_str)
+    if prazo and _cache_get_entry(ck) is None:
+        return _pauta_no_prazo(data_str, ck, builder, prazo)
+    return _cache_get_swr(ck, builder)
+
+# -----------------------------------------------------------------------------
+# PRAZO DE RESPOSTA (respostas parciais; a montagem segue em segundo plano)
+# -----------------------------------------------------------------------------
+# PRAZO_RESPOSTA (s, 0 = desligado) ou ?prazo= limita a espera por uma pauta
+# que não está em cache: passado o prazo, devolvemos os itens base e os
+# autores/DTQ que já chegaram, com completo=False nos demais (ou, se nem a base
+# chegou, uma resposta parcial sem itens). A montagem continua e grava o
+# resultado completo no cache para o próximo acesso.
+_PRAZO_PADRAO = float(os.environ.get("PRAZO_RESPOSTA", 0))
+_PRAZO_MIN, _PRAZO_MAX = 0.5, 60.0
+_PRAZO_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="prazo")
+
+class _Montagem:
+    """Itens base de uma montagem em curso, visíveis para respostas parciais."""
+    def __init__(self):
+        self.base_pronta = threading.Event()
+        self.situacao = None
+        self.itens = []
+
+_MONTAGENS = {}
+_MONTAGENS_LOCK = threading.Lock()
+
+def _prazo_da_requisicao():
+    try:
+        prazo = float(request.args.get("prazo", _PRAZO_PADRAO) or 0)
+    except ValueError:
+        prazo = _PRAZO_PADRAO
+    return min(max(prazo, _PRAZO_MIN), _PRAZO_MAX) if prazo > 0 else None
+
+def _pauta_no_prazo(data_str, ck, builder, prazo):
+    """Nada aqui espera além do prazo: nem o flock de outro worker montando a
+    mesma data, nem uma vaga no _PRAZO_POOL. Passado o prazo vale o que houver:
+    a parcial desta montagem (itens base e o que já foi enriquecido) ou, se
+    nem a base chegou, uma resposta parcial vazia que a página busca de novo."""
+    limite = _now() + prazo
+    # Com o flock ocupado, outro worker já monta e grava no cache compartilhado:
+    # nada de ocupar uma thread do pool esperando por ele
+    fut = None if _lock_ocupado(ck) else _PRAZO_POOL.submit(_atualizar_cache, ck, builder)
+    while True:
+        if fut is not None and fut.done():
+            return fut.result()
+        e = _CACHE.get_entry(ck)  # gravada por outro worker ou outra thread
+        if e is not None:
+            return e[0]
+        resta = limite - _now()
+        if resta <= 0:
+            break
+        if fut is not None:
+            try:
+                return fut.result(timeout=min(resta, 0.1))
+            except FutureTimeout:
+                pass
+        else:
+            _sleep(min(resta, 0.1))
+    mont = _MONTAGENS.get(data_str)
+    if mont is not None and mont.base_pronta.is_set():
+        itens = [copy.copy(it) for it in mont.itens]
+        logger.info(f"pauta {data_str}: parcial no prazo ({sum(it.completo for it in itens)}/{len(itens)} completos).")
+        return ResultadoPauta(encontrou=True, tem_sessao=True, pauta=itens, situacao=mont.situacao, parcial=True)
+    logger.info(f"pauta {data_str}: nada pronto no prazo de {prazo:.1f}s.")
+    return ResultadoPauta(tem_sessao=True, parcial=True)
+
+# Montagem incremental: itens cujo JSON bruto na pauta não mudou reaproveitam
+# os autores da montagem anterior por até REENRIQUECER_MAX segundos. Os DTQ
+# não: as relacionadas (entidade de TTL curto, por onde chegam DTQs novos) são
+# consultadas em toda montagem, e os detalhes de cada DTQ saem do cache.
+_REENRIQUECER_MAX_SECONDS = int(os.environ.get("REENRIQUECER_MAX", 900))
+
+def _pauta_anterior(data_str):
+    e = _cache_get_entry(f"pauta:{data_str}")
+    if e is None:
+        return None
+    res = e[0]
+    return res if (res.encontrou and not res.erro) else None
+
+def _reaproveitar_enriquecimento(itens_base, anterior):
+    """Copia os autores dos itens inalterados; devolve os que ainda precisam deles."""
+    if anterior is None:
+        return list(itens_base)
+    prev = {it.id_proposicao: it for it in anterior.pauta}
+    limite = _now() - _REENRIQUECER_MAX_SECONDS
+    faltam = []
+    for it in itens_base:
+        p = prev.get(it.id_proposicao)
+        if (p is not None and p.assinatura and p.assinatura == it.assinatura and not p.degradado
+                and (getattr(p, "enriquecido_em", None) or 0) >= limite):
+            it.autores, it.enriquecido_em = p.autores, p.enriquecido_em
+        else:
+            faltam.append(it)
+    if faltam:
+        logger.info(f"pauta incremental: autores de {len(faltam)}/{len(itens_base)} itens buscados de novo.")
+    return faltam
+
+def _recuperar_degradados(itens, anterior):
+    """Itens em que a API falhou voltam com autores/destaques da montagem
+    anterior, se lá estavam completos; os que sobrarem seguem degradados."""
+    if anterior is None:
+        return
+    prev = {it.id_proposicao: it for it in anterior.pauta}
+    for it in itens:
+        p = prev.get(it.id_proposicao)
+        if it.degradado and p is not None and p.completo and not p.degradado:
+            it.autores, it.destaques, it.enriquecido_em = p.autores, p.destaques, p.enriquecido_em
+            it.degradado = False
+
+def _diff_pauta(anterior, itens, situacao):
+    """Mudanças estruturadas em relação à montagem anterior (None na primeira)."""
+    if anterior is None:
+        return None
+    prev = {it.id_proposicao: it for it in anterior.pauta}
+    atual = {it.id_proposicao: it for it in itens}
+    alterados, novos_destaques = [], {}
+    for pid, it in atual.items():
+        p = prev.get(pid)
+        if p is None:
+            continue
+        if p.assinatura != it.assinatura:
+            alterados.append(pid)
+        antes = set(p.ids_dtq())
+        novos = [did for did in it.ids_dtq() if did not in antes]
+        if novos:
+            novos_destaques[str(pid)] = novos
+    return {
+        "adicionados": [pid for pid in atual if pid not in prev],
+        "removidos": [pid for pid in prev if pid not in atual],
+        "alterados": alterados,
+        "novos_destaques": novos_destaques,
+        "situacao": {"de": anterior.situacao, "para": situacao} if anterior.situacao != situacao else None,
+        "desde": anterior.gerado_em,
+    }
+
+def _enriquecer_sync(itens_base, com_autores):
+    """Autores (dos ids em com_autores; os demais já vêm reaproveitados) e DTQ
+    em paralelo com threads (usando a proposição principal)."""
+    def _fetch(it):
+        pid = it.id_proposicao
+        with _span(f"item {pid}"):
+            autores = obter_autores_proposicao(pid) if pid in com_autores else (it.autores, True)
+            return autores, obter_destaques_dtq(pid)
+
+    fetch = _propagar(_fetch)
+    itens = []
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        futs = {pool.submit(fetch, it): it for it in itens_base}
+        for f in as_completed(futs):
+            base = futs[f]
+            try:
+                (autores, ok_autores), (destaques, ok_destaques) = f.result()
+            except Exception as e:
+                logger.error(f"parallel {base.id_proposicao}: {e}")
+                (autores, ok_autores), (destaques, ok_destaques) = ([], False), ([], False)
+            base.autores = autores
+            base.destaques = destaques
+            base.completo = True
+            base.degradado = not (ok_autores and ok_destaques)
+            itens.append(base)
+    return itens
+
+def _enriquecer_itens(itens_base, com_autores):
+    if _ENRIQUECIMENTO == "async":
+        if aiohttp is None:
+            logger.warning("ENRIQUECIMENTO=async sem aiohttp instalado; usando threads.")
+        else:
             try:
-                item = _mk_item_from_pauta(raw)
-                if not item.id_proposicao:
-                    continue
-                if item.id_proposicao in seen:
-                    continue
-                seen.add(item.id_proposicao)
-                itens_base.append(item)
+                return _MOTOR.executar(_MOTOR.enriquecer, itens_base, com_autores)
             except Exception as e:
-                logger.error(f"prep item: {e}")
+                logger.error(f"motor async: {e}; usando threads.")
+    return _enriquecer_sync(itens_base, com_autores)
+
+def _eventos_url(data_inicio, data_fim):
+    """1ª página de /eventos do Plenário no intervalo (é também a chave no cache HTTP)."""
+    params = {
+        "idOrgao": PLENARIO_ID,
+        "dataInicio": data_inicio,
+        "dataFim": data_fim,
+        "ordem": "ASC",
+        "ordenarPor": "dataHoraInicio",
+        "itens": 100,
+    }
+    return requests.Request("GET", f"{API_URL}/eventos", params=params).prepare().url
+
+def _buscar_eventos(data_inicio, data_fim):
+    """Eventos do Plenário no intervalo, seguindo a paginação de /eventos."""
+    eventos = []
+    url = _eventos_url(data_inicio, data_fim)
+    while url:
+        r = SESSION.get(url, timeout=15)
+        r.raise_for_status()
+        j = r.json()
+        eventos.extend(j.get("dados", []) or [])
+        # o link "next" já traz a query completa
+        url = next((lk.get("href") for lk in j.get("links", []) or [] if lk.get("rel") == "next"), None)
+    return eventos
+
+def _eventos_deliberativos(eventos):
+    return [e for e in eventos if isinstance(e.get("descricaoTipo"), str) and "Sessão Deliberativa" in e.get("descricaoTipo")]
 
-        # 4) Enriquecer com autores e DTQ em paralelo (usando a proposição principal)
-        def _fetch(pid):
-            return pid, obter_autores_proposicao(pid), obter_destaques_dtq(pid)
+def _montar_base(data_str, eventos=None):
+    """Passos 1-3: evento do dia -> pauta -> itens base (sem autores/DTQ).
+    Devolve (situacao, itens_base) ou um ResultadoPauta final (sem sessão/erro).
+    `eventos` permite reaproveitar uma consulta a /eventos de um intervalo."""
+    # 1) Eventos do dia
+    if eventos is None:
+        eventos = _buscar_eventos(data_str, data_str)
+    eventos_delib = _eventos_deliberativos(eventos)
+    if not eventos_delib:
+        return ResultadoPauta(tem_sessao=False, erro=f"Nenhuma sessão deliberativa em {data_str}")
 
-        itens = []
-        with ThreadPoolExecutor(max_workers=6) as pool:
-            futs = {pool.submit(_fetch, it.id_proposicao): it for it in itens_base}
-            for f in as_completed(futs):
-                base = futs[f]
+    evento = eventos_delib[-1]
+    evento_id = evento.get("id")
+    situacao = norm(evento.get("situacao") or "Não Informada")
+
+    # 2) Pauta do evento
+    rp = SESSION.get(f"{API_URL}/eventos/{evento_id}/pauta", timeout=15)
+    if rp.status_code != 200:
+        return ResultadoPauta(tem_sessao=True, situacao=situacao, erro=f"Erro ao buscar pauta (HTTP {rp.status_code})",
+                              falha_upstream=rp.status_code >= 500)
+
+    dados_pauta = rp.json().get("dados", []) or []
+
+    # 3) Montagem + Dedup (por id_proposicao principal)
+    itens_base = []
+    seen = set()
+    for raw in dados_pauta:
+        try:
+            item = _mk_item_from_pauta(raw)
+            if not item.id_proposicao:
+                continue
+            if item.id_proposicao in seen:
+                continue
+            seen.add(item.id_proposicao)
+            itens_base.append(item)
+        except Exception as e:
+            logger.error(f"prep item: {e}")
+    _semear_meta(itens_base)
+    return situacao, itens_base
+
+def _construir_pauta(data_str, eventos=None):
+    mont = _Montagem()
+    with _MONTAGENS_LOCK:
+        _MONTAGENS[data_str] = mont
+    try:
+        with _span("base"):
+            base = _montar_base(data_str, eventos)
+        if isinstance(base, ResultadoPauta):
+            return base
+        situacao, itens_base = base
+        mont.situacao, mont.itens = situacao, itens_base
+        mont.base_pronta.set()
+
+        # 4) Enriquecer com autores e DTQ (motor configurado em ENRIQUECIMENTO),
+        #    reaproveitando os autores dos itens que não mudaram desde a anterior
+        anterior = _pauta_anterior(data_str)
+        if _PAUTA_PREGUICOSA:
+            # Só a contagem de DTQ; o resto vem por proposição, sob demanda
+            with _span("ids de DTQ", itens=len(itens_base)):
+                _preencher_ids_destaques(itens_base)
+        elif itens_base:
+            sem_autores = _reaproveitar_enriquecimento(itens_base, anterior)
+            with _span("enriquecimento", itens=len(itens_base), autores=len(sem_autores), motor=_ENRIQUECIMENTO):
+                _enriquecer_itens(itens_base, {it.id_proposicao for it in sem_autores})
+            agora = _now()
+            for it in sem_autores:
+                it.enriquecido_em = agora
+            _recuperar_degradados(itens_base, anterior)
+
+        return ResultadoPauta(
+            encontrou=True, tem_sessao=True, pauta=itens_base, situacao=situacao,
+            diff=_diff_pauta(anterior, itens_base, situacao),
+        )
+
+    except Exception as e:
+        logger.error(f"pauta erro: {e}")
+        return ResultadoPauta(erro=f"Erro na API: {str(e)}", falha_upstream=True)
+    finally:
+        with _MONTAGENS_LOCK:
+            if _MONTAGENS.get(data_str) is mont:
+                del _MONTAGENS[data_str]
+
+# -----------------------------------------------------------------------------
+# INTERVALO DE DATAS (uma consulta a /eventos + datas em paralelo)
+# -----------------------------------------------------------------------------
+_INTERVALO_MAX_DIAS = int(os.environ.get("INTERVALO_MAX_DIAS", 62))
+_INTERVALO_WORKERS = 6
+
+def _pauta_pronta(data_str):
+    """Arquivo ou cache fresco; None quando a data precisa ser montada."""
+    if data_str < _hoje().strftime("%Y-%m-%d"):
+        arq = arquivo_ler(data_str)
+        if arq is not None:
+            return arq
+    return _cache_get(f"pauta:{data_str}")
+
+def pautas_intervalo(data_inicio, data_fim):
+    """Gera (data, ResultadoPauta) em ordem de data. Os eventos do intervalo
+    vêm de uma única consulta paginada; cada data que falta é montada pelo
+    mesmo caminho das requisições (_atualizar_cache -> _construir_e_arquivar:
+    single-flight, lock entre workers, arquivo e busca), até _INTERVALO_WORKERS
+    datas por vez. Uma proposição que aparece em vários dias sai das entidades
+    em cache (também com single-flight) em vez de ir de novo à API."""
+    ini = datetime.strptime(data_inicio, "%Y-%m-%d").date()
+    fim = datetime.strptime(data_fim, "%Y-%m-%d").date()
+    datas = [(ini + timedelta(days=i)).strftime("%Y-%m-%d") for i in range((fim - ini).days + 1)]
+
+    prontas = {d: _pauta_pronta(d) for d in datas}
+    faltam = [d for d in datas if prontas[d] is None]
+    por_data = {}
+    if faltam:
+        try:
+            for e in _buscar_eventos(faltam[0], faltam[-1]):
+                por_data.setdefault(norm(e.get("dataHoraInicio"))[:10], []).append(e)
+        except Exception as e:
+            logger.error(f"eventos {faltam[0]}..{faltam[-1]}: {e}")
+            for d in faltam:
+                # API fora: mantém a montagem anterior, se houver
+                prontas[d] = _pauta_anterior(d) or ResultadoPauta(erro=f"Erro na API: {str(e)}", falha_upstream=True)
+            faltam = []
+
+    with ThreadPoolExecutor(max_workers=_INTERVALO_WORKERS) as pool:
+        futs = {
+            d: pool.submit(_atualizar_cache, f"pauta:{d}",
+                           lambda d=d: _construir_e_arquivar(d, por_data.get(d, [])))
+            for d in faltam
+        }
+        for d in datas:
+            res = prontas[d]
+            if res is None:
                 try:
-                    _pid, autores, destaques = f.result()
+                    res = futs[d].result()
                 except Exception as e:
-                    logger.error(f"parallel {base.id_proposicao}: {e}")
-                    autores, destaques = [], []
-                base.autores = autores
-                base.destaques = destaques
-                itens.append(base)
+                    logger.error(f"pauta {d}: {e}")
+                    res = ResultadoPauta(erro=f"Erro na API: {str(e)}", falha_upstream=True)
+            yield d, res
+
+# -----------------------------------------------------------------------------
+# AGENDADOR (atualização proativa de hoje e da próxima sessão)
+# -----------------------------------------------------------------------------
+# REFRESH_AGENDADO=false desliga o agendador; REFRESH_INTERVALO é o intervalo
+# (s) entre atualizações proativas e REFRESH_HORARIO a janela "HH-HH" (horário
+# de Brasília) em que ele roda.
+_REFRESH_AGENDADO = os.environ.get("REFRESH_AGENDADO", "true").lower() == "true"
+_REFRESH_INTERVALO = int(os.environ.get("REFRESH_INTERVALO", 120))
+_REFRESH_HORARIO = os.environ.get("REFRESH_HORARIO", "08-23")
+
+_AGENDADOR = {"thread": None}
+_AGENDADOR_LOCK = threading.Lock()
+
+def _em_horario_de_sessao():
+    try:
+        ini, fim = (int(h) for h in _REFRESH_HORARIO.split("-", 1))
+    except ValueError:
+        ini, fim = 0, 23
+    return ini <= datetime.now(_TZ_BR).hour <= fim
 
-        res = ResultadoPauta(encontrou=True, tem_sessao=True, pauta=itens, situacao=situacao)
-        _cache_set(ck, res)
-        return res
+def _buscar_proxima_data_sessao(hoje):
+    ini = (hoje + timedelta(days=1)).strftime("%Y-%m-%d")
+    fim = (hoje + timedelta(days=14)).strftime("%Y-%m-%d")
+    r = SESSION.get(
+        f"{API_URL}/eventos",
+        params={"idOrgao": PLENARIO_ID, "dataInicio": ini, "dataFim": fim, "ordem": "ASC", "ordenarPor": "dataHoraInicio"},
+        timeout=15,
+    )
+    r.raise_for_status()
+    for e in r.json().get("dados", []) or []:
+        if isinstance(e.get("descricaoTipo"), str) and "Sessão Deliberativa" in e.get("descricaoTipo"):
+            return norm(e.get("dataHoraInicio"))[:10]
+    return ""
 
+def _proxima_data_sessao():
+    hoje = _hoje()
+    try:
+        return _cache_get_or_build(
+            f"proxima_sessao:{hoje.isoformat()}", lambda: _buscar_proxima_data_sessao(hoje), ttl=3600
+        )
     except Exception as e:
-        logger.error(f"pauta erro: {e}")
-        res = ResultadoPauta(erro=f"Erro na API: {str(e)}")
-        _cache_set(ck, res)
-        return res
+        logger.warning(f"próxima sessão: {e}")
+        return ""
+
+def _datas_para_atualizar():
+    datas = [_hoje().strftime("%Y-%m-%d")]
+    prox = _proxima_data_sessao()
+    if prox and prox not in datas:
+        datas.append(prox)
+    return datas
+
+def _agendador_loop():
+    logger.info(f"Agendador de atualização ativo (a cada {_REFRESH_INTERVALO}s, {_REFRESH_HORARIO}h).")
+    while True:
+        try:
+            if _em_horario_de_sessao():
+                for d in _datas_para_atualizar():
+                    # Só reconstrói se a entrada tiver mais de um intervalo (entre
+                    # workers, quem chegar primeiro atualiza e o outro reaproveita).
+                    # Mesmo caminho das requisições: com a API fora, a montagem
+                    # boa anterior fica no cache em vez do erro.
+                    _atualizar_cache(f"pauta:{d}", lambda d=d: _construir_e_arquivar(d), idade_max=_REFRESH_INTERVALO)
+        except Exception as e:
+            logger.error(f"agendador: {e}")
+        _sleep(_REFRESH_INTERVALO)
+
+def _iniciar_agendador():
+    if not _REFRESH_AGENDADO or _AGENDADOR["thread"] is not None:
+        return
+    with _AGENDADOR_LOCK:
+        if _AGENDADOR["thread"] is None:
+            t = threading.Thread(target=_agendador_loop, name="agendador-pauta", daemon=True)
+            t.start()
+            _AGENDADOR["thread"] = t
+
+# -----------------------------------------------------------------------------
+# AQUECIMENTO (boot de cada worker do gunicorn, ver gunicorn.conf.py)
+# -----------------------------------------------------------------------------
+# Antes de aceitar requisições o worker abre AQUECIMENTO_CONEXOES conexões com a
+# API (padrão: a concorrência do enriquecimento) e carrega a pauta de hoje e da
+# próxima sessão; com CACHE_BACKEND=sqlite, o segundo worker só lê o que o
+# primeiro montou. Se passar de AQUECIMENTO_MAX segundos o worker começa a
+# atender assim mesmo e /api/pronto responde 503 até o aquecimento terminar.
+# Fora do gunicorn (flask run, CLI) nada disso roda e o worker já nasce pronto.
+_AQUECIMENTO_MAX = float(os.environ.get("AQUECIMENTO_MAX", 60))
+_AQUECIMENTO_CONEXOES = int(os.environ.get("AQUECIMENTO_CONEXOES", 0)) or (
+    _HTTP_POOL if _ENRIQUECIMENTO == "async" else min(_HTTP_POOL, 6 + _DTQ_WORKERS)
+)
+_AQUECIMENTO = {"estado": "desligado", "inicio": None, "fim": None, "conexoes": 0, "datas": {}, "erro": None}
+_PRONTO = threading.Event()
+_PRONTO.set()
+
+def _pre_conectar(n):
+    """Deixa n conexões keep-alive abertas no pool do SESSION (ou do motor)."""
+    url = f"{API_URL}/referencias/proposicoes/siglaTipo"
+    if _ENRIQUECIMENTO == "async" and aiohttp is not None:
+        return _MOTOR.pre_conectar(url, n)
+    # Um HEAD por thread, todos ao mesmo tempo: cada um pega uma conexão do pool
+    barreira = threading.Barrier(n)
+
+    def _abrir(_):
+        try:
+            barreira.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+        return SESSION.head(url, timeout=10).status_code
+
+    abertas = 0
+    with ThreadPoolExecutor(max_workers=n, thread_name_prefix="aquecimento") as pool:
+        for f in [pool.submit(_abrir, i) for i in range(n)]:
+            try:
+                f.result()
+                abertas += 1
+            except Exception as e:
+                logger.warning(f"aquecimento: conexão: {e}")
+    return abertas
+
+def _aquecer():
+    _AQUECIMENTO.update(estado="aquecendo", inicio=_now(), fim=None, erro=None)
+    try:
+        _AQUECIMENTO["conexoes"] = _pre_conectar(_AQUECIMENTO_CONEXOES)
+        for d in _datas_para_atualizar():
+            t0 = _now()
+            res = obter_pauta_sessao(d)
+            _AQUECIMENTO["datas"][d] = {"segundos": round(_now() - t0, 3), "itens": len(res.pauta), "erro": res.erro}
+    except Exception as e:
+        logger.error(f"aquecimento: {e}")
+        _AQUECIMENTO["erro"] = str(e)
+    finally:
+        _AQUECIMENTO.update(estado="pronto", fim=_now())
+        _PRONTO.set()
+        logger.info(f"Worker {os.getpid()} aquecido em {_AQUECIMENTO['fim'] - _AQUECIMENTO['inicio']:.1f}s "
+                    f"({_AQUECIMENTO['conexoes']} conexões, datas {list(_AQUECIMENTO['datas'])}).")
+
+def aquecer_worker():
+    """Chamado no post_worker_init do gunicorn: aquece em segundo plano e
+    segura o worker até terminar (ou até AQUECIMENTO_MAX)."""
+    _PRONTO.clear()
+    _iniciar_agendador()
+    _iniciar_varredura()
+    _iniciar_amostragem()
+    threading.Thread(target=_aquecer, name="aquecimento", daemon=True).start()
+    if not _PRONTO.wait(_AQUECIMENTO_MAX):
+        logger.warning(f"aquecimento passou de {_AQUECIMENTO_MAX:.0f}s; atendendo enquanto termina.")
+
+def aquecimento_status():
+    st = dict(_AQUECIMENTO, pronto=_PRONTO.is_set())
+    if st["inicio"] is not None:
+        st["segundos"] = round((st["fim"] or _now()) - st["inicio"], 3)
+    return st
+
+# -----------------------------------------------------------------------------
+# ATUALIZAÇÃO AO VIVO (SSE)
+# -----------------------------------------------------------------------------
+# Uma thread por worker observa as datas com assinantes a cada SSE_POLL
+# segundos (leitura local do cache; a reconstrução segue o SWR normal) e, quando
+# a montagem muda, publica um resumo compacto para todos os assinantes.
+# Cada stream prende uma thread do worker (gthread) por até SSE_DURACAO_MAX:
+# só a pauta de hoje tem stream, e acima de SSE_MAX streams por worker (padrão:
+# 1/4 das GUNICORN_THREADS) a resposta é 503 e a página passa a consultar.
+_SSE_POLL = int(os.environ.get("SSE_POLL", 5))
+_SSE_DURACAO_MAX = int(os.environ.get("SSE_DURACAO_MAX", 55))
+_SSE_MAX = int(os.environ.get("SSE_MAX", 0)) or max(1, int(os.environ.get("GUNICORN_THREADS", 16)) // 4)
+_SSE_KEEPALIVE = 15
+_SSE_RETRY_MS = 3000
+
+def _eventos_mudanca(antes, depois):
+    """Lista compacta de eventos entre duas montagens da mesma data."""
+    if not (depois.encontrou and not depois.erro):
+        return []
+    if not (antes.encontrou and not antes.erro):
+        antes = ResultadoPauta()
+    d = _diff_pauta(antes, depois.pauta, depois.situacao)
+    eventos = [{"tipo": "item_adicionado", "id": pid} for pid in d["adicionados"]]
+    eventos += [{"tipo": "item_removido", "id": pid} for pid in d["removidos"]]
+    eventos += [{"tipo": "item_alterado", "id": pid} for pid in d["alterados"]]
+    eventos += [{"tipo": "destaque_novo", "id": pid, "destaques": ids} for pid, ids in d["novos_destaques"].items()]
+    if d["situacao"]:
+        eventos.append({"tipo": "situacao", **d["situacao"]})
+    return eventos
+
+class _CanalPauta:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.assinantes = 0
+        self.seq = 0
+        self.mensagens = deque(maxlen=50)
+        self.ultimo = None
+
+class _Transmissor:
+    def __init__(self):
+        self.canais = {}
+        self.conexoes = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def assinar(self, data_str):
+        """Canal da data, ou None se o worker já tem SSE_MAX streams abertos."""
+        with self.lock:
+            if self.conexoes >= _SSE_MAX:
+                return None
+            self.conexoes += 1
+            canal = self.canais.get(data_str)
+            if canal is None:
+                canal = self.canais[data_str] = _CanalPauta()
+            canal.assinantes += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loop, name="transmissor-sse", daemon=True)
+                self.thread.start()
+        return canal
+
+    def cancelar(self, data_str, canal):
+        with self.lock:
+            self.conexoes -= 1
+            canal.assinantes -= 1
+            if canal.assinantes <= 0 and self.canais.get(data_str) is canal:
+                del self.canais[data_str]
+
+    def publicar(self, canal, msg):
+        with canal.cond:
+            canal.seq += 1
+            canal.mensagens.append((canal.seq, msg))
+            canal.cond.notify_all()
+
+    def esperar(self, canal, desde, timeout):
+        """Mensagens com seq > desde (bloqueia até timeout); devolve (msgs, seq)."""
+        with canal.cond:
+            canal.cond.wait_for(lambda: canal.seq > desde, timeout)
+            return [(n, m) for n, m in canal.mensagens if n > desde], canal.seq
+
+    def _verificar(self, data_str, canal):
+        res = obter_pauta_sessao(data_str)
+        antes, canal.ultimo = canal.ultimo, res
+        if antes is None or _gerado_em(antes) == _gerado_em(res):
+            return
+        eventos = _eventos_mudanca(antes, res)
+        if eventos:
+            self.publicar(canal, {"data": data_str, "versao": _gerado_em(res), "eventos": eventos})
+
+    def _loop(self):
+        while True:
+            _sleep(_SSE_POLL)
+            with self.lock:
+                canais = list(self.canais.items())
+            for data_str, canal in canais:
+                try:
+                    self._verificar(data_str, canal)
+                except Exception as e:
+                    logger.error(f"sse {data_str}: {e}")
+
+_TRANSMISSOR = _Transmissor()
 
 # -----------------------------------------------------------------------------
 # FLASK
 # -----------------------------------------------------------------------------
 app = Flask(__name__, static_url_path='/static', static_folder='static')
 
-@app.route("/", methods=["GET"])
-def index():
-    # Forçar limpeza de cache: /?data=YYYY-MM-DD&nocache=1
-    if request.args.get("nocache", "").lower() in ("1", "true", "yes"):
-        _cache_clear()
+def _gerado_em(resultado):
+    # Entradas gravadas antes de existir gerado_em contam como recém-geradas
+    return getattr(resultado, "gerado_em", None) or _now()
 
-    tz = pytz.timezone("America/Sao_Paulo")
-    hoje = date.today().strftime("%Y-%m-%d")
-    data_str = request.args.get("data", hoje)
+@app.before_request
+def _garantir_agendador():
+    # Sobe no primeiro request de cada worker (após o fork do gunicorn)
+    _iniciar_agendador()
+    _iniciar_varredura()
+    _iniciar_amostragem()
+
+# Operações administrativas (ex.: nocache) exigem ADMIN_TOKEN, via header
+# X-Admin-Token ou ?token=; sem ADMIN_TOKEN configurado ficam desligadas.
+_ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+def _requisicao_admin():
+    enviado = request.headers.get("X-Admin-Token") or request.args.get("token") or ""
+    return bool(_ADMIN_TOKEN) and hmac.compare_digest(enviado, _ADMIN_TOKEN)
+
+def _http_urls_da_data(data_str, anterior):
+    """URLs da API que a montagem de `data_str` consulta: /eventos do dia, a
+    pauta dos eventos guardados nele e as proposições/DTQ de `anterior`."""
+    url_eventos = _eventos_url(data_str, data_str)
+    urls = [url_eventos]
+    salvo = _http_cache_salvo(url_eventos)
+    j = _json_or_xml_bytes(salvo["texto"])[0] if salvo else None
+    for ev in _eventos_deliberativos((j or {}).get("dados", []) or []):
+        urls.append(f"{API_URL}/eventos/{ev.get('id')}/pauta")
+    for it in getattr(anterior, "pauta", None) or []:
+        base = f"{API_URL}/proposicoes/{it.id_proposicao}"
+        urls += [base, f"{base}/autores", f"{base}/relacionadas"]
+        for did in it.ids_dtq():
+            urls += [f"{API_URL}/proposicoes/{did}", f"{API_URL}/proposicoes/{did}/autores"]
+    return urls
+
+def invalidar_pauta(data_str):
+    """Descarta tudo o que a montagem de uma data reaproveitaria: o arquivo, a
+    pauta em cache, as entidades ("prop:*") dos seus itens e DTQ e as respostas
+    da API guardadas para elas ("http:*"). Sem isso uma data arquivada nunca
+    remontaria e um autor ou DTQ errado voltaria do cache."""
+    ck = f"pauta:{data_str}"
+    anterior = arquivo_ler(data_str)
+    if anterior is None:
+        e = _cache_get_entry(ck)
+        anterior = e[0] if e is not None else None
+    chaves = [ck]
+    for it in getattr(anterior, "pauta", None) or []:
+        chaves += [_entidade_chave(campo, it.id_proposicao) for campo in ("meta", "autores", "relacionadas")]
+        chaves += [_entidade_chave("dtq", did) for did in it.ids_dtq()]
+    if _HTTP_CACHE_ATIVO:
+        chaves += [f"{_HTTP_CACHE_KEY}{url}" for url in _http_urls_da_data(data_str, anterior)]
+    for chave in chaves:
+        _cache_delete(chave)
+    arquivo = ""
+    caminho = _arquivo_caminho(data_str)
+    if _DATA_RE.match(data_str or "") and os.path.exists(caminho):
+        try:
+            os.remove(caminho)
+            arquivo = " e arquivo"
+        except OSError as e:
+            logger.error(f"invalidar arquivo {data_str}: {e}")
+    logger.info(f"CACHE: pauta {data_str} invalidada ({len(chaves)} chaves{arquivo}).")
+
+def _data_valida(data_str):
+    """Data de YYYY-MM-DD até 365 dias atrás; None para qualquer outra coisa."""
     try:
         data_fmt = datetime.strptime(data_str, "%Y-%m-%d").date()
-        if data_fmt < date.today() - timedelta(days=365):
-            data_fmt = date.today()
-            data_str = data_fmt.strftime("%Y-%m-%d")
-    except ValueError:
-        data_fmt = date.today()
-        data_str = data_fmt.strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+    return data_fmt if data_fmt >= _hoje() - timedelta(days=365) else None
 
-    resultado = obter_pauta_sessao(data_str)
+def _data_da_requisicao(data_str):
+    """Valida YYYY-MM-DD (até 365 dias atrás); fora disso, usa hoje."""
+    data_fmt = _data_valida(data_str) or _hoje()
+    return data_fmt, data_fmt.strftime("%Y-%m-%d")
 
+def _contexto_pauta(data_fmt, resultado):
+    """Variáveis do template (página inteira e fragmento de atualização)."""
+    tz = pytz.timezone("America/Sao_Paulo")
     if not resultado.tem_sessao:
         mensagem = f"Não há Sessão Deliberativa para {data_fmt.strftime('%d/%m/%Y')}"
         itens_pauta = []
@@ -536,68 +2977,797 @@ def index():
         mensagem = f"Erro: {resultado.erro}"
         itens_pauta = []
         situacao = "Erro"
+    elif resultado.parcial and not resultado.encontrou:
+        mensagem = f"Montando a pauta de {data_fmt.strftime('%d/%m/%Y')}..."
+        itens_pauta = []
+        situacao = "Carregando"
     else:
         topico_ex = resultado.pauta[0].topico if (resultado.pauta and resultado.pauta[0].topico) else ""
         situacao = resultado.situacao or "Em Andamento"
-        total_dtq = sum(len(i.destaques) for i in resultado.pauta)
+        total_dtq = sum(len(i.ids_dtq()) for i in resultado.pauta)
         mensagem = (
             f"Pauta da Sessão{f' ({topico_ex})' if topico_ex else ''} - "
             f"{data_fmt.strftime('%d/%m/%Y')} | Status: {situacao} | Destaques DTQ: {total_dtq}"
         )
         itens_pauta = resultado.pauta
 
-    return render_template(
-        "pauta.html",
+    return dict(
         data=data_fmt.strftime("%Y-%m-%d"),
         data_br=data_fmt.strftime("%d/%m/%Y"),
         mensagem=mensagem,
         itens_pauta=itens_pauta,
         resultado=resultado,
         situacao=situacao,
-        atualizacao=datetime.now(tz).strftime("%H:%M:%S"),
+        ao_vivo=data_fmt == _hoje(),
+        atualizacao=datetime.fromtimestamp(_gerado_em(resultado), tz).strftime("%H:%M:%S"),
     )
 
-@app.route("/api/pauta/<data_str>", methods=["GET"])
-def api_pauta(data_str):
-    resultado = obter_pauta_sessao(data_str)
+# -----------------------------------------------------------------------------
+# CACHE DE SAÍDA (HTML/JSON prontos, comprimidos, com ETag)
+# -----------------------------------------------------------------------------
+# Por (tipo, data) guarda o corpo final da versão atual da pauta (versão =
+# gerado_em do ResultadoPauta) e as variantes gzip/br, comprimidas na primeira
+# requisição que as aceita. O ETag forte vem do corpo; If-None-Match igual
+# responde 304 sem render_template nem JSON. A idade vai no header Age.
+_SAIDA_MAX = int(os.environ.get("SAIDA_CACHE_MAX", 64))
+_SAIDA_MIN_COMPRIMIR = 1024
+_SAIDAS = OrderedDict()
+_SAIDAS_LOCK = threading.Lock()
+_SUFIXO_CODIFICACAO = {"gzip": "-gz", "br": "-br"}
+
+class _Saida:
+    def __init__(self, versao, corpo, mimetype):
+        self.versao = versao
+        self.corpo = corpo
+        self.mimetype = mimetype
+        self.etag = hashlib.sha1(corpo).hexdigest()[:20]
+        self.variantes = {}
+        self.lock = threading.Lock()
+
+    def codificado(self, codificacao):
+        with self.lock:
+            v = self.variantes.get(codificacao)
+            if v is None:
+                if codificacao == "br":
+                    v = brotli.compress(self.corpo, quality=5)
+                else:
+                    v = gzip.compress(self.corpo, 6)
+                self.variantes[codificacao] = v
+            return v
+
+def _codificacao_aceita(corpo):
+    if len(corpo) < _SAIDA_MIN_COMPRIMIR:
+        return None
+    if brotli is not None and request.accept_encodings["br"]:
+        return "br"
+    if request.accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+def _etag_confere(etag):
+    raw = request.headers.get("If-None-Match", "")
+    if not raw:
+        return False
+    # Qualquer variante (identidade, -gz, -br) do mesmo corpo vale
+    return raw.strip() == "*" or etag in {t.split("-", 1)[0] for t in re.findall(r'"([^"]*)"', raw)}
+
+def _saida_cacheada(tipo, data_str, resultado, gerar, mimetype):
+    """Resposta de `gerar()` (str/bytes) para a versão atual da pauta, do cache
+    de saída quando já existir. Resultados parciais não são guardados."""
+    gerado_em = _gerado_em(resultado)
+    versao = f"{gerado_em:.6f}"
+    chave = (tipo, data_str)
+    with _SAIDAS_LOCK:
+        saida = _SAIDAS.get(chave)
+        if saida is not None and saida.versao == versao:
+            _SAIDAS.move_to_end(chave)
+        else:
+            saida = None
+    origem = "hit"
+    if saida is None:
+        origem = "miss"
+        corpo = gerar()
+        saida = _Saida(versao, corpo.encode("utf-8") if isinstance(corpo, str) else corpo, mimetype)
+        if not getattr(resultado, "parcial", False):
+            with _SAIDAS_LOCK:
+                _SAIDAS[chave] = saida
+                while len(_SAIDAS) > _SAIDA_MAX:
+                    _SAIDAS.popitem(last=False)
+
+    cod = _codificacao_aceita(saida.corpo)
+    headers = {
+        "ETag": f'"{saida.etag}{_SUFIXO_CODIFICACAO.get(cod, "")}"',
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+        "Age": str(max(0, int(_now() - gerado_em))),
+    }
+    if _etag_confere(saida.etag):
+        _METRICAS.inc("pauta_saida_cache_total", tipo=tipo, resultado="304")
+        return Response(status=304, headers=headers)
+    _METRICAS.inc("pauta_saida_cache_total", tipo=tipo, resultado=origem)
+    if cod:
+        headers["Content-Encoding"] = cod
+        return Response(saida.codificado(cod), mimetype=mimetype, headers=headers)
+    return Response(saida.corpo, mimetype=mimetype, headers=headers)
+
+# -----------------------------------------------------------------------------
+# FOTOS (miniaturas dos deputados servidas pela própria origem)
+# -----------------------------------------------------------------------------
+# /foto/<id> busca a foto na Câmara uma vez, guarda o original em FOTO_DIR e
+# gera (com Pillow) uma miniatura quadrada de FOTO_TAMANHO px em WebP, ou JPEG
+# para quem não aceita WebP. Sem Pillow serve o original. As respostas têm
+# ETag e Cache-Control longo (FOTO_MAX_AGE); falhas ficam FOTO_FALHA_TTL sem
+# nova tentativa. Só ids do diretório de deputados vão à origem: qualquer
+# outro inteiro responde 404 sem tocar a API nem o disco.
+_FOTO_DIR = os.environ.get("FOTO_DIR", os.path.join(os.path.dirname(_CACHE_PATH) or ".", "pauta_fotos"))
+_FOTO_TAMANHO = int(os.environ.get("FOTO_TAMANHO", 48))       # 2x o avatar de 24px
+_FOTO_QUALIDADE = int(os.environ.get("FOTO_QUALIDADE", 80))
+_FOTO_MAX_AGE = int(os.environ.get("FOTO_MAX_AGE", 30 * 24 * 3600))
+_FOTO_FALHA_TTL = 600
+_FOTO_URL_PADRAO = "https://www.camara.leg.br/internet/deputado/bandep/{}.jpg"
+_FOTO_ID_RE = re.compile(r"/bandep/(\d+)\.jpe?g$", re.IGNORECASE)
+_FOTO_MIMETYPES = {"webp": "image/webp", "jpg": "image/jpeg"}
+_FOTO_FALHAS_MAX = int(os.environ.get("FOTO_FALHAS_MAX", 1024))
+_FOTO_FALHAS = OrderedDict()  # id -> quando falhou (LRU limitado)
+_FOTO_FALHAS_LOCK = threading.Lock()
+
+def _foto_id_da_url(url):
+    m = _FOTO_ID_RE.search(url or "")
+    return m.group(1) if m else ""
+
+def _foto_caminho(dep_id, ext):
+    return os.path.join(_FOTO_DIR, f"{dep_id}.{ext}")
+
+def _gravar_atomico(caminho, dados):
+    os.makedirs(_FOTO_DIR, exist_ok=True)
+    tmp = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(dados)
+    os.replace(tmp, caminho)
+
+def _foto_falhou_recentemente(dep_id):
+    with _FOTO_FALHAS_LOCK:
+        return _now() - _FOTO_FALHAS.get(dep_id, 0) < _FOTO_FALHA_TTL
+
+def _registrar_falha_foto(dep_id):
+    with _FOTO_FALHAS_LOCK:
+        _FOTO_FALHAS[dep_id] = _now()
+        _FOTO_FALHAS.move_to_end(dep_id)
+        while len(_FOTO_FALHAS) > _FOTO_FALHAS_MAX:
+            _FOTO_FALHAS.popitem(last=False)
+
+def _baixar_foto(dep_id):
+    # Só a entrada do diretório: nada de /deputados/{id} por foto pedida
+    dep = _diretorio_deputados().get(dep_id) or {}
+    url = dep.get("url_foto") or _FOTO_URL_PADRAO.format(dep_id)
+    r = SESSION.get(url, timeout=10)
+    r.raise_for_status()
+    if not (r.headers.get("Content-Type") or "").lower().startswith("image/"):
+        raise ValueError(f"resposta não é imagem ({r.headers.get('Content-Type')})")
+    _gravar_atomico(_foto_caminho(dep_id, "orig"), r.content)
+
+def _tipo_imagem(caminho):
+    with open(caminho, "rb") as fh:
+        cab = fh.read(12)
+    if cab.startswith(b"\x89PNG"):
+        return "image/png"
+    if cab[:4] == b"RIFF" and cab[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+def _miniatura(original, formato):
+    with Image.open(original) as im:
+        im = ImageOps.exif_transpose(im).convert("RGB")
+        # Recorte quadrado puxado para cima: o rosto fica no avatar redondo
+        im = ImageOps.fit(im, (_FOTO_TAMANHO, _FOTO_TAMANHO), Image.LANCZOS, centering=(0.5, 0.3))
+        out = io.BytesIO()
+        if formato == "webp":
+            im.save(out, "WEBP", quality=_FOTO_QUALIDADE, method=6)
+        else:
+            im.save(out, "JPEG", quality=_FOTO_QUALIDADE, optimize=True, progressive=True)
+        return out.getvalue()
+
+def _foto_formato():
+    if Image is None:
+        return None
+    if "image/webp" in (request.headers.get("Accept") or "") and pil_features.check("webp"):
+        return "webp"
+    return "jpg"
+
+def obter_foto(dep_id, formato):
+    """Caminho e mimetype da foto no disco (miniatura em `formato`, ou o
+    original quando formato=None); busca na origem só na primeira vez."""
+    original = _foto_caminho(dep_id, "orig")
+    alvo = _foto_caminho(dep_id, formato) if formato else original
+    if os.path.exists(alvo):
+        _METRICAS.inc("pauta_foto_total", resultado="disco")
+        return alvo
+
+    def _gerar():
+        if os.path.exists(alvo):
+            return alvo
+        if not os.path.exists(original):
+            _baixar_foto(dep_id)
+            _METRICAS.inc("pauta_foto_total", resultado="origem")
+        if formato:
+            _gravar_atomico(alvo, _miniatura(original, formato))
+        return alvo
+
+    return _single_flight(f"foto:{dep_id}:{formato}", _gerar)
+
+@app.route("/foto/<int:deputado_id>", methods=["GET"])
+def foto_deputado(deputado_id):
+    dep_id = str(deputado_id)
+    nao_encontrada = Response(status=404, headers={"Cache-Control": f"public, max-age={_FOTO_FALHA_TTL}"})
+    if _foto_falhou_recentemente(dep_id):
+        return nao_encontrada
+    # Já no disco serve direto; senão o id tem de ser de um deputado conhecido
+    if not os.path.exists(_foto_caminho(dep_id, "orig")) and dep_id not in _diretorio_deputados():
+        _METRICAS.inc("pauta_foto_total", resultado="desconhecido")
+        return nao_encontrada
+    formato = _foto_formato()
+    try:
+        caminho = obter_foto(dep_id, formato)
+    except Exception as e:
+        logger.warning(f"foto {dep_id}: {e}")
+        _METRICAS.inc("pauta_foto_total", resultado="erro")
+        _registrar_falha_foto(dep_id)
+        return nao_encontrada
+    with _FOTO_FALHAS_LOCK:
+        _FOTO_FALHAS.pop(dep_id, None)
+    mimetype = _FOTO_MIMETYPES[formato] if formato else _tipo_imagem(caminho)
+    resp = send_file(caminho, mimetype=mimetype, max_age=_FOTO_MAX_AGE, etag=True, conditional=True)
+    resp.headers["Vary"] = "Accept"
+    return resp
+
+@app.route("/", methods=["GET"])
+def index():
+    data_fmt, data_str = _data_da_requisicao(request.args.get("data", _hoje().strftime("%Y-%m-%d")))
+
+    # Remontar só esta data: /?data=YYYY-MM-DD&nocache=1 (com token de admin)
+    if request.args.get("nocache", "").lower() in ("1", "true", "yes"):
+        if _requisicao_admin():
+            invalidar_pauta(data_str)
+        else:
+            logger.warning("nocache ignorado: token de admin ausente ou inválido.")
+    resultado = obter_pauta_sessao(data_str, prazo=_prazo_da_requisicao())
+    return _saida_cacheada("html", data_str, resultado,
+                           lambda: render_template("pauta.html", **_contexto_pauta(data_fmt, resultado)), "text/html")
+
+@app.route("/fragmento/pauta/<data_str>", methods=["GET"])
+def fragmento_pauta(data_str):
+    """Só o bloco de conteúdo (alerta + itens), para a página se atualizar no lugar."""
+    data_fmt, data_str = _data_da_requisicao(data_str)
+    resultado = obter_pauta_sessao(data_str, prazo=_prazo_da_requisicao())
+    return _saida_cacheada("fragmento", data_str, resultado,
+                           lambda: render_template("_pauta_conteudo.html", **_contexto_pauta(data_fmt, resultado)),
+                           "text/html")
+
+@app.route("/api/pauta/<data_str>/eventos", methods=["GET"])
+def api_pauta_eventos(data_str):
+    """Server-Sent Events: uma mensagem "pauta" a cada mudança detectada.
+    A conexão é encerrada após SSE_DURACAO_MAX e o EventSource reconecta."""
+    data_fmt, data_str = _data_da_requisicao(data_str)
+    if data_fmt != _hoje():
+        # Datas passadas (arquivadas) e futuras não mudam ao vivo; o 204 faz o
+        # EventSource parar de reconectar
+        return Response(status=204)
+    canal = _TRANSMISSOR.assinar(data_str)
+    if canal is None:
+        return Response("Limite de conexões ao vivo atingido.\n", status=503, mimetype="text/plain",
+                        headers={"Retry-After": str(_SSE_DURACAO_MAX), "Cache-Control": "no-store"})
+
+    def _stream():
+        try:
+            yield f"retry: {_SSE_RETRY_MS}\n\n"
+            seq = canal.seq
+            fim = _now() + _SSE_DURACAO_MAX
+            while _now() < fim:
+                msgs, seq = _TRANSMISSOR.esperar(canal, seq, _SSE_KEEPALIVE)
+                for n, msg in msgs:
+                    yield f"id: {n}\nevent: pauta\ndata: {json.dumps(msg, ensure_ascii=False)}\n\n"
+                if not msgs:
+                    yield ": keepalive\n\n"
+        finally:
+            _TRANSMISSOR.cancelar(data_str, canal)
+
+    return Response(_stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+def _pauta_payload(data_str, resultado, idade=True, itens=True):
+    """Dicionário de resposta da API para uma data. Sem `idade`, o corpo só
+    depende da versão da pauta (é o que vai para o cache de saída); sem
+    `itens`, fica só o envelope (ver _pauta_json_partes)."""
     try:
         data_formatada = datetime.strptime(data_str, "%Y-%m-%d").strftime("%d/%m/%Y")
     except Exception:
         data_formatada = data_str
 
+    gerado_em = _gerado_em(resultado)
+    meta = {"gerado_em": datetime.fromtimestamp(gerado_em, _TZ_BR).isoformat(timespec="seconds")}
+    if idade:
+        meta["idade_segundos"] = max(0, int(_now() - gerado_em))
+
     if not resultado.tem_sessao:
-        return jsonify({"tem_sessao": False, "mensagem": f"Não há sessão para {data_formatada}"})
+        return {"tem_sessao": False, "mensagem": f"Não há sessão para {data_formatada}", **meta}
 
     resp = {
         "tem_sessao": True,
         "data": data_formatada,
         "situacao": resultado.situacao,
-        "itens_pauta": [{
-            "id_proposicao": it.id_proposicao,   # principal
-            "pauta_id": it.pauta_id,             # id da pauta (PPP quando houver)
-            "titulo": it.titulo,
-            "identificacao": it.identificacao_completa,
-            "ementa": it.ementa,
-            "relator": it.nome_relator,
-            "relator_foto": it.relator_foto,
-            "regime": it.regime,
-            "topico": it.topico,
-            "autores": it.autores,
-            "destaques": [{
-                "numero": d.numero,
-                "sigla_tipo": d.sigla_tipo,
-                "data_hora": d.data_hora,
-                "ementa": d.ementa,
-                "url_inteiro_teor": d.url_inteiro_teor,
-                "descricao_tipo": d.descricao_tipo,
-                "despacho": d.despacho,
-                "autores": d.autores
-            } for d in it.destaques]
-        } for it in resultado.pauta]
+        **meta,
     }
+    if itens:
+        resp["itens_pauta"] = [it.para_api() for it in resultado.pauta]
+    if resultado.parcial:
+        resp["parcial"] = True
+    if resultado.degradados:
+        resp["degradados"] = resultado.degradados
+    if resultado.diff:
+        resp["diff"] = resultado.diff
     if resultado.erro:
         resp["erro"] = resultado.erro
-    return jsonify(resp)
+    return resp
+
+def _json_compacto(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def _pauta_json_partes(data_str, resultado, idade=True):
+    """O mesmo JSON de _pauta_payload, em pedaços de um item cada: nunca existe
+    a árvore inteira de dicts, só o item da vez (itens_pauta vai por último)."""
+    envelope = _pauta_payload(data_str, resultado, idade, itens=False)
+    if not resultado.tem_sessao:
+        yield _json_compacto(envelope) + "\n"
+        return
+    yield _json_compacto(envelope)[:-1] + ',"itens_pauta":['
+    for i, it in enumerate(resultado.pauta):
+        yield ("," if i else "") + _json_compacto(it.para_api())
+    yield "]}\n"
+
+@app.route("/api/pauta/<data_str>", methods=["GET"])
+def api_pauta(data_str):
+    # Só datas válidas viram chave de cache, trace e lock: o resto é 400
+    data_fmt = _data_valida(data_str)
+    if data_fmt is None:
+        return jsonify({"erro": "Use a data no formato YYYY-MM-DD (até 365 dias atrás)."}), 400
+    data_str = data_fmt.strftime("%Y-%m-%d")
+    resultado = obter_pauta_sessao(data_str, prazo=_prazo_da_requisicao())
+    if request.args.get("debug") == "trace":
+        # Árvore da última montagem desta data neste worker (None se veio de outro)
+        payload = _pauta_payload(data_str, resultado)
+        payload["trace"] = trace_pauta(data_str)
+        return jsonify(payload)
+    if resultado.parcial:
+        # Não vai para o cache de saída: transmite direto, item a item
+        return Response(_pauta_json_partes(data_str, resultado), mimetype="application/json")
+    return _saida_cacheada("json", data_str, resultado,
+                           lambda: "".join(_pauta_json_partes(data_str, resultado, idade=False)),
+                           "application/json")
+
+def _resposta_detalhe(id_proposicao, campo, valor, ok):
+    corpo = {"id_proposicao": id_proposicao, campo: valor}
+    if not ok:
+        corpo["degradado"] = True  # a API falhou em parte: o navegador não guarda
+    resp = jsonify(corpo)
+    resp.headers["Cache-Control"] = "public, max-age=300" if ok else "no-store"
+    return resp
+
+@app.route("/api/proposicao/<int:id_proposicao>/autores", methods=["GET"])
+def api_proposicao_autores(id_proposicao):
+    autores, ok = obter_autores_proposicao(id_proposicao)
+    return _resposta_detalhe(id_proposicao, "autores", autores, ok)
+
+@app.route("/api/proposicao/<int:id_proposicao>/destaques", methods=["GET"])
+def api_proposicao_destaques(id_proposicao):
+    destaques, ok = obter_destaques_dtq(id_proposicao)
+    return _resposta_detalhe(id_proposicao, "destaques", [d.para_api() for d in destaques], ok)
+
+@app.route("/api/pautas", methods=["GET"])
+def api_pautas():
+    """/api/pautas?inicio=YYYY-MM-DD&fim=YYYY-MM-DD -> NDJSON, uma linha por dia."""
+    inicio = request.args.get("inicio", "")
+    fim = request.args.get("fim", "") or inicio
+    try:
+        d_ini = datetime.strptime(inicio, "%Y-%m-%d").date()
+        d_fim = datetime.strptime(fim, "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"erro": "Use inicio e fim no formato YYYY-MM-DD."}), 400
+    if d_fim < d_ini or (d_fim - d_ini).days >= _INTERVALO_MAX_DIAS:
+        return jsonify({"erro": f"Intervalo inválido (máximo de {_INTERVALO_MAX_DIAS} dias)."}), 400
+
+    def _linhas():
+        for data_str, res in pautas_intervalo(inicio, fim):
+            yield json.dumps({"data_iso": data_str, **_pauta_payload(data_str, res)}, ensure_ascii=False) + "\n"
+
+    return Response(_linhas(), mimetype="application/x-ndjson")
+
+@app.route("/api/busca", methods=["GET"])
+def api_busca():
+    """/api/busca?q=...&autor=...&inicio=YYYY-MM-DD&fim=YYYY-MM-DD&tipo=item|destaque&limite=50"""
+    idx = indice_busca()
+    if idx is None:
+        return jsonify({"erro": "Busca indisponível neste servidor."}), 503
+    q = request.args.get("q", "")
+    autor = request.args.get("autor", "")
+    inicio = request.args.get("inicio", "") or None
+    fim = request.args.get("fim", "") or None
+    tipo = request.args.get("tipo", "") or None
+    try:
+        for d in (inicio, fim):
+            if d:
+                datetime.strptime(d, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"erro": "Use inicio e fim no formato YYYY-MM-DD."}), 400
+    if tipo not in (None, *_BUSCA_TIPOS):
+        return jsonify({"erro": f"tipo deve ser um de: {', '.join(_BUSCA_TIPOS)}."}), 400
+    try:
+        limite = max(1, min(int(request.args.get("limite", 50)), _BUSCA_LIMITE_MAX))
+    except ValueError:
+        return jsonify({"erro": "limite deve ser um número."}), 400
+
+    t0 = _now()
+    try:
+        resultados = idx.buscar(q, autor, inicio, fim, tipo, limite)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    except sqlite3.OperationalError as e:
+        logger.warning(f"busca {q!r}: {e}")
+        return jsonify({"erro": "Consulta inválida."}), 400
+    return jsonify({
+        "q": q, "autor": autor, "inicio": inicio, "fim": fim, "tipo": tipo,
+        "total": len(resultados),
+        "ms": round((_now() - t0) * 1000, 2),
+        "resultados": resultados,
+    })
+
+@app.route("/api/status", methods=["GET"])
+def api_status():
+    return jsonify({
+        "cache": cache_stats(),
+        "saida": {"entradas": len(_SAIDAS), "brotli": brotli is not None},
+        "http_cache": http_cache_stats(),
+        "upstream": upstream_status(),
+        "aquecimento": aquecimento_status(),
+        "busca": indice_busca().stats() if indice_busca() else {"erro": _BUSCA["erro"] or "desligada"},
+    })
+
+@app.route("/api/pronto", methods=["GET"])
+def api_pronto():
+    """Readiness: 200 quando o worker terminou o aquecimento, 503 antes."""
+    st = aquecimento_status()
+    return jsonify(st), (200 if st["pronto"] else 503)
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(metricas_prometheus(), mimetype="text/plain; version=0.0.4")
+
+# -----------------------------------------------------------------------------
+# PERFILAMENTO (cProfile, amostragem de pilhas e tracemalloc, sob demanda)
+# -----------------------------------------------------------------------------
+# /api/perfil/<data> (exige ADMIN_TOKEN) monta a pauta da data (ou, com
+# ?montar=0, lê do cache) e renderiza o HTML e o JSON sob cProfile (thread da
+# requisição), amostragem de pilhas de todas as threads (os pools aninhados
+# não aparecem no cProfile) e tracemalloc. O relatório traz as funções mais
+# caras, as pilhas mais amostradas, os locais que mais alocaram, o pico de
+# threads por pool e o tamanho das entradas do cache; os arquivos .prof
+# (pstats/snakeviz), .folded (flamegraph/speedscope) e .tracemalloc
+# (tracemalloc.Snapshot.load) ficam para download nos últimos PERFIL_GUARDAR.
+#
+# PERFIL_HZ > 0 liga a amostragem contínua (baixa taxa, ex.: 1) em cada worker:
+# acumula as pilhas para /api/perfil/continuo e conta as amostras por região
+# (template, json, enriquecimento, base, cache) em /metrics.
+_PERFIL_HZ = float(os.environ.get("PERFIL_HZ", 0))
+_PERFIL_HZ_SOB_DEMANDA = 200
+_PERFIL_GUARDAR = int(os.environ.get("PERFIL_GUARDAR", 5))
+_PERFIL_PILHAS_MAX = 20000
+_PERFIL_PROFUNDIDADE = 48
+_PERFIL_REGIOES = (
+    ("template", {"render_template", "_contexto_pauta"}),
+    ("json", {"_pauta_json_partes", "_pauta_payload", "_json_compacto"}),
+    ("enriquecimento", {"_enriquecer_itens", "_enriquecer_sync", "enriquecer", "obter_autores_proposicao",
+                        "obter_destaques_dtq", "obter_destaque_base", "_preencher_ids_destaques"}),
+    ("base", {"_montar_base"}),
+    ("cache", {"_serializar", "_desserializar"}),
+)
+_PERFIS = OrderedDict()
+_PERFIS_LOCK = threading.Lock()
+# cProfile, tracemalloc e o amostrador valem para o processo inteiro: um
+# perfil por vez, senão um zera ou desliga o do outro
+_PERFIL_EM_CURSO = threading.Lock()
+
+def _grupo_thread(nome):
+    # "dtq_3" -> "dtq", "ThreadPoolExecutor-2_0" -> "ThreadPoolExecutor-2"
+    return nome.rsplit("_", 1)[0] if nome.rsplit("_", 1)[-1].isdigit() else nome
+
+def _regiao(nomes):
+    for regiao, funcoes in _PERFIL_REGIOES:
+        if not funcoes.isdisjoint(nomes):
+            return regiao
+    return None
+
+class _Amostrador:
+    """Amostra as pilhas de todas as threads `hz` vezes por segundo."""
+    def __init__(self, hz, metricas=False):
+        self.intervalo = 1.0 / hz
+        self.metricas = metricas
+        self.pilhas = Counter()
+        self.regioes = Counter()
+        self.threads_pico = Counter()
+        self.amostras = 0
+        self.lock = threading.Lock()
+        self._parar = threading.Event()
+        self.thread = None
+
+    def iniciar(self):
+        self.thread = threading.Thread(target=self._loop, name="amostrador-perfil", daemon=True)
+        self.thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _loop(self):
+        proprio = threading.get_ident()
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.amostrar(proprio)
+            except Exception as e:  # nunca derruba o worker
+                logger.warning(f"amostrador: {e}")
+
+    def amostrar(self, ignorar=None):
+        nomes = {t.ident: t.name for t in threading.enumerate()}
+        grupos = Counter(_grupo_thread(n) for i, n in nomes.items() if i != ignorar)
+        pilhas = []
+        for ident, frame in sys._current_frames().items():
+            if ident == ignorar:
+                continue
+            quadros, funcoes = [], set()
+            while frame is not None and len(quadros) < _PERFIL_PROFUNDIDADE:
+                co = frame.f_code
+                quadros.append(f"{os.path.basename(co.co_filename)}:{co.co_name}")
+                funcoes.add(co.co_name)
+                frame = frame.f_back
+            quadros.append(_grupo_thread(nomes.get(ident, "?")))
+            pilhas.append((";".join(reversed(quadros)), _regiao(funcoes)))
+        with self.lock:
+            self.amostras += 1
+            for g, n in grupos.items():
+                self.threads_pico[g] = max(self.threads_pico[g], n)
+            for pilha, regiao in pilhas:
+                if pilha in self.pilhas or len(self.pilhas) < _PERFIL_PILHAS_MAX:
+                    self.pilhas[pilha] += 1
+                else:
+                    self.pilhas["(outras)"] += 1
+                if regiao:
+                    self.regioes[regiao] += 1
+                    if self.metricas:
+                        _METRICAS.inc("pauta_perfil_amostras_total", regiao=regiao)
+
+    def folded(self):
+        """Pilhas no formato "a;b;c N" (flamegraph.pl, speedscope)."""
+        with self.lock:
+            return "".join(f"{p} {n}\n" for p, n in self.pilhas.most_common())
+
+    def resumo(self, top=25):
+        with self.lock:
+            return {
+                "amostras": self.amostras,
+                "intervalo_ms": round(self.intervalo * 1000, 1),
+                "regioes": dict(self.regioes.most_common()),
+                "threads_pico": dict(self.threads_pico.most_common()),
+                "pilhas": [{"pilha": p.split(";")[-4:], "amostras": n} for p, n in self.pilhas.most_common(top)],
+            }
+
+_AMOSTRAGEM = {"amostrador": None}
+_AMOSTRAGEM_LOCK = threading.Lock()
+
+def _iniciar_amostragem():
+    if _PERFIL_HZ <= 0 or _AMOSTRAGEM["amostrador"] is not None:
+        return
+    with _AMOSTRAGEM_LOCK:
+        if _AMOSTRAGEM["amostrador"] is None:
+            _AMOSTRAGEM["amostrador"] = _Amostrador(_PERFIL_HZ, metricas=True).iniciar()
+            logger.info(f"Amostragem contínua de perfil ativa ({_PERFIL_HZ:g} Hz).")
+
+def _cache_por_prefixo(top=10):
+    """Bytes e entradas do cache por prefixo de chave, e as maiores entradas."""
+    tamanhos = _CACHE.tamanhos()
+    por_prefixo = {}
+    for chave, n in tamanhos:
+        agg = por_prefixo.setdefault(_prefixo_cache(chave), {"entradas": 0, "bytes": 0})
+        agg["entradas"] += 1
+        agg["bytes"] += n
+    maiores = sorted(tamanhos, key=lambda kv: kv[1], reverse=True)[:top]
+    return {
+        "por_prefixo": dict(sorted(por_prefixo.items(), key=lambda kv: kv[1]["bytes"], reverse=True)),
+        "maiores": [{"chave": k, "bytes": n} for k, n in maiores],
+    }
+
+def _top_funcoes(stats, top):
+    linhas = sorted(stats.items(), key=lambda kv: kv[1][3], reverse=True)[:top]
+    return [
+        {"funcao": f"{os.path.basename(arq)}:{linha}({nome})", "chamadas": nc,
+         "proprio_ms": round(tt * 1000, 2), "acumulado_ms": round(ct * 1000, 2)}
+        for (arq, linha, nome), (_cc, nc, tt, ct, _callers) in linhas
+    ]
+
+def _top_alocacoes(depois, antes, top):
+    # Fora do relatório: o próprio tracemalloc e as pilhas guardadas pelo amostrador
+    co = _Amostrador.amostrar.__code__
+    linhas = {ln for _i, _f, ln in co.co_lines() if ln}
+    filtros = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+    filtros += [tracemalloc.Filter(False, co.co_filename, ln) for ln in sorted(linhas)]
+    dif = depois.filter_traces(filtros).compare_to(antes.filter_traces(filtros), "lineno")[:top]
+    return [
+        {"local": f"{os.path.basename(st.traceback[0].filename)}:{st.traceback[0].lineno}",
+         "kb": round(st.size_diff / 1024, 1), "blocos": st.count_diff}
+        for st in dif
+    ]
+
+def perfilar(data_str, montar=True, top=25):
+    """Perfil de uma montagem (montar=True) ou leitura da pauta de data_str,
+    seguida do render do HTML e do JSON da API. Guarda os arquivos em _PERFIS.
+    None se já houver um perfil em andamento neste worker."""
+    if not _PERFIL_EM_CURSO.acquire(blocking=False):
+        return None
+    try:
+        return _perfilar(data_str, montar, top)
+    finally:
+        _PERFIL_EM_CURSO.release()
+
+def _perfilar(data_str, montar, top):
+    amostrador = _Amostrador(_PERFIL_HZ_SOB_DEMANDA).iniciar()
+    ja_rastreando = tracemalloc.is_tracing()
+    if not ja_rastreando:
+        tracemalloc.start(16)
+    tracemalloc.reset_peak()
+    antes = tracemalloc.take_snapshot()
+    perfil = cProfile.Profile()
+    etapas = {}
+    try:
+        perfil.enable()
+        t0 = _now()
+        if montar:
+            # Mesmo caminho das requisições (single-flight, lock, cache), sempre remontando
+            res = _atualizar_cache(f"pauta:{data_str}", lambda: _construir_e_arquivar(data_str), idade_max=0)
+        else:
+            res = obter_pauta_sessao(data_str)
+        etapas["montagem" if montar else "leitura"] = _now() - t0
+        t0 = _now()
+        with app.app_context():
+            render_template("pauta.html", **_contexto_pauta(datetime.strptime(data_str, "%Y-%m-%d").date(), res))
+        etapas["html"] = _now() - t0
+        t0 = _now()
+        corpo = "".join(_pauta_json_partes(data_str, res, idade=False))
+        etapas["json"] = _now() - t0
+        perfil.disable()
+        depois = tracemalloc.take_snapshot()
+        memoria_atual, memoria_pico = tracemalloc.get_traced_memory()
+    finally:
+        perfil.disable()
+        amostrador.parar()
+        if not ja_rastreando:
+            tracemalloc.stop()
+
+    perfil.create_stats()
+    pid = f"{data_str}-{os.getpid()}-{int(_now() * 1000)}"
+    arquivos = {
+        "prof": marshal.dumps(perfil.stats),
+        "folded": amostrador.folded().encode("utf-8"),
+        "tracemalloc": pickle.dumps(depois, pickle.HIGHEST_PROTOCOL),
+    }
+    with _PERFIS_LOCK:
+        _PERFIS[pid] = arquivos
+        while len(_PERFIS) > _PERFIL_GUARDAR:
+            _PERFIS.popitem(last=False)
+
+    return {
+        "id": pid,
+        "data": data_str,
+        "worker": os.getpid(),
+        "itens": len(res.pauta),
+        "json_kb": round(len(corpo.encode("utf-8")) / 1024, 1),
+        "etapas_ms": {k: round(v * 1000, 1) for k, v in etapas.items()},
+        "funcoes": _top_funcoes(perfil.stats, top),
+        "amostragem": amostrador.resumo(top),
+        "alocacoes": _top_alocacoes(depois, antes, top),
+        "memoria_kb": {"pico": round(memoria_pico / 1024, 1), "retida": round(memoria_atual / 1024, 1)},
+        "threads": {"ativas": threading.active_count(), "pico_por_grupo": dict(amostrador.threads_pico)},
+        "cache": {**cache_stats(), **_cache_por_prefixo()},
+        "arquivos": {ext: f"/api/perfil/arquivo/{pid}.{ext}" for ext in arquivos},
+    }
+
+@app.route("/api/perfil/<data_str>", methods=["GET", "POST"])
+def api_perfil(data_str):
+    """Perfil de uma montagem: /api/perfil/YYYY-MM-DD?montar=0|1&top=25 (ADMIN_TOKEN)."""
+    if not _requisicao_admin():
+        return jsonify({"erro": "Perfil exige ADMIN_TOKEN."}), 403
+    _data_fmt, data_str = _data_da_requisicao(data_str)
+    montar = request.args.get("montar", "1") != "0"
+    try:
+        top = max(1, min(int(request.args.get("top", 25)), 200))
+    except ValueError:
+        return jsonify({"erro": "top deve ser um número."}), 400
+    relatorio = perfilar(data_str, montar, top)
+    if relatorio is None:
+        return jsonify({"erro": "Já há um perfil em andamento neste worker; tente de novo em instantes."}), 409
+    return jsonify(relatorio)
+
+@app.route("/api/perfil/arquivo/<pid>.<ext>", methods=["GET"])
+def api_perfil_arquivo(pid, ext):
+    if not _requisicao_admin():
+        return jsonify({"erro": "Perfil exige ADMIN_TOKEN."}), 403
+    with _PERFIS_LOCK:
+        dados = (_PERFIS.get(pid) or {}).get(ext)
+    if dados is None:
+        return jsonify({"erro": "Perfil não encontrado neste worker (guardamos os últimos PERFIL_GUARDAR)."}), 404
+    return Response(dados, mimetype="text/plain" if ext == "folded" else "application/octet-stream",
+                    headers={"Content-Disposition": f'attachment; filename="pauta-{pid}.{ext}"'})
+
+@app.route("/api/perfil/continuo", methods=["GET"])
+def api_perfil_continuo():
+    """Amostragem contínua deste worker (PERFIL_HZ): ?formato=folded baixa as
+    pilhas; ?zerar=1 recomeça a contagem."""
+    if not _requisicao_admin():
+        return jsonify({"erro": "Perfil exige ADMIN_TOKEN."}), 403
+    amostrador = _AMOSTRAGEM["amostrador"]
+    if amostrador is None:
+        return jsonify({"erro": "Amostragem contínua desligada (PERFIL_HZ=0)."}), 404
+    if request.args.get("formato") == "folded":
+        resp = Response(amostrador.folded(), mimetype="text/plain",
+                        headers={"Content-Disposition": f'attachment; filename="pauta-continuo-{os.getpid()}.folded"'})
+    else:
+        resp = jsonify({"worker": os.getpid(), "hz": _PERFIL_HZ, **amostrador.resumo()})
+    if request.args.get("zerar") == "1":
+        with amostrador.lock:
+            amostrador.pilhas.clear()
+            amostrador.regioes.clear()
+            amostrador.threads_pico.clear()
+            amostrador.amostras = 0
+    return resp
+
+@app.cli.command("arquivar")
+@click.argument("inicio")
+@click.argument("fim")
+@click.option("--pausa", default=0.5, show_default=True, help="Segundos entre datas (alivia a API).")
+def arquivar_intervalo(inicio, fim, pausa):
+    """Congela no arquivo as sessões encerradas entre INICIO e FIM (YYYY-MM-DD)."""
+    d = datetime.strptime(inicio, "%Y-%m-%d").date()
+    d_fim = datetime.strptime(fim, "%Y-%m-%d").date()
+    while d <= d_fim:
+        data_str = d.strftime("%Y-%m-%d")
+        d += timedelta(days=1)
+        if os.path.exists(_arquivo_caminho(data_str)):
+            click.echo(f"{data_str}: já arquivada")
+            continue
+        # Mesmo caminho das requisições (proteção contra falha da API, trace,
+        # cache, arquivo e índice), sempre remontando: idade_max=0
+        res = _atualizar_cache(f"pauta:{data_str}", lambda: _construir_e_arquivar(data_str), idade_max=0)
+        if os.path.exists(_arquivo_caminho(data_str)):
+            click.echo(f"{data_str}: arquivada ({len(res.pauta)} itens)")
+        else:
+            motivo = res.erro or (f"{res.degradados} itens incompletos" if res.degradados else None)
+            click.echo(f"{data_str}: ignorada ({motivo or res.situacao or 'sem sessão'})")
+        _sleep(pausa)
+
+@app.cli.command("indexar")
+def indexar_arquivo():
+    """Indexa para a busca todas as sessões do arquivo (sem acessar a API)."""
+    idx = indice_busca()
+    if idx is None:
+        raise click.ClickException(f"busca indisponível: {_BUSCA['erro'] or 'BUSCA=false'}")
+    nomes = sorted(os.listdir(_ARQUIVO_DIR)) if os.path.isdir(_ARQUIVO_DIR) else []
+    for nome in nomes:
+        data_str = nome.split(".", 1)[0]
+        res = arquivo_ler(data_str)
+        if res is None:
+            continue
+        click.echo(f"{data_str}: {'indexada' if idx.indexar(data_str, res) else 'sem mudanças'}")
+    click.echo(json.dumps(idx.stats(), ensure_ascii=False))
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
@@ -0,0 +1,2 @@
+# bench/__init__.py
+"""Replay offline da API da Câmara e benchmarks de montagem da pauta."""
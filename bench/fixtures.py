@@ -0,0 +1,35 @@
+# bench/fixtures.py
+"""Formato das fixtures de replay (gravadas ou sintéticas).
+
+    {
+      "base": "https://dadosabertos.camara.leg.br/api/v2",   # base gravada
+      "data": "2026-10-14",                                   # data da sessão
+      "respostas": {"/eventos?dataFim=...": {"status": 200, "tipo": "...", "corpo": "..."}}
+    }
+
+As chaves são caminho + query ordenada (relativos à base). O stub troca a base
+gravada pela sua própria dentro dos corpos, para que URIs de deputados e a
+paginação (links "next") continuem apontando para ele.
+"""
+import json
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+DIR_FIXTURES = "bench/fixtures"
+
+def chave(url, base):
+    """Chave canônica de uma URL dentro da base."""
+    partes = urlsplit(url)
+    caminho = partes.path[len(urlsplit(base).path):] or "/"
+    query = urlencode(sorted(parse_qsl(partes.query, keep_blank_values=True)))
+    return f"{caminho}?{query}" if query else caminho
+
+def carregar(caminho):
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+def salvar(caminho, fixture):
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(fixture, f, ensure_ascii=False)
+
+def resposta(corpo, status=200, tipo="application/json"):
+    return {"status": status, "tipo": tipo, "corpo": corpo if isinstance(corpo, str) else json.dumps(corpo, ensure_ascii=False)}
@@ -0,0 +1,59 @@
+# bench/gravar.py
+"""Grava as respostas reais da API para uma ou mais datas.
+
+    python bench/gravar.py 2026-10-14 [2026-10-15 ...] [-o bench/fixtures/2026-10-14.json]
+
+Monta cada pauta com o app (enriquecimento síncrono, sem cache HTTP nem
+arquivo) e guarda toda resposta que passar pela SESSION: /eventos,
+/eventos/{id}/pauta, /proposicoes/* e /deputados/*.
+"""
+import os
+import sys
+import argparse
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.update({
+    "HTTP_CACHE": "false",
+    "ENRIQUECIMENTO": "sync",
+    "CACHE_BACKEND": "memory",
+    "REFRESH_AGENDADO": "false",
+    "ARQUIVO_DIR": tempfile.mkdtemp(prefix="pauta_gravar_"),
+})
+
+from bench import fixtures  # noqa: E402
+import app as pauta_app  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("datas", nargs="+", help="datas YYYY-MM-DD")
+    parser.add_argument("-o", "--saida", help="arquivo da fixture (padrão: bench/fixtures/<primeira data>.json)")
+    args = parser.parse_args()
+
+    respostas = {}
+
+    def _gravar(resp, *args, **kwargs):
+        if resp.url.startswith(pauta_app.API_URL):
+            tipo = resp.headers.get("Content-Type", "application/json")
+            respostas[fixtures.chave(resp.url, pauta_app.API_URL)] = fixtures.resposta(resp.text, resp.status_code, tipo)
+
+    pauta_app.SESSION.hooks["response"].append(_gravar)
+    for data_str in args.datas:
+        res = pauta_app.obter_pauta_sessao(data_str)
+        print(f"{data_str}: {len(res.pauta)} itens, "
+              f"{sum(len(it.destaques) for it in res.pauta)} DTQ{' - ' + res.erro if res.erro else ''}")
+
+    saida = args.saida or os.path.join(fixtures.DIR_FIXTURES, f"{args.datas[0]}.json")
+    os.makedirs(os.path.dirname(saida) or ".", exist_ok=True)
+    fixtures.salvar(saida, {
+        "base": pauta_app.API_URL,
+        "data": args.datas[0],
+        "gravado_em": datetime.now().isoformat(timespec="seconds"),
+        "respostas": respostas,
+    })
+    print(f"{len(respostas)} respostas em {saida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# bench/modelos.py
+"""Memória por data em cache e custo de serialização dos modelos (sem rede).
+
+    python bench/modelos.py [--itens 40] [--dtq 120] [--repeticoes 20]
+
+Monta um ResultadoPauta sintético do tamanho pedido e mede:
+  - memória do grafo de objetos de uma data em cache (tracemalloc, média
+    de 10 cópias desserializadas, como as que ficam no MemoryCache);
+  - _serializar / _desserializar (cache SQLite e arquivo);
+  - corpo de /api/pauta/<data>: tempo e pico de memória alocada.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("REFRESH_AGENDADO", "false")
+
+import app as pauta_app  # noqa: E402
+
+DATA = "2026-10-14"
+PALAVRAS = ("dispõe", "sobre", "altera", "lei", "federal", "institui", "programa", "nacional", "regime", "tributário",
+            "saúde", "educação", "orçamento", "servidores", "municípios", "estados", "prazo", "dá", "outras", "providências")
+
+def _texto(rnd, minimo, maximo):
+    return " ".join(rnd.choice(PALAVRAS) for _ in range(rnd.randint(minimo, maximo))).capitalize() + "."
+
+def pauta_sintetica(n_itens, n_dtq, seed=7):
+    rnd = random.Random(seed)
+    nomes = [f"Deputado {i:03d} ({rnd.choice(('PL', 'PT', 'PSD', 'MDB', 'PP'))})" for i in range(513)]
+    dtq_por_item = [0] * n_itens
+    for _ in range(n_dtq):
+        dtq_por_item[rnd.randrange(n_itens)] += 1
+    itens = []
+    for k in range(n_itens):
+        numero = 1000 + k
+        destaques = [
+            pauta_app.Destaque(
+                id_proposicao=3000000 + k * 100 + j, numero=str(j + 1), sigla_tipo="DTQ",
+                data_hora=f"14/10/2026 1{j % 10}:00", ementa=f"Destaque de bancada ao PL {numero}/2026: " + _texto(rnd, 8, 25),
+                url_inteiro_teor=f"https://www.camara.leg.br/proposicoesWeb/prop_mostrarintegra?codteor={3000000 + k * 100 + j}",
+                descricao_tipo="Destaque", despacho="Destaque para votação em separado.",
+                autores=rnd.sample(nomes, rnd.randint(1, 3)),
+            )
+            for j in range(dtq_por_item[k])
+        ]
+        it = pauta_app.ItemPauta(
+            id_proposicao=2400000 + k, titulo=f"PL {numero}/2026", sigla_tipo="PL", numero=numero, ano=2026,
+            ementa=_texto(rnd, 20, 60), nome_relator=rnd.choice(nomes),
+            regime="Urgência (Art. 155, RICD)", topico="Matéria sobre a mesa",
+            autores=rnd.sample(nomes, rnd.randint(1, 4)), destaques=destaques,
+            relator_foto=f"https://www.camara.leg.br/internet/deputado/bandep/{200000 + k}.jpg",
+            pauta_id=2400000 + k, assinatura=f"{k:016x}",
+        )
+        it.completo = True
+        itens.append(it)
+    return pauta_app.ResultadoPauta(encontrou=True, tem_sessao=True, pauta=itens, situacao="Em Andamento")
+
+def corpo_api(res):
+    partes = getattr(pauta_app, "_pauta_json_partes", None)
+    if partes is not None:
+        return "".join(partes(DATA, res, idade=False)).encode("utf-8")
+    return pauta_app.app.json.dumps(pauta_app._pauta_payload(DATA, res, idade=False)).encode("utf-8")
+
+def _tempo(fn, repeticoes):
+    ts = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        fn()
+        ts.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(ts)
+
+def _pico(fn):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    fn()
+    pico = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return pico
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--itens", type=int, default=40)
+    parser.add_argument("--dtq", type=int, default=120)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    res = pauta_sintetica(args.itens, args.dtq)
+    blob = pauta_app._serializar(res)
+
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    copias = [pauta_app._desserializar(blob) for _ in range(10)]
+    por_data = (tracemalloc.get_traced_memory()[0] - antes) / len(copias)
+    tracemalloc.stop()
+    del copias
+
+    corpo = corpo_api(res)
+    linhas = [
+        ("memória por data em cache (KB)", round(por_data / 1024, 1)),
+        ("blob serializado (KB)", round(len(blob) / 1024, 1)),
+        ("_serializar (ms)", round(_tempo(lambda: pauta_app._serializar(res), args.repeticoes), 2)),
+        ("_desserializar (ms)", round(_tempo(lambda: pauta_app._desserializar(blob), args.repeticoes), 2)),
+        ("corpo da API (KB)", round(len(corpo) / 1024, 1)),
+        ("corpo da API (ms)", round(_tempo(lambda: corpo_api(res), args.repeticoes), 2)),
+        ("corpo da API, pico de memória (KB)", round(_pico(lambda: corpo_api(res)) / 1024, 1)),
+    ]
+    print(f"{args.itens} itens, {sum(len(it.destaques) for it in res.pauta)} DTQ")
+    largura = max(len(n) for n, _ in linhas)
+    for nome, valor in linhas:
+        print(f"{nome.ljust(largura)}  {valor}")
+
+if __name__ == "__main__":
+    main()
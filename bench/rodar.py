@@ -0,0 +1,229 @@
+# bench/rodar.py
+"""Benchmark da montagem da pauta contra o stub de replay.
+
+    python bench/rodar.py [pequena tipica enorme | fixture.json ...]
+           [--motor sync|async|ambos] [--latencia 0.08] [--jitter 0.04]
+           [--repeticoes 3] [--sem-memoria] [--json resultado.json]
+
+Para cada fixture e motor de enriquecimento sobe um stub (bench/stub.py) e um
+processo filho com o app apontado para ele (CAMARA_API_URL), e mede index()
+("/") e api_pauta ("/api/pauta/<data>"): frio (cache, diretório de deputados
+e arquivo zerados) e quente. Colunas: latência (mediana e máxima), chamadas
+à API, pico de threads e pico de memória alocada (tracemalloc, que deixa as
+latências ~2x maiores; use --sem-memoria para medir só tempo).
+
+Perfis sintéticos (pequena/tipica/enorme) são gerados na hora; fixtures
+gravadas (bench/gravar.py) precisam ter data a menos de 365 dias, senão
+index() cai para hoje.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+import threading
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from bench import fixtures, sintetico  # noqa: E402
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _get_json(url, metodo="GET"):
+    import urllib.request
+    req = urllib.request.Request(url, method=metodo)
+    with urllib.request.urlopen(req, timeout=5) as r:
+        return json.loads(r.read())
+
+# -----------------------------------------------------------------------------
+# PROCESSO FILHO (app importado com o ambiente já apontando para o stub)
+# -----------------------------------------------------------------------------
+class _PicoThreads:
+    """Amostra threading.active_count() a cada 2 ms (sem contar a si mesma)."""
+    def __enter__(self):
+        self.pico = threading.active_count()
+        self.ativo = True
+        self.t = threading.Thread(target=self._loop, daemon=True)
+        self.t.start()
+        return self
+
+    def _loop(self):
+        while self.ativo:
+            self.pico = max(self.pico, threading.active_count() - 1)
+            time.sleep(0.002)
+
+    def __exit__(self, *exc):
+        self.ativo = False
+        self.t.join()
+
+def _filho(args):
+    import tracemalloc
+    import app as pauta_app
+
+    fx = fixtures.carregar(args.fixture)
+    data_str = fx["data"]
+    stub = args.stub
+    cliente = pauta_app.app.test_client()
+    rotas = {"index": f"/?data={data_str}", "api_pauta": f"/api/pauta/{data_str}"}
+    if not args.sem_memoria:
+        tracemalloc.start()
+
+    def _zerar():
+        pauta_app._cache_clear()
+        pauta_app._DEP_DIR.update(por_id={}, ts=0.0)
+        shutil.rmtree(os.environ["ARQUIVO_DIR"], ignore_errors=True)
+
+    def _medir(rota):
+        antes = _get_json(f"{stub}/__contagem")["chamadas"].get("total", 0)
+        if not args.sem_memoria:
+            tracemalloc.reset_peak()
+        with _PicoThreads() as pico:
+            t0 = time.perf_counter()
+            r = cliente.get(rota)
+            corpo = r.get_data()
+            dt = time.perf_counter() - t0
+        depois = _get_json(f"{stub}/__contagem")["chamadas"].get("total", 0)
+        if r.status_code != 200:
+            raise SystemExit(f"{rota}: HTTP {r.status_code}")
+        m = {"ms": dt * 1000, "chamadas": depois - antes, "threads": pico.pico, "bytes": len(corpo)}
+        if not args.sem_memoria:
+            m["mem_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        if rota.startswith("/api/"):
+            j = json.loads(corpo)
+            m["itens"] = len(j.get("itens_pauta", []))
+            m["dtq"] = sum(len(it["destaques"]) for it in j.get("itens_pauta", []))
+        return m
+
+    linhas = []
+    for nome, rota in rotas.items():
+        for fase in ("frio", "quente"):
+            amostras = []
+            for _ in range(args.repeticoes):
+                if fase == "frio":
+                    _zerar()
+                amostras.append(_medir(rota))
+            ms = [a["ms"] for a in amostras]
+            linha = {
+                "rota": nome, "fase": fase,
+                "ms_mediana": round(statistics.median(ms), 1), "ms_max": round(max(ms), 1),
+                "chamadas": amostras[-1]["chamadas"],
+                "threads": max(a["threads"] for a in amostras),
+                "bytes": amostras[-1]["bytes"],
+            }
+            if not args.sem_memoria:
+                linha["mem_mb"] = round(max(a["mem_mb"] for a in amostras), 1)
+            if "itens" in amostras[-1]:
+                linha["itens"], linha["dtq"] = amostras[-1]["itens"], amostras[-1]["dtq"]
+            linhas.append(linha)
+
+    faltando = _get_json(f"{stub}/__contagem")["faltando"]
+    if faltando:
+        print(f"aviso: chamadas sem resposta gravada: {faltando}", file=sys.stderr)
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:  # pragma: no cover - Windows
+        rss = None
+    print(json.dumps({"linhas": linhas, "rss_max_mb": rss}))
+
+# -----------------------------------------------------------------------------
+# PROCESSO PRINCIPAL
+# -----------------------------------------------------------------------------
+def _subir_stub(fixture, porta, args):
+    cmd = [sys.executable, os.path.join(RAIZ, "bench", "stub.py"), fixture, "--porta", str(porta),
+           "--latencia", str(args.latencia), "--jitter", str(args.jitter), "--erros", str(args.erros),
+           "--seed", "1"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            _get_json(f"http://127.0.0.1:{porta}/__contagem")
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise SystemExit("stub não subiu")
+
+def _rodar(nome, fixture, motor, args, tmp):
+    porta = _porta_livre()
+    stub = _subir_stub(fixture, porta, args)
+    try:
+        base = fixtures.carregar(fixture)["base"]
+        env = dict(os.environ,
+                   CAMARA_API_URL=f"http://127.0.0.1:{porta}{base[base.index('/', 8):]}",
+                   ENRIQUECIMENTO=motor,
+                   CACHE_BACKEND="memory",
+                   REFRESH_AGENDADO="false",
+                   PRAZO_RESPOSTA="0",
+                   ARQUIVO_DIR=os.path.join(tmp, "arquivo"))
+        cmd = [sys.executable, os.path.abspath(__file__), "--filho", fixture, "--stub", f"http://127.0.0.1:{porta}",
+               "--repeticoes", str(args.repeticoes)] + (["--sem-memoria"] if args.sem_memoria else [])
+        saida = subprocess.run(cmd, env=env, cwd=RAIZ, capture_output=True, text=True)
+        if saida.returncode != 0:
+            raise SystemExit(f"{nome}/{motor}: falhou\n{saida.stderr[-2000:]}")
+        for linha in saida.stderr.splitlines():
+            if linha.startswith("aviso:"):
+                print(f"{nome}/{motor}: {linha}", file=sys.stderr)
+        res = json.loads(saida.stdout.strip().splitlines()[-1])
+    finally:
+        stub.terminate()
+        stub.wait()
+    return [{"fixture": nome, "motor": motor, **linha, "rss_max_mb": res["rss_max_mb"]} for linha in res["linhas"]]
+
+def _tabela(resultados):
+    colunas = ["fixture", "motor", "rota", "fase", "ms_mediana", "ms_max", "chamadas", "threads", "mem_mb", "itens", "dtq"]
+    colunas = [c for c in colunas if any(c in r for r in resultados)]
+    largura = {c: max(len(c), *(len(str(r.get(c, ""))) for r in resultados)) for c in colunas}
+    print("  ".join(c.ljust(largura[c]) for c in colunas))
+    for r in resultados:
+        print("  ".join(str(r.get(c, "")).ljust(largura[c]) for c in colunas))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", nargs="*", default=list(sintetico.PERFIS),
+                        help="perfis sintéticos ou caminhos de fixtures gravadas")
+    parser.add_argument("--motor", choices=("sync", "async", "ambos"), default="ambos")
+    parser.add_argument("--latencia", type=float, default=0.08)
+    parser.add_argument("--jitter", type=float, default=0.04)
+    parser.add_argument("--erros", type=float, default=0.0)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--sem-memoria", action="store_true")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--filho", help=argparse.SUPPRESS)
+    parser.add_argument("--stub", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        args.fixture = args.filho
+        return _filho(args)
+
+    motores = ("sync", "async") if args.motor == "ambos" else (args.motor,)
+    resultados = []
+    tmp = tempfile.mkdtemp(prefix="pauta_bench_")
+    try:
+        for nome in args.fixtures:
+            if nome in sintetico.PERFIS:
+                caminho = os.path.join(tmp, f"{nome}.json")
+                fixtures.salvar(caminho, sintetico.gerar(nome))
+            else:
+                caminho, nome = nome, os.path.splitext(os.path.basename(nome))[0]
+            for motor in motores:
+                resultados += _rodar(nome, caminho, motor, args, tmp)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    _tabela(resultados)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# bench/sintetico.py
+"""Fixtures sintéticas (determinísticas) nos formatos da API.
+
+    python bench/sintetico.py [pequena tipica enorme] [--data YYYY-MM-DD]
+
+Perfis: pequena (4 itens, 2 DTQ), tipica (15 itens, ~20 DTQ) e enorme
+(40 itens, 120 DTQ). A sessão fica "Em Andamento" para não ser arquivada.
+"""
+import os
+import sys
+import random
+import argparse
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench import fixtures  # noqa: E402
+
+BASE = "https://dadosabertos.camara.leg.br/api/v2"
+PERFIS = {
+    "pequena": {"itens": 4, "dtq": 2},
+    "tipica": {"itens": 15, "dtq": 20},
+    "enorme": {"itens": 40, "dtq": 120},
+}
+N_DEPUTADOS = 513
+PARTIDOS = ("PL", "PT", "UNIÃO", "PP", "PSD", "MDB", "REPUBLICANOS", "PDT", "PSB", "PSOL")
+
+def _deputado(i):
+    return {
+        "id": 200000 + i,
+        "uri": f"{BASE}/deputados/{200000 + i}",
+        "nome": f"Deputado {i:03d}",
+        "siglaPartido": PARTIDOS[i % len(PARTIDOS)],
+        "siglaUf": "DF",
+        "urlFoto": f"https://www.camara.leg.br/internet/deputado/bandep/{200000 + i}.jpg",
+    }
+
+def gerar(perfil, data_str=None, seed=42):
+    cfg = PERFIS[perfil]
+    rnd = random.Random(seed)
+    data_str = data_str or date.today().strftime("%Y-%m-%d")
+    evento_id = 70000 + rnd.randint(0, 9999)
+    r = {}
+
+    r["/eventos"] = fixtures.resposta({"dados": [{
+        "id": evento_id,
+        "uri": f"{BASE}/eventos/{evento_id}",
+        "dataHoraInicio": f"{data_str}T13:55",
+        "descricaoTipo": "Sessão Deliberativa Extraordinária",
+        "situacao": "Em Andamento",
+        "descricao": "Sessão Deliberativa Extraordinária",
+    }], "links": []})
+
+    deps = [_deputado(i) for i in range(N_DEPUTADOS)]
+    paginas = (N_DEPUTADOS + 99) // 100
+    for p in range(1, paginas + 1):
+        links = [{"rel": "self", "href": f"{BASE}/deputados?pagina={p}&itens=100"}]
+        if p < paginas:
+            links.append({"rel": "next", "href": f"{BASE}/deputados?pagina={p + 1}&itens=100&ordem=ASC&ordenarPor=nome"})
+        r[f"/deputados?pagina={p}"] = fixtures.resposta({"dados": deps[(p - 1) * 100: p * 100], "links": links})
+    for d in deps:
+        r[f"/deputados/{d['id']}"] = fixtures.resposta({"dados": {
+            "id": d["id"], "uri": d["uri"], "nomeCivil": d["nome"].upper(),
+            "ultimoStatus": {"nome": d["nome"], "siglaPartido": d["siglaPartido"], "urlFoto": d["urlFoto"]},
+        }})
+
+    def _autores(pid):
+        autores = [{"nome": d["nome"], "uri": d["uri"], "tipo": "Deputado(a)"}
+                   for d in rnd.sample(deps, rnd.randint(1, 4))]
+        if rnd.random() < 0.15:
+            autores.append({"nome": "Poder Executivo", "uri": f"{BASE}/orgaos/78", "tipo": "Órgão do Poder Executivo"})
+        r[f"/proposicoes/{pid}/autores"] = fixtures.resposta({"dados": autores})
+
+    def _proposicao(pid, sigla, numero, ementa):
+        r[f"/proposicoes/{pid}"] = fixtures.resposta({"dados": {
+            "id": pid, "siglaTipo": sigla, "numero": numero, "ano": 2026, "ementa": ementa,
+            "dataApresentacao": f"{data_str}T10:{rnd.randint(0, 59):02d}",
+            "urlInteiroTeor": f"https://www.camara.leg.br/proposicoesWeb/prop_mostrarintegra?codteor={pid}",
+        }})
+
+    # DTQ distribuídos entre os itens (alguns itens ficam sem nenhum)
+    dtq_por_item = [0] * cfg["itens"]
+    for _ in range(cfg["dtq"]):
+        dtq_por_item[rnd.randrange(cfg["itens"])] += 1
+
+    itens, prox_dtq = [], 3000000
+    for k in range(cfg["itens"]):
+        pid = 2400000 + k
+        numero = 1000 + k
+        ementa = f"Dispõe sobre a matéria {numero} de 2026 e dá outras providências."
+        _proposicao(pid, "PL", numero, ementa)
+        _autores(pid)
+        rel = deps[rnd.randrange(N_DEPUTADOS)]
+        raw = {
+            "ordem": k + 1,
+            "topico": "Matéria sobre a mesa",
+            "regime": rnd.choice(("Urgência (Art. 155, RICD)", "Ordinário (Art. 151, III, RICD)")),
+            "titulo": f"PL {numero}/2026",
+            "proposicao_": {"id": pid, "siglaTipo": "PL", "codTipo": 139, "numero": numero, "ano": 2026, "ementa": ementa},
+            "relator": {"id": rel["id"], "nome": rel["nome"], "siglaPartido": "", "uri": rel["uri"], "urlFoto": ""},
+        }
+        if k % 5 == 4:  # parecer de plenário apontando para a principal
+            raw["proposicaoRelacionada_"] = dict(raw["proposicao_"])
+            raw["proposicao_"] = {"id": pid + 500000, "siglaTipo": "PPP", "codTipo": 192, "numero": 1, "ano": 2026,
+                                  "ementa": "Parecer proferido em Plenário"}
+        itens.append(raw)
+
+        rels = []
+        for _ in range(dtq_por_item[k]):
+            did = prox_dtq
+            prox_dtq += 1
+            rels.append({"id": did, "uri": f"{BASE}/proposicoes/{did}", "siglaTipo": "DTQ", "codTipo": 192,
+                         "numero": did % 1000, "ano": 2026, "descricaoTipo": "Destaque",
+                         "despacho": "Destaque para votação em separado."})
+            _proposicao(did, "DTQ", did % 1000, f"Destaque de bancada ao PL {numero}/2026.")
+            _autores(did)
+        rels.append({"id": pid + 900000, "uri": f"{BASE}/proposicoes/{pid + 900000}", "siglaTipo": "REQ",
+                     "numero": 1, "ano": 2026, "descricaoTipo": "Requerimento", "despacho": ""})
+        r[f"/proposicoes/{pid}/relacionadas"] = fixtures.resposta({"dados": rels})
+
+    r[f"/eventos/{evento_id}/pauta"] = fixtures.resposta({"dados": itens})
+    return {"base": BASE, "data": data_str, "perfil": perfil, "respostas": r}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("perfis", nargs="*", default=list(PERFIS), choices=list(PERFIS))
+    parser.add_argument("--data", help="data da sessão (padrão: hoje)")
+    parser.add_argument("-d", "--dir", default=fixtures.DIR_FIXTURES)
+    args = parser.parse_args()
+    os.makedirs(args.dir, exist_ok=True)
+    for perfil in args.perfis:
+        caminho = os.path.join(args.dir, f"{perfil}.json")
+        fx = gerar(perfil, args.data)
+        fixtures.salvar(caminho, fx)
+        print(f"{perfil}: {len(fx['respostas'])} respostas em {caminho}")
+
+if __name__ == "__main__":
+    main()
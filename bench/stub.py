@@ -0,0 +1,115 @@
+# bench/stub.py
+"""Servidor local que reproduz uma fixture da API da Câmara.
+
+    python bench/stub.py bench/fixtures/tipica.json [--porta 8765] [--latencia 0.08]
+           [--jitter 0.04] [--erros 0.02] [--status-erro 503] [--taxa-429 0.0]
+
+Aponte o app com CAMARA_API_URL=http://127.0.0.1:8765/api/v2.
+GET /__contagem devolve as chamadas por família; POST /__zerar as zera.
+Chamadas sem resposta gravada respondem 404 (e aparecem em "faltando").
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from collections import Counter
+from urllib.parse import urlsplit, parse_qsl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, Response, request, jsonify  # noqa: E402
+
+from bench import fixtures  # noqa: E402
+
+def criar_app(fixture, base_local, latencia=0.0, jitter=0.0, erros=0.0, status_erro=503, taxa_429=0.0, seed=None):
+    base_gravada = fixture["base"].rstrip("/")
+    prefixo = urlsplit(base_local).path.rstrip("/")
+    respostas = {}
+    por_caminho = {}
+    for k, v in fixture["respostas"].items():
+        v = dict(v, corpo=v["corpo"].replace(base_gravada, base_local))
+        respostas[k] = v
+        caminho, _, query = k.partition("?")
+        por_caminho.setdefault(caminho, []).append((set(parse_qsl(query)), v))
+
+    rnd = random.Random(seed)
+    rnd_lock = threading.Lock()
+    contagem = Counter()
+    faltando = Counter()
+    app = Flask(__name__)
+
+    def _procurar(caminho, query):
+        v = respostas.get(f"{caminho}?{query}" if query else caminho)
+        if v is not None:
+            return v
+        # Sem a query exata: a gravada com mais parâmetros contidos na pedida
+        pedida = set(parse_qsl(query))
+        candidatas = [(len(q), v) for q, v in por_caminho.get(caminho, []) if q <= pedida]
+        return max(candidatas, key=lambda c: c[0])[1] if candidatas else None
+
+    @app.get("/__contagem")
+    def _contagem():
+        return jsonify({"chamadas": dict(contagem), "faltando": dict(faltando.most_common(20))})
+
+    @app.post("/__zerar")
+    def _zerar():
+        contagem.clear()
+        faltando.clear()
+        return jsonify({"ok": True})
+
+    @app.get(f"{prefixo}/<path:rota>")
+    def _replay(rota):
+        caminho = "/" + rota
+        familia = rota.split("/")[0]
+        if familia == "eventos" and rota.endswith("/pauta"):
+            familia = "pauta"
+        contagem[familia] += 1
+        contagem["total"] += 1
+        with rnd_lock:
+            espera = latencia + (rnd.uniform(0, jitter) if jitter else 0.0)
+            sorteio = rnd.random()
+        if espera:
+            time.sleep(espera)
+        if sorteio < taxa_429:
+            contagem["429"] += 1
+            return Response("Too Many Requests", status=429, headers={"Retry-After": "1"})
+        if sorteio < taxa_429 + erros:
+            contagem["erros"] += 1
+            return Response("Erro injetado", status=status_erro)
+        query = fixtures.chave(request.url, base_local).partition("?")[2]
+        v = _procurar(caminho, query)
+        if v is None:
+            faltando[fixtures.chave(request.url, base_local)] += 1
+            return Response(json.dumps({"status": 404, "detail": "sem resposta gravada"}), status=404,
+                            mimetype="application/json")
+        return Response(v["corpo"], status=v["status"], content_type=v["tipo"])
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixture")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos por chamada")
+    parser.add_argument("--jitter", type=float, default=0.0, help="segundos extras, sorteados de 0 a jitter")
+    parser.add_argument("--erros", type=float, default=0.0, help="fração de chamadas com --status-erro")
+    parser.add_argument("--status-erro", type=int, default=503)
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="fração de chamadas com 429 + Retry-After")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    fixture = fixtures.carregar(args.fixture)
+    base_local = f"http://{args.host}:{args.porta}{urlsplit(fixture['base']).path}"
+    app = criar_app(fixture, base_local, args.latencia, args.jitter,
+                    args.erros, args.status_erro, args.taxa_429, args.seed)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    print(f"CAMARA_API_URL={base_local}", flush=True)
+    app.run(host=args.host, port=args.porta, threaded=True)
+
+if __name__ == "__main__":
+    main()
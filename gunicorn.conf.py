@@ -0,0 +1,19 @@
+# gunicorn.conf.py
+"""Configuração do gunicorn (render.yaml: gunicorn app:app -c gunicorn.conf.py).
+
+Cada worker aquece antes de atender (conexões com a API e pauta de hoje e da
+próxima sessão, ver "AQUECIMENTO" em app.py); /api/pronto diz se terminou.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+timeout = 120     # maior que AQUECIMENTO_MAX, senão o master mata o worker no boot
+keepalive = 5
+
+def post_worker_init(worker):
+    if os.environ.get("AQUECIMENTO", "true").lower() != "true":
+        return
+    from app import aquecer_worker
+    aquecer_worker()
@@ -0,0 +1,744 @@
+# tests/test_app.py
+"""Testes sem rede das proteções de cache e da API (python -m pytest -q).
+
+A API da Câmara nunca é chamada: as montagens são substituídas por
+monkeypatch e o relógio (_now) é controlado quando o teste depende de tempo.
+"""
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_TMP = tempfile.mkdtemp(prefix="pauta-testes-")
+os.environ.update(
+    REFRESH_AGENDADO="false", HTTP_CACHE="false", BUSCA="false", CACHE_BACKEND="memory",
+    ARQUIVO_DIR=os.path.join(_TMP, "arquivo"), FOTO_DIR=os.path.join(_TMP, "fotos"),
+    CAMARA_API_URL="http://127.0.0.1:9/api/v2",
+)
+
+import app as A  # noqa: E402
+
+ONTEM = (A._hoje() - timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def _item(k, degradado=False):
+    it = A.ItemPauta(id_proposicao=2400000 + k, titulo=f"PL {1000 + k}/2026", sigla_tipo="PL", numero=1000 + k,
+                     ano=2026, ementa=f"Ementa {k}.", nome_relator="Relator", autores=["Autor"],
+                     pauta_id=2400000 + k, assinatura=f"{k:016x}")
+    it.completo = True
+    it.degradado = degradado
+    return it
+
+
+def _resultado(n=3, degradados=0, situacao="Encerrada", **kw):
+    itens = [_item(k, degradado=k < degradados) for k in range(n)]
+    return A.ResultadoPauta(encontrou=True, tem_sessao=True, pauta=itens, situacao=situacao, **kw)
+
+
+@pytest.fixture(autouse=True)
+def _limpo():
+    A._cache_clear()
+    for nome in os.listdir(A._ARQUIVO_DIR) if os.path.isdir(A._ARQUIVO_DIR) else []:
+        os.remove(os.path.join(A._ARQUIVO_DIR, nome))
+    yield
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = {"t": 1_800_000_000.0}
+    monkeypatch.setattr(A, "_now", lambda: agora["t"])
+    return agora
+
+
+# -----------------------------------------------------------------------------
+# Single-flight e locks
+# -----------------------------------------------------------------------------
+def test_single_flight_executa_uma_vez():
+    chamadas = []
+    comecou, liberar = threading.Event(), threading.Event()
+
+    def construir():
+        chamadas.append(1)
+        comecou.set()
+        liberar.wait(5)
+        return "valor"
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(A._cache_get_or_build("teste:sf", construir)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    comecou.wait(5)
+    liberar.set()
+    for t in threads:
+        t.join(5)
+    assert len(chamadas) == 1
+    assert resultados == ["valor"] * 8
+
+
+
+@pytest.mark.parametrize("data_str", ["foo", "2026-13-45", "1" * 50, "2001-01-01"])
+def test_api_pauta_recusa_data_invalida(data_str, monkeypatch):
+    montagens = []
+    monkeypatch.setattr(A, "obter_pauta_sessao", lambda *a, **k: montagens.append(a))
+    r = A.app.test_client().get(f"/api/pauta/{data_str}")
+    assert r.status_code == 400
+    assert not montagens
+    assert not A._CACHE.tamanhos()
+
+
+def test_lock_entre_processos_so_para_datas(sqlite_cache, monkeypatch):
+    monkeypatch.setattr(A, "_CACHE", sqlite_cache)
+    assert A._lock_caminho(f"pauta:{ONTEM}") is not None
+    for chave in ("pauta:foo", "pauta:2026-10-16/../x", "prop:autores:1", "deputado:10"):
+        assert A._lock_caminho(chave) is None
+
+# -----------------------------------------------------------------------------
+# Diretório de deputados
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def diretorio(monkeypatch):
+    cargas = []
+
+    def carregar():
+        cargas.append(1)
+        return {"10": {"id": "10", "uri": "", "nome": "Dep 10", "sigla_partido": "X", "url_foto": ""}}
+
+    monkeypatch.setattr(A, "_carregar_diretorio_deputados", carregar)
+    monkeypatch.setattr(A, "_DEP_DIR", {"por_id": {}, "ts": 0.0})
+    monkeypatch.setattr(A, "_DEP_FALHAS", A.OrderedDict())
+    return cargas
+
+
+def test_diretorio_carrega_uma_vez_e_recarrega_em_segundo_plano(relogio, diretorio):
+    assert A.obter_deputado("https://x/api/v2/deputados/10")["nome"] == "Dep 10"
+    assert A.obter_deputado("10")["nome"] == "Dep 10"
+    assert diretorio == [1]
+    relogio["t"] += A._DEP_TTL_SECONDS + 1
+    assert "10" in A._diretorio_deputados()  # vencido: devolve o atual e recarrega numa thread
+    with A._DEP_CARGA_LOCK:
+        pass
+    assert len(diretorio) == 2
+
+
+def test_deputado_fora_do_diretorio_falha_lembrada(relogio, diretorio, monkeypatch):
+    buscas = []
+    monkeypatch.setattr(A, "_buscar_deputado", lambda url: buscas.append(url))
+    assert A.obter_deputado("99") is None
+    assert A.obter_deputado("99") is None
+    assert len(buscas) == 1
+    relogio["t"] += A._DEP_FALHA_TTL
+    assert A.obter_deputado("99") is None
+    assert len(buscas) == 2
+
+
+# -----------------------------------------------------------------------------
+# Cache SQLite
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def sqlite_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(A, "_CACHE_EVICT_EVERY", 10**9)  # despejo só quando o teste chamar
+    return A.SQLiteCache(str(tmp_path / "cache.sqlite3"), max_bytes=10**9)
+
+
+def test_sqlite_ida_e_volta_entre_processos(sqlite_cache):
+    res = _resultado()
+    sqlite_cache.set(f"pauta:{ONTEM}", res, 60)
+    outro = A.SQLiteCache(sqlite_cache.path, sqlite_cache.max_bytes)  # outro worker, mesmo arquivo
+    lido = outro.get(f"pauta:{ONTEM}")
+    assert lido is not res
+    assert [i.to_dict() for i in lido.pauta] == [i.to_dict() for i in res.pauta]
+    assert (lido.situacao, lido.gerado_em, lido.degradados) == (res.situacao, res.gerado_em, res.degradados)
+
+
+def test_sqlite_ttl_e_teto_de_staleness(sqlite_cache, relogio):
+    sqlite_cache.set("k", "v", 60)
+    assert sqlite_cache.get("k") == "v"
+    relogio["t"] += 61
+    assert sqlite_cache.get("k") is None
+    assert sqlite_cache.get_entry("k")[0] == "v"  # vencida, ainda servível (SWR)
+    relogio["t"] += A._STALE_MAX_SECONDS
+    assert sqlite_cache.get_entry("k") is None
+
+
+def test_sqlite_despejo_lru_respeita_acessos(sqlite_cache, relogio):
+    for k in ("a", "b", "c"):
+        sqlite_cache.set(k, "x" * 100, 600)
+        relogio["t"] += 1
+    assert sqlite_cache.get("a") == "x" * 100  # acesso anotado, gravado em lote no despejo
+    tamanho = sqlite_cache.tamanhos()[0][1]
+    sqlite_cache.max_bytes = 2 * tamanho
+    sqlite_cache._evict()
+    assert sorted(k for k, _ in sqlite_cache.tamanhos()) == ["a", "c"]
+    assert sqlite_cache.despejos == 1
+
+
+
+# -----------------------------------------------------------------------------
+# Agendador: "hoje" é o de Brasília
+# -----------------------------------------------------------------------------
+class _NoiteDeSessao(datetime):
+    """01:30 UTC do dia 15 = 22:30 do dia 14 em Brasília."""
+    @classmethod
+    def now(cls, tz=None):
+        utc = datetime(2026, 10, 15, 1, 30, tzinfo=timezone.utc)
+        return utc.astimezone(tz) if tz else utc.replace(tzinfo=None)
+
+
+def test_hoje_e_datas_do_agendador_em_horario_de_brasilia(monkeypatch):
+    monkeypatch.setattr(A, "datetime", _NoiteDeSessao)
+    monkeypatch.setattr(A, "_proxima_data_sessao", lambda: "2026-10-20")
+    assert A._hoje().isoformat() == "2026-10-14"
+    assert A._datas_para_atualizar() == ["2026-10-14", "2026-10-20"]
+    assert not A._arquivavel("2026-10-14", _resultado())  # a sessão da noite ainda não é passado
+    assert A._arquivavel("2026-10-13", _resultado())
+
+
+# -----------------------------------------------------------------------------
+# Motor assíncrono
+# -----------------------------------------------------------------------------
+def test_motor_async_usa_sqlite_fora_do_loop(sqlite_cache, monkeypatch):
+    monkeypatch.setattr(A, "_CACHE", sqlite_cache)
+    threads = []
+    for nome in ("get_entry", "set"):
+        original = getattr(sqlite_cache, nome)
+
+        def anotar(*a, _original=original, **k):
+            threads.append(threading.current_thread().name)
+            return _original(*a, **k)
+
+        monkeypatch.setattr(sqlite_cache, nome, anotar)
+
+    async def buscar(id_proposicao):
+        return {"ementa": f"E {id_proposicao}"}
+
+    assert A._MOTOR.executar(A._MOTOR._entidade, "meta", 7, buscar) == {"ementa": "E 7"}
+    assert A._MOTOR.executar(A._MOTOR._entidade, "meta", 7, buscar) == {"ementa": "E 7"}
+    assert len(threads) == 3  # miss, gravação, hit
+    assert "motor-async" not in threads
+
+
+# -----------------------------------------------------------------------------
+# HTTP condicional (_AdapterCondicional)
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def upstream(monkeypatch):
+    """Respostas da API em fila; anota os headers de cada envio à rede."""
+    fila, enviados = [], []
+
+    def enviar(self, request, **kwargs):
+        enviados.append(dict(request.headers))
+        status, corpo, headers = fila.pop(0)
+        r = A.requests.Response()
+        r.status_code, r._content, r.url, r.request = status, corpo.encode("utf-8"), request.url, request
+        r.headers.update({"Content-Type": "application/json", **headers})
+        return r
+
+    monkeypatch.setattr(A.HTTPAdapter, "send", enviar)
+    monkeypatch.setattr(A, "_HTTP_CACHE_ATIVO", True)
+    return fila, enviados
+
+
+def _sessao():
+    s = A.requests.Session()
+    s.mount("http://", A._AdapterCondicional(max_retries=0))
+    return s
+
+
+def test_http_condicional_revalida_com_etag_e_serve_o_corpo_guardado(upstream):
+    fila, enviados = upstream
+    url = f"{A.API_URL}/proposicoes/1"
+    fila += [(200, '{"dados": 1}', {"ETag": '"v1"'}), (304, "", {"ETag": '"v1"'})]
+    antes = A.http_cache_stats()["revalidado_304"]
+    assert _sessao().get(url).json() == {"dados": 1}
+    r = _sessao().get(url)
+    assert r.status_code == 200 and r.json() == {"dados": 1}
+    assert "If-None-Match" not in enviados[0] and enviados[1]["If-None-Match"] == '"v1"'
+    assert A.http_cache_stats()["revalidado_304"] == antes + 1
+
+
+def test_http_condicional_max_age_responde_sem_rede(upstream):
+    fila, enviados = upstream
+    url = f"{A.API_URL}/proposicoes/2"
+    fila.append((200, '{"dados": 2}', {"Cache-Control": "max-age=60"}))
+    assert _sessao().get(url).json() == {"dados": 2}
+    assert _sessao().get(url).json() == {"dados": 2}
+    assert len(enviados) == 1
+
+
+# -----------------------------------------------------------------------------
+# Montagem incremental
+# -----------------------------------------------------------------------------
+def _destaque(did):
+    return A.Destaque(id_proposicao=did, numero="1", sigla_tipo="DTQ", data_hora="", ementa="", url_inteiro_teor="",
+                      descricao_tipo="Destaque", despacho="")
+
+
+def test_diff_pauta():
+    anterior = _resultado(n=3, situacao="Aberta")
+    itens = [_item(1), _item(2), _item(3)]
+    itens[0].assinatura = "mudou"
+    anterior.pauta[2].destaques = [_destaque(50)]
+    itens[1].destaques = [_destaque(50), _destaque(51)]
+    diff = A._diff_pauta(anterior, itens, "Encerrada")
+    assert diff["adicionados"] == [2400003]
+    assert diff["removidos"] == [2400000]
+    assert diff["alterados"] == [2400001]
+    assert diff["novos_destaques"] == {"2400002": [51]}
+    assert diff["situacao"] == {"de": "Aberta", "para": "Encerrada"}
+    assert A._diff_pauta(None, itens, "Encerrada") is None
+
+
+def test_reaproveita_so_autores_de_itens_inalterados_e_recentes(relogio):
+    anterior = _resultado(n=4, degradados=1)  # item 0 degradado
+    for it in anterior.pauta:
+        it.autores, it.enriquecido_em = [f"Autor {it.id_proposicao}"], relogio["t"]
+    anterior.pauta[3].enriquecido_em = relogio["t"] - A._REENRIQUECER_MAX_SECONDS - 1
+    base = [_item(k) for k in range(5)]
+    for it in base:
+        it.autores = []
+    base[2].assinatura = "mudou"
+    faltam = A._reaproveitar_enriquecimento(base, anterior)
+    assert [it.id_proposicao for it in faltam] == [2400000, 2400002, 2400003, 2400004]
+    assert base[1].autores == ["Autor 2400001"]
+    assert base[1].destaques == []  # DTQ não são copiados: relacionadas são consultadas sempre
+
+
+def test_recupera_itens_degradados_da_montagem_anterior():
+    anterior = _resultado(n=2)
+    anterior.pauta[0].destaques = [_destaque(50)]
+    itens = [_item(0, degradado=True), _item(1, degradado=True)]
+    anterior.pauta[1].degradado = True
+    A._recuperar_degradados(itens, anterior)
+    assert not itens[0].degradado and [d.id_proposicao for d in itens[0].destaques] == [50]
+    assert itens[1].degradado
+
+
+# -----------------------------------------------------------------------------
+# SSE
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def sse(monkeypatch):
+    monkeypatch.setattr(A, "_TRANSMISSOR", A._Transmissor())
+    monkeypatch.setattr(A, "_SSE_POLL", 3600)  # o teste publica; a thread de verificação fica parada
+    monkeypatch.setattr(A, "_SSE_DURACAO_MAX", 1)
+    monkeypatch.setattr(A, "_SSE_KEEPALIVE", 0.1)
+    return A._TRANSMISSOR
+
+
+def test_sse_verificar_publica_os_eventos_da_mudanca(sse, monkeypatch):
+    antes, depois = _resultado(n=2, situacao="Aberta"), _resultado(n=3, situacao="Encerrada")
+    depois.gerado_em = antes.gerado_em + 1
+    depois.pauta[0].destaques = [_destaque(50)]
+    fila = [antes, depois]
+    monkeypatch.setattr(A, "obter_pauta_sessao", lambda data_str, prazo=None: fila.pop(0))
+    canal = A._CanalPauta()
+    sse._verificar(ONTEM, canal)  # primeira leitura: só guarda a versão
+    sse._verificar(ONTEM, canal)
+    msgs, seq = sse.esperar(canal, 0, 0)
+    assert seq == 1
+    eventos = msgs[0][1]["eventos"]
+    assert {"tipo": "item_adicionado", "id": 2400002} in eventos
+    assert {"tipo": "destaque_novo", "id": "2400000", "destaques": [50]} in eventos
+    assert {"tipo": "situacao", "de": "Aberta", "para": "Encerrada"} in eventos
+
+
+def test_sse_stream_de_hoje_entrega_mensagem(sse):
+    hoje = A._hoje().strftime("%Y-%m-%d")
+
+    def publicar():
+        while hoje not in sse.canais:
+            threading.Event().wait(0.01)
+        threading.Event().wait(0.2)  # o stream já leu a seq de partida
+        sse.publicar(sse.canais[hoje], {"data": hoje, "eventos": [{"tipo": "item_removido", "id": 1}]})
+
+    t = threading.Thread(target=publicar)
+    t.start()
+    r = A.app.test_client().get(f"/api/pauta/{hoje}/eventos")
+    corpo = r.get_data(as_text=True)  # o stream corre aqui, até SSE_DURACAO_MAX
+    t.join(5)
+    assert r.mimetype == "text/event-stream"
+    assert corpo.startswith(f"retry: {A._SSE_RETRY_MS}\n\n")
+    assert 'id: 1\nevent: pauta\ndata: {"data": "%s", "eventos": [{"tipo": "item_removido", "id": 1}]}\n\n' % hoje in corpo
+    assert sse.conexoes == 0 and not sse.canais
+
+
+def test_sse_outras_datas_204_e_limite_503(sse, monkeypatch):
+    c = A.app.test_client()
+    assert c.get(f"/api/pauta/{ONTEM}/eventos").status_code == 204
+    monkeypatch.setattr(A, "_SSE_MAX", 1)
+    hoje = A._hoje().strftime("%Y-%m-%d")
+    canal = sse.assinar(hoje)
+    r = c.get(f"/api/pauta/{hoje}/eventos")
+    assert r.status_code == 503 and r.headers["Retry-After"] == str(A._SSE_DURACAO_MAX)
+    sse.cancelar(hoje, canal)
+
+
+# -----------------------------------------------------------------------------
+# Arquivo e proteção contra falha da API
+# -----------------------------------------------------------------------------
+def test_arquivavel_sessao_passada_encerrada_e_completa():
+    assert A._arquivavel(ONTEM, _resultado())
+
+
+@pytest.mark.parametrize("data_str, res", [
+    (A._hoje().strftime("%Y-%m-%d"), _resultado()),
+    (ONTEM, _resultado(situacao="Em Andamento")),
+    (ONTEM, _resultado(parcial=True)),
+    (ONTEM, _resultado(degradados=1)),
+    (ONTEM, _resultado(erro="falhou")),
+    (ONTEM, A.ResultadoPauta(encontrou=False, situacao="Encerrada")),
+    ("ontem", _resultado()),
+])
+def test_arquivavel_recusa(data_str, res):
+    assert not A._arquivavel(data_str, res)
+
+
+def _montagem(monkeypatch, res):
+    monkeypatch.setattr(A, "_construir_pauta", lambda data_str, eventos=None: res)
+
+
+def test_falha_upstream_mantem_montagem_anterior(monkeypatch):
+    boa = _resultado(situacao="Em Andamento")
+    A._cache_set(f"pauta:{ONTEM}", boa)
+    _montagem(monkeypatch, A.ResultadoPauta(erro="API fora", falha_upstream=True))
+    assert A._construir_e_arquivar(ONTEM) is boa
+
+
+def test_falha_upstream_sem_anterior_devolve_o_erro(monkeypatch):
+    falha = A.ResultadoPauta(erro="API fora", falha_upstream=True)
+    _montagem(monkeypatch, falha)
+    assert A._construir_e_arquivar(ONTEM) is falha
+    assert not os.path.exists(A._arquivo_caminho(ONTEM))
+
+
+def test_degradada_nao_substitui_montagem_boa(monkeypatch):
+    boa = _resultado(situacao="Em Andamento")
+    A._cache_set(f"pauta:{ONTEM}", boa)
+    _montagem(monkeypatch, _resultado(degradados=1))
+    assert A._construir_e_arquivar(ONTEM) is boa
+    assert not os.path.exists(A._arquivo_caminho(ONTEM))
+
+
+def test_degradada_substitui_anterior_tambem_degradada(monkeypatch):
+    A._cache_set(f"pauta:{ONTEM}", _resultado(degradados=2, situacao="Em Andamento"))
+    nova = _resultado(degradados=1)
+    _montagem(monkeypatch, nova)
+    assert A._construir_e_arquivar(ONTEM) is nova
+    assert not os.path.exists(A._arquivo_caminho(ONTEM))
+
+
+def test_montagem_completa_e_arquivada_e_lida_do_arquivo(monkeypatch):
+    _montagem(monkeypatch, _resultado())
+    A._construir_e_arquivar(ONTEM)
+    _montagem(monkeypatch, None)  # dali em diante a data sai do arquivo, sem montar
+    A._cache_clear()
+    assert len(A.obter_pauta_sessao(ONTEM).pauta) == 3
+
+
+def test_cli_arquivar_usa_o_caminho_das_requisicoes(monkeypatch):
+    boa = _resultado(situacao="Em Andamento")
+    A._cache_set(f"pauta:{ONTEM}", boa)
+    _montagem(monkeypatch, A.ResultadoPauta(erro="API fora", falha_upstream=True))
+    saida = A.app.test_cli_runner().invoke(args=["arquivar", ONTEM, ONTEM, "--pausa", "0"]).output
+    assert "ignorada (Em Andamento)" in saida  # a falha não apaga a montagem boa
+    assert A._cache_get_entry(f"pauta:{ONTEM}")[0] is boa
+    _montagem(monkeypatch, _resultado())
+    saida = A.app.test_cli_runner().invoke(args=["arquivar", ONTEM, ONTEM, "--pausa", "0"]).output
+    assert "arquivada (3 itens)" in saida and os.path.exists(A._arquivo_caminho(ONTEM))
+    assert A._cache_get(f"pauta:{ONTEM}") is not None
+
+
+# -----------------------------------------------------------------------------
+# Intervalo de datas (/api/pautas)
+# -----------------------------------------------------------------------------
+def test_api_pautas_ndjson_uma_consulta_de_eventos(monkeypatch):
+    d1, d2, d3 = ("2026-10-13", "2026-10-14", "2026-10-15")
+    consultas, montagens = [], []
+
+    def eventos(ini, fim):
+        consultas.append((ini, fim))
+        return [{"dataHoraInicio": f"{d}T14:00", "id": i} for i, d in enumerate((d2, d3))]
+
+    def montar(data_str, eventos=None):
+        montagens.append((data_str, [e["id"] for e in eventos]))
+        return _resultado(n=1) if eventos else A.ResultadoPauta()
+
+    monkeypatch.setattr(A, "_buscar_eventos", eventos)
+    monkeypatch.setattr(A, "_construir_pauta", montar)
+    A._cache_set(f"pauta:{d1}", _resultado(n=2))  # pronta: não entra na consulta nem é montada
+    r = A.app.test_client().get(f"/api/pautas?inicio={d1}&fim={d3}")
+    assert r.mimetype == "application/x-ndjson"
+    linhas = [A.json.loads(l) for l in r.get_data(as_text=True).splitlines()]
+    assert [l["data_iso"] for l in linhas] == [d1, d2, d3]
+    assert [len(l["itens_pauta"]) for l in linhas] == [2, 1, 1]
+    assert consultas == [(d2, d3)]
+    assert sorted(montagens) == [(d2, [0]), (d3, [1])]
+
+
+@pytest.mark.parametrize("query", ["inicio=ontem", "inicio=2026-10-15&fim=2026-10-13",
+                                   "inicio=2026-01-01&fim=2026-12-31"])
+def test_api_pautas_intervalo_invalido(query):
+    assert A.app.test_client().get(f"/api/pautas?{query}").status_code == 400
+
+
+# -----------------------------------------------------------------------------
+# Disjuntores, retentativas e cópia vencida
+# -----------------------------------------------------------------------------
+def test_disjuntor_abre_sonda_e_fecha(relogio):
+    d = A._Disjuntor("teste")
+    for _ in range(A._DISJUNTOR_FALHAS):
+        assert d.permitir()
+        d.falha()
+    assert d.status()["estado"] == "aberto" and not d.permitir()
+    relogio["t"] += A._DISJUNTOR_ABERTO_SECONDS
+    assert d.permitir() and not d.permitir()  # meio aberto: uma sondagem por vez
+    d.sucesso()
+    assert d.status()["estado"] == "fechado" and d.permitir()
+
+
+def test_disjuntor_sondagem_com_falha_reabre(relogio):
+    d = A._Disjuntor("teste")
+    for _ in range(A._DISJUNTOR_FALHAS):
+        d.falha()
+    relogio["t"] += A._DISJUNTOR_ABERTO_SECONDS
+    assert d.permitir()
+    d.falha()
+    assert d.status() == {"estado": "aberto", "falhas": A._DISJUNTOR_FALHAS + 1, "recusadas": 0,
+                          "reabre_em": A._DISJUNTOR_ABERTO_SECONDS}
+
+
+def test_cache_get_or_build_serve_copia_vencida_se_a_api_cair(relogio):
+    def fora():
+        raise A.UpstreamIndisponivel("disjuntor aberto")
+
+    A._cache_set("prop:autores:1", ["Autor"], ttl=60)
+    relogio["t"] += 120
+    assert A._cache_get_or_build("prop:autores:1", fora, ttl=60) == ["Autor"]
+    with pytest.raises(A.UpstreamIndisponivel):
+        A._cache_get_or_build("prop:autores:2", fora, ttl=60)
+
+
+def test_adapter_retentativas_passam_pelo_limitador_e_disjuntor(upstream, monkeypatch):
+    fila, enviados = upstream
+    liberadas, pausas = [], []
+    liberar = A._upstream_liberar
+    monkeypatch.setattr(A, "_upstream_liberar", lambda url: liberadas.append(url) or liberar(url))
+    monkeypatch.setattr(A, "_sleep", pausas.append)
+    disj = A._DISJUNTORES[A._familia(f"{A.API_URL}/proposicoes/3")]
+    falhas = []
+    monkeypatch.setattr(disj, "falha", lambda: falhas.append(1))
+    fila += [(503, "", {}), (503, "", {}), (200, '{"dados": 3}', {})]
+    r = _sessao().get(f"{A.API_URL}/proposicoes/3")
+    assert r.json() == {"dados": 3}
+    assert len(enviados) == len(liberadas) == 3 and len(falhas) == 2
+    assert pausas == [A._RETRY_BACKOFF, A._RETRY_BACKOFF * 2]
+
+
+# -----------------------------------------------------------------------------
+# Orçamento do cache e invalidação de uma data
+# -----------------------------------------------------------------------------
+def test_memory_cache_despeja_a_menos_usada():
+    c = A.MemoryCache(max_bytes=3 * A._tamanho("x" * 100))
+    for k in "abc":
+        c.set(k, "x" * 100, 60)
+    assert c.get("a")  # "a" passa a ser a mais recente
+    c.set("d", "x" * 100, 60)
+    assert c.get("b") is None and c.get("a") and c.get("d")
+    assert c.despejos == 1 and c.bytes <= c.max_bytes
+    c.set("grande", "x" * 1000, 60)  # maior que o orçamento: não entra
+    assert c.get("grande") is None and c.get("a")
+
+
+def test_invalidar_pauta_apaga_arquivo_entidades_e_respostas_http(monkeypatch):
+    monkeypatch.setattr(A, "_HTTP_CACHE_ATIVO", True)
+    res = _resultado(n=1)
+    it = res.pauta[0]
+    it.completo, it.ids_destaques = False, [77]
+    A.arquivo_gravar(ONTEM, res)
+    A._cache_set(f"pauta:{ONTEM}", res)
+    url_eventos = A._eventos_url(ONTEM, ONTEM)
+    eventos = A.json.dumps({"dados": [{"id": 5, "descricaoTipo": "Sessão Deliberativa Extraordinária"}]})
+    chaves = [A._entidade_chave("autores", it.id_proposicao), A._entidade_chave("dtq", 77)]
+    urls = [url_eventos, f"{A.API_URL}/eventos/5/pauta", f"{A.API_URL}/proposicoes/{it.id_proposicao}/autores",
+            f"{A.API_URL}/proposicoes/77", f"{A.API_URL}/proposicoes/77/autores"]
+    for chave in chaves:
+        A._cache_set(chave, ["Autor"])
+    for url in urls:
+        A._cache_set(f"http:{url}", {"texto": eventos if url == url_eventos else "{}", "etag": '"v"'})
+    A._cache_set("http:outra", {"texto": "{}"})
+    A.invalidar_pauta(ONTEM)
+    assert not os.path.exists(A._arquivo_caminho(ONTEM))
+    assert [A._cache_get(k) for k in [f"pauta:{ONTEM}"] + chaves + [f"http:{u}" for u in urls]] == [None] * 8
+    assert A._cache_get("http:outra") is not None
+
+
+# -----------------------------------------------------------------------------
+# Cache de saída (ETag/304)
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def saida(monkeypatch):
+    """/api/pauta de ONTEM servindo `res`; conta as serializações."""
+    with A._SAIDAS_LOCK:
+        A._SAIDAS.clear()
+    res, geradas = _resultado(), []
+    res.gerado_em = 1_800_000_000.0
+    partes = A._pauta_json_partes
+    monkeypatch.setattr(A, "obter_pauta_sessao", lambda data_str, prazo=None: res)
+    monkeypatch.setattr(A, "_pauta_json_partes", lambda *a, **kw: geradas.append(1) or partes(*a, **kw))
+    return res, geradas
+
+
+def test_api_pauta_etag_304_e_nova_versao(saida):
+    res, geradas = saida
+    c = A.app.test_client()
+    r = c.get(f"/api/pauta/{ONTEM}")
+    assert r.status_code == 200 and len(r.get_json()["itens_pauta"]) == 3
+    etag = r.headers["ETag"]
+    r = c.get(f"/api/pauta/{ONTEM}", headers={"If-None-Match": etag})
+    assert r.status_code == 304 and not r.data
+    assert c.get(f"/api/pauta/{ONTEM}").status_code == 200 and len(geradas) == 1  # do cache de saída
+    res.gerado_em += 1
+    assert c.get(f"/api/pauta/{ONTEM}").status_code == 200 and len(geradas) == 2
+
+
+# -----------------------------------------------------------------------------
+# Modelos (__slots__ e serialização)
+# -----------------------------------------------------------------------------
+def test_modelos_ida_e_volta_pelo_serializador():
+    res = _resultado(n=2, degradados=1)
+    res.pauta[0].destaques = [A.Destaque(9, 1, "DTQ", "01/10/2026", "Destaque", "", "Destaque", "Desp", ["Autor"])]
+    volta = A._desserializar(A._serializar({"v": res}))["v"]
+    assert type(volta) is A.ResultadoPauta and not hasattr(volta, "__dict__")
+    assert type(volta.pauta[0].destaques[0]) is A.Destaque
+    assert volta.pauta[0].destaques[0].to_dict() == res.pauta[0].destaques[0].to_dict()
+    assert [i.para_api() for i in volta.pauta] == [i.para_api() for i in res.pauta]
+    assert (volta.gerado_em, volta.degradados, volta.situacao) == (res.gerado_em, 1, "Encerrada")
+
+
+def test_modelo_from_dict_preenche_campos_ausentes():
+    a, b = A.ResultadoPauta.from_dict({"situacao": "Encerrada"}), A.ResultadoPauta.from_dict({})
+    assert (a.encontrou, a.pauta, a.degradados, a.erro) == (False, [], 0, None)
+    a.pauta.append(1)
+    assert b.pauta == []  # o padrão mutável não é compartilhado
+
+
+# -----------------------------------------------------------------------------
+# Busca (FTS5)
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def busca(monkeypatch, tmp_path):
+    try:
+        idx = A.IndiceBusca(str(tmp_path / "busca.sqlite3"))
+    except A.sqlite3.Error as e:
+        pytest.skip(f"sqlite3 sem FTS5: {e}")
+    monkeypatch.setattr(A, "_BUSCA_ATIVA", True)
+    monkeypatch.setitem(A._BUSCA, "indice", idx)
+    monkeypatch.setitem(A._BUSCA, "erro", None)
+    res = _resultado(n=2)
+    res.pauta[0].ementa, res.pauta[0].autores = "Dispõe sobre a educação básica.", ["Maria Souza"]
+    assert idx.indexar(ONTEM, res) and not idx.indexar(ONTEM, res)  # mesma assinatura: nada a refazer
+    return idx
+
+
+# Operadores e colunas do FTS5 viram termos comuns (E implícito), nunca erro de sintaxe
+@pytest.mark.parametrize("q, ids", [('educacao"', [2400000]), ("educ*", [2400000]), ("ementa: educação", []),
+                                    ("(educação OR", []), ("NOT educação AND", [])])
+def test_api_busca_escapa_sintaxe_fts(busca, q, ids):
+    r = A.app.test_client().get("/api/busca", query_string={"q": q})
+    assert r.status_code == 200
+    assert [x["id_proposicao"] for x in r.get_json()["resultados"]] == ids
+
+
+def test_api_busca_por_autor_e_validacao(busca):
+    c = A.app.test_client()
+    r = c.get("/api/busca", query_string={"autor": 'souza" OR "x'})
+    assert r.status_code == 200 and r.get_json()["total"] == 0  # a frase inteira não casa
+    assert c.get("/api/busca", query_string={"autor": "maria souza"}).get_json()["total"] == 1
+    assert c.get("/api/busca", query_string={"q": "!!"}).status_code == 400
+    assert c.get("/api/busca", query_string={"q": "x", "tipo": "outro"}).status_code == 400
+
+
+# -----------------------------------------------------------------------------
+# Fotos (/foto)
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def fotos(monkeypatch):
+    """Diretório com o deputado 7; `baixadas` anota cada ida à origem."""
+    baixadas, falhar = [], {"v": True}
+
+    def baixar(dep_id):
+        baixadas.append(dep_id)
+        if falhar["v"]:
+            raise A.requests.HTTPError("404 na origem")
+        from PIL import Image
+        buf = A.io.BytesIO()
+        Image.new("RGB", (60, 80), (10, 120, 200)).save(buf, "JPEG")
+        A._gravar_atomico(A._foto_caminho(dep_id, "orig"), buf.getvalue())
+
+    monkeypatch.setattr(A, "_diretorio_deputados", lambda: {"7": {"url_foto": ""}})
+    monkeypatch.setattr(A, "_baixar_foto", baixar)
+    with A._FOTO_FALHAS_LOCK:
+        A._FOTO_FALHAS.clear()
+    return baixadas, falhar
+
+
+def test_foto_id_desconhecido_nao_vai_a_origem(fotos):
+    baixadas, _ = fotos
+    r = A.app.test_client().get("/foto/999999")
+    assert r.status_code == 404 and f"max-age={A._FOTO_FALHA_TTL}" in r.headers["Cache-Control"]
+    assert baixadas == []
+
+
+def test_foto_falha_espera_antes_de_tentar_de_novo(fotos, relogio):
+    pytest.importorskip("PIL")
+    baixadas, falhar = fotos
+    c = A.app.test_client()
+    assert c.get("/foto/7").status_code == 404
+    assert c.get("/foto/7").status_code == 404 and baixadas == ["7"]  # dentro do TTL: nem tenta
+    relogio["t"] += A._FOTO_FALHA_TTL
+    falhar["v"] = False
+    r = c.get("/foto/7", headers={"Accept": "image/jpeg"})
+    assert r.status_code == 200 and r.mimetype == "image/jpeg" and baixadas == ["7", "7"]
+    assert "7" not in A._FOTO_FALHAS
+
+
+def test_foto_falhas_limitadas(monkeypatch):
+    monkeypatch.setattr(A, "_FOTO_FALHAS_MAX", 2)
+    with A._FOTO_FALHAS_LOCK:
+        A._FOTO_FALHAS.clear()
+    for dep_id in ("1", "2", "3"):
+        A._registrar_falha_foto(dep_id)
+    assert list(A._FOTO_FALHAS) == ["2", "3"]
+
+
+# -----------------------------------------------------------------------------
+# Perfil sob demanda (/api/perfil)
+# -----------------------------------------------------------------------------
+@pytest.fixture
+def perfil(monkeypatch):
+    montagens = []
+    monkeypatch.setattr(A, "_ADMIN_TOKEN", "segredo")
+    monkeypatch.setattr(A, "_construir_e_arquivar", lambda data_str: montagens.append(data_str) or _resultado())
+    return montagens
+
+
+def test_perfil_monta_pelo_cache(perfil):
+    c = A.app.test_client()
+    r = c.get(f"/api/perfil/{ONTEM}?top=5", headers={"X-Admin-Token": "segredo"})
+    assert r.status_code == 200 and r.get_json()["itens"] == 3
+    assert c.get(f"/api/perfil/{ONTEM}", headers={"X-Admin-Token": "segredo"}).status_code == 200
+    assert perfil == [ONTEM, ONTEM]  # montar=1 sempre remonta...
+    assert A._cache_get(f"pauta:{ONTEM}") is not None  # ...e o resultado vai para o cache
+
+
+def test_perfil_um_por_vez(perfil):
+    c = A.app.test_client()
+    assert c.get(f"/api/perfil/{ONTEM}").status_code == 403
+    with A._PERFIL_EM_CURSO:
+        r = c.get(f"/api/perfil/{ONTEM}", headers={"X-Admin-Token": "segredo"})
+    assert r.status_code == 409 and perfil == []